@@ -0,0 +1,138 @@
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StreamlitStub(types.ModuleType):
+    # Swallows every st.* call and tallies what would have been sent to the browser
+    def __init__(self, name="streamlit"):
+        super().__init__(name)
+        self.calls = 0
+        self.payload_bytes = 0
+
+    def reset(self):
+        self.calls = 0
+        self.payload_bytes = 0
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _StubCall(self)
+
+
+class _StubCall:
+    def __init__(self, root):
+        self.root = root
+
+    def __call__(self, *args, **kwargs):
+        # Bare decorators (@st.cache_resource) get their function back
+        if len(args) == 1 and not kwargs and callable(args[0]) and isinstance(args[0], types.FunctionType):
+            return args[0]
+        self.root.calls += 1
+        self.root.payload_bytes += sum(payload_size(value) for value in list(args) + list(kwargs.values()))
+        # Widgets answer with their default so paging and similar branches take the first-render path
+        return kwargs.get("value", self)
+
+    def __getattr__(self, name):
+        return _StubCall(self.root)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def payload_size(value):
+    if isinstance(value, str):
+        return len(value.encode())
+    if hasattr(value, "to_plotly_json"):
+        return len(value.to_json())
+    if hasattr(value, "to_json") and hasattr(value, "columns"):
+        return len(value.to_json(orient="split"))
+    return 0
+
+
+def load_script(filename, streamlit_stub):
+    # The page scripts have hyphenated names, so they are loaded by path with Streamlit swapped out
+    path = os.path.join(ROOT, filename)
+    name = "bench_" + os.path.splitext(filename)[0].replace("-", "_")
+    saved = sys.modules.get("streamlit")
+    before = set(sys.modules)
+    sys.modules["streamlit"] = streamlit_stub
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is not None:
+            sys.modules["streamlit"] = saved
+        else:
+            del sys.modules["streamlit"]
+        # Helpers the page imported (tables, plan_store, ...) keep the stub; later imports get the real ones
+        for imported in set(sys.modules) - before:
+            if any(value is streamlit_stub for value in vars(sys.modules[imported]).values()):
+                del sys.modules[imported]
+    return module
+
+
+def time_call(fn, min_time=0.2, max_repeats=5):
+    best = float("inf")
+    spent = 0.0
+    repeats = 0
+    while repeats < max_repeats and (repeats == 0 or spent < min_time):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        spent += elapsed
+        repeats += 1
+    return best, repeats
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def environment():
+    import numpy
+    return {'python': platform.python_version(), 'numpy': numpy.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+
+def save_results(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({'environment': environment(), 'created': time.time(), 'results': results}, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return {row['name']: row for row in json.load(f)['results']}
+
+
+def regressions(results, baseline, threshold=0.25, min_delta=0.001):
+    # A case regresses when it is both relatively and absolutely slower than the baseline
+    found = []
+    for row in results:
+        base = baseline.get(row['name'])
+        if base is None or row.get('seconds') is None or base.get('seconds') is None:
+            continue
+        delta = row['seconds'] - base['seconds']
+        if delta > min_delta and row['seconds'] > base['seconds'] * (1 + threshold):
+            found.append((row['name'], base['seconds'], row['seconds']))
+    return found
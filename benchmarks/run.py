@@ -0,0 +1,189 @@
+import argparse
+import os
+import random
+import sys
+from functools import partial
+
+import numpy as np
+
+from benchmarks.harness import (ROOT, StreamlitStub, load_results, load_script, peak_memory, regressions,
+                                save_results, time_call)
+from poscalc.engine import crypto_positions
+
+LADDER_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+TP_COUNTS = (1, 5, 20)
+RENDER_LIMIT = 10_000
+
+PORTFOLIO = 1_000.0
+RISK = 2.0
+STOP = 70.0
+BUFFER = 1
+
+
+def ladder(num_entries, num_tps):
+    entries = np.linspace(100, 80, num_entries).tolist() if num_entries > 1 else [90.0]
+    take_profits = np.linspace(110, 150, num_tps).tolist() if num_tps > 1 else [150.0]
+    return entries, [1 / num_entries] * num_entries, take_profits
+
+
+def load_variants():
+    stub = StreamlitStub()
+    return stub, {
+        'main': load_script("main.py", stub),
+        'crypto-main': load_script("crypto-main.py", stub),
+        'main-backup': load_script("main-backup.py", stub),
+    }
+
+
+def calc_cases(variants, sizes):
+    main, backup = variants['main'], variants['main-backup']
+    for n in sizes:
+        for t in TP_COUNTS:
+            entries, proportions, tps = ladder(n, t)
+            yield (f"calc_positions/main/entries={n}/tps={t}",
+                   partial(main.calc_positions, PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER, 0, True))
+        entries, proportions, tps = ladder(n, 1)
+        yield (f"calc_positions/crypto-main/entries={n}",
+               partial(crypto_positions, PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER))
+        yield (f"calc_positions/main-backup/entries={n}",
+               partial(backup.calc_positions, PORTFOLIO, RISK, entries, STOP, proportions, tps[-1], BUFFER))
+
+
+def render_cases(variants, sizes):
+    main, crypto, backup = variants['main'], variants['crypto-main'], variants['main-backup']
+    for n in [size for size in sizes if size <= RENDER_LIMIT]:
+        entries, proportions, tps = ladder(n, 5)
+        positions, profits, full_profit, full_loss, liquidation = main.calc_positions(
+            PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER, 0, True)
+        yield (f"render/main/entries={n}",
+               partial(main.print_results, entries, positions, profits, full_profit, full_loss, liquidation, tps,
+                       PORTFOLIO))
+
+        c_positions, avg_prices, _, _, c_loss, _, shares = crypto_positions(
+            PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER)
+        trims = crypto.parse_trims("25, 100", len(tps))
+
+        def render_crypto(entries, tps, c_positions, avg_prices, shares, c_loss, trims):
+            crypto.print_results(entries, c_positions, avg_prices, shares, c_loss)
+            crypto.print_take_profits(entries, tps, *crypto.calc_take_profits(entries, tps, avg_prices, shares,
+                                                                              trims))
+        yield (f"render/crypto-main/entries={n}",
+               partial(render_crypto, entries, tps, c_positions, avg_prices, shares, c_loss, trims))
+
+        b_positions, b_profits, b_full, b_loss, b_liq = backup.calc_positions(
+            PORTFOLIO, RISK, entries, STOP, proportions, tps[-1], BUFFER)
+
+        def render_backup(entries, b_positions, b_profits, b_full, b_loss, b_liq):
+            backup.print_results(entries, b_positions, b_profits, b_full, b_loss, b_liq, entries)
+            backup.visualize_gains(entries, b_profits, PORTFOLIO, b_full, b_loss, entries)
+        yield (f"render/main-backup/entries={n}",
+               partial(render_backup, entries, b_positions, b_profits, b_full, b_loss, b_liq))
+
+
+def simulation_cases(variants):
+    backup = variants['main-backup']
+    for trades in (100, 10_000, 100_000):
+        def simulate(trades=trades):
+            random.seed(0)
+            backup.simulate_compound_strategy(PORTFOLIO, RISK, 0.4, trades)
+        yield f"simulate_compound_strategy/trades={trades}", simulate
+    yield ("simulate_paths/paths=100000/trades=100",
+           lambda: backup.simulate_paths(PORTFOLIO, RISK, 0.4, 100, 100_000, seed=0))
+
+
+# Differences between the pages that are deliberate (kept from the original scripts), reported but not failed
+KNOWN_DIFFERENCES = {
+    'profits main == main-backup': "main.py prices take profits off the unweighted mean of the filled entries, "
+                                   "main-backup.py off the position-weighted average",
+}
+
+
+def check_consistency(variants, sizes):
+    # The three pages size positions identically (crypto-main deliberately risks a third) and
+    # price the final TP off the filled entries; returns (failures, known differences)
+    main, backup = variants['main'], variants['main-backup']
+    failures, known = [], {}
+    for n in sizes:
+        entries, proportions, tps = ladder(n, 1)
+        m = main.calc_positions(PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER, 0, True)
+        c = crypto_positions(PORTFOLIO, RISK, entries, STOP, proportions, tps, BUFFER)
+        b = backup.calc_positions(PORTFOLIO, RISK, entries, STOP, proportions, tps[-1], BUFFER)
+        checks = {
+            'positions main == main-backup': (m[0], b[0]),
+            'positions main == 3 x crypto-main': (m[0], np.multiply(c[0], 3)),
+            'profits main == main-backup': ([row[-1][0] for row in m[1]], b[1]),
+            'profits main-backup == 3 x crypto-main': (b[1], np.multiply(c[2], 3)),
+            'liquidation price': ([m[4], c[5]], [b[4], b[4]]),
+        }
+        for label, (left, right) in checks.items():
+            if np.allclose(left, right, rtol=1e-9, atol=1e-9):
+                continue
+            if label in KNOWN_DIFFERENCES:
+                left, right = np.asarray(left, dtype=float), np.asarray(right, dtype=float)
+                worst = int(np.argmax(np.abs(left - right)))
+                known.setdefault(label, []).append(f"entries={n}: {left[worst]:.2f} vs {right[worst]:.2f}")
+            else:
+                failures.append(f"entries={n}: {label}")
+
+        batch = main.calc_positions_batch([PORTFOLIO] * 2, RISK, [entries, entries[:max(n // 2, 1)]], STOP,
+                                          [proportions, [1 / max(n // 2, 1)] * max(n // 2, 1)], [tps, tps],
+                                          BUFFER, 0, True)
+        if not np.allclose(batch.full_profit[0], m[2], rtol=1e-9):
+            failures.append(f"entries={n}: batch full profit == calc_positions")
+    return failures, known
+
+
+def run(cases, stub, with_memory=True):
+    results = []
+    for name, fn in cases:
+        # One untimed call first, so lazily imported modules (pandas, plotly) are not charged to the first case
+        fn()
+        stub.reset()
+        seconds, repeats = time_call(fn)
+        row = {'name': name, 'seconds': seconds, 'repeats': repeats,
+               'st_calls': stub.calls // repeats, 'payload_bytes': stub.payload_bytes // repeats}
+        if with_memory:
+            row['peak_bytes'] = peak_memory(fn)
+        results.append(row)
+        sent = f" {row['payload_bytes'] / 1024:>9.1f} KiB sent" if row['payload_bytes'] else ""
+        memory = f"{row['peak_bytes'] / 2 ** 20:>9.2f} MiB" if with_memory else ""
+        print(f"{name:<55} {seconds * 1000:>10.3f} ms {memory}{sent}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the calculator variants across ladder sizes")
+    parser.add_argument("--quick", action="store_true", help="ladders up to 1k entries only")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "results", "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    args = parser.parse_args()
+
+    sizes = [n for n in LADDER_SIZES if not args.quick or n <= 1_000]
+    stub, variants = load_variants()
+
+    failures, known = check_consistency(variants, sizes)
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    for label, cases in known.items():
+        print(f"KNOWN DIFFERENCE {label} ({KNOWN_DIFFERENCES[label]}); largest gaps: {'; '.join(cases)}")
+
+    cases = [case for group in (calc_cases(variants, sizes), render_cases(variants, sizes),
+                                simulation_cases(variants))
+             for case in group if args.filter in case[0]]
+    results = run(cases, stub, not args.no_memory)
+    save_results(args.baseline if args.save_baseline else args.output, results)
+
+    slow = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        slow = regressions(results, load_results(args.baseline), args.threshold)
+        for name, before, after in slow:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+    sys.exit(1 if failures or slow else 0)
+
+
+if __name__ == "__main__":
+    main()
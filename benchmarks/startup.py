@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import ROOT
+
+PAGES = ("main.py", "crypto-main.py", "main-backup.py")
+# Seconds from a fresh interpreter to the end of a page's first script run
+FIRST_PAINT_TARGET = 2.0
+# The calculation core must stay stdlib + NumPy
+CORE_FORBIDDEN = ("pandas", "plotly", "streamlit", "pybit", "groq", "langchain_community", "langchain_groq",
+                  "langchain_core", "pyarrow")
+# Feature-only dependencies a page must not load before the feature is used
+PAGE_FORBIDDEN = ("pybit", "groq", "langchain_community", "langchain_groq", "langchain_core", "pyarrow")
+
+FIRST_RUN = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+before = set(sys.modules)
+at = AppTest.from_file({path!r}, default_timeout=60).run()
+finished = time.perf_counter()
+print(json.dumps({{'streamlit_import': imported - started, 'first_run': finished - imported,
+                  'first_paint': finished - started, 'exceptions': [str(e.value) for e in at.exception],
+                  'page_modules': sorted(m for m in set(sys.modules) - before if '.' not in m)}}))
+"""
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({'name': name.strip(), 'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                     'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    return rows
+
+
+def import_report(statement, top=15):
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT,
+                               capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    rows = parse_importtime(completed.stderr)
+    top_level = [row for row in rows if row['depth'] == 0]
+    return {
+        'total_ms': sum(row['cumulative_us'] for row in top_level) / 1000,
+        'modules': sorted({row['name'] for row in rows}),
+        'slowest': sorted(top_level, key=lambda row: -row['cumulative_us'])[:top],
+    }
+
+
+def first_paint(page):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", FIRST_RUN.format(path=os.path.join(ROOT, page))], cwd=ROOT,
+                               capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_wall'] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import cost and first-paint time for each page")
+    parser.add_argument("--target", type=float, default=FIRST_PAINT_TARGET,
+                        help="first-paint budget in seconds per page")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args()
+
+    failures = []
+    core = import_report("import poscalc", args.top)
+    leaked = [name for name in CORE_FORBIDDEN if name in core['modules']]
+    print(f"import poscalc: {core['total_ms']:.1f} ms")
+    for row in core['slowest']:
+        print(f"  {row['cumulative_us'] / 1000:>8.1f} ms  {row['name']}")
+    if leaked:
+        failures.append(f"poscalc imports {', '.join(leaked)}")
+
+    pages = {}
+    for page in PAGES:
+        result = pages[page] = first_paint(page)
+        print(f"{page}: first paint {result['first_paint']:.3f} s (streamlit {result['streamlit_import']:.3f} s, "
+              f"script {result['first_run']:.3f} s, process {result['process_wall']:.3f} s)")
+        print(f"  page-loaded modules: {', '.join(result['page_modules']) or '-'}")
+        if result['exceptions']:
+            failures.append(f"{page} raised {result['exceptions']}")
+        if result['first_paint'] > args.target:
+            failures.append(f"{page} first paint {result['first_paint']:.3f} s > {args.target:.3f} s")
+        early = [name for name in PAGE_FORBIDDEN if name in result['page_modules']]
+        if early:
+            failures.append(f"{page} loads {', '.join(early)} before the feature is used")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'core': core, 'pages': pages, 'target': args.target, 'failures': failures}, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+
+import numpy as np
+
+from poscalc.cache import shared_cache
+
+# Heatmap rows past this are thinned to evenly spaced entries, always keeping the first and the full fill
+HEATMAP_ROWS = 200
+# Past this many scenarios bar charts switch to WebGL lines, downsampled to at most MAX_POINTS
+WEBGL_THRESHOLD = 200
+MAX_POINTS = 2_000
+
+_FIGURES = shared_cache("charts.figures", maxsize=64, ttl=3600)
+
+
+def tp_heatmap(profits, entry_labels, tp_labels, title='Profit by Filled Entries and Take Profit',
+               max_rows=HEATMAP_ROWS):
+    # plotly is only loaded once a chart is actually drawn
+    import plotly.graph_objects as go
+
+    # profits: entries x TPs matrix of realized profit per TP level
+    profits = np.asarray(profits, dtype=float)
+    if len(entry_labels) > max_rows:
+        rows = np.unique(np.linspace(0, len(entry_labels) - 1, max_rows).round().astype(int))
+        profits = profits[rows]
+        entry_labels = [entry_labels[i] for i in rows]
+    fig = go.Figure(data=go.Heatmap(z=profits, x=tp_labels, y=entry_labels, colorscale='RdYlGn', zmid=0,
+                                    texttemplate='%{z:.2f}', hovertemplate='%{y}<br>%{x}<br>Profit: %{z:.4f}'))
+    fig.update_layout(title=title,
+                      xaxis_title='Take Profit',
+                      yaxis_title='Filled Through',
+                      yaxis_autorange='reversed')
+    return fig
+
+
+def downsample(values, max_points=MAX_POINTS):
+    # Min and max of each bucket, so spikes survive; returns the kept indices and their values
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_points:
+        return np.arange(len(values)), values
+    width = -(-len(values) // (max_points // 2))
+    buckets = -(-len(values) // width)
+    padded = np.full(buckets * width, np.nan)
+    padded[:len(values)] = values
+    padded = padded.reshape(buckets, width)
+    offsets = np.arange(buckets) * width
+    keep = np.union1d(offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1))
+    return keep, values[keep]
+
+
+def _cached(kind, values, params, build):
+    # Keyed by a digest of the input column, so reruns with the same plan skip building the figure.
+    # The cache is shared across sessions, so the cached figure is never handed out: every caller gets a copy
+    import plotly.graph_objects as go
+
+    values = np.ascontiguousarray(values, dtype=float)
+    key = (kind, hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest(), params)
+    fig = _FIGURES.get(key)
+    if fig is None:
+        fig = build(values, *params)
+        _FIGURES.put(key, fig)
+    return go.Figure(fig)
+
+
+def _build_gains(gains, threshold):
+    import plotly.graph_objects as go
+
+    if len(gains) <= threshold:
+        trace = go.Bar(x=[f"Entry {i + 1}" for i in range(len(gains))], y=gains, text=[f"{g:.2f}" for g in gains],
+                       textposition='auto')
+    else:
+        keep, values = downsample(gains)
+        trace = go.Scattergl(x=keep + 1, y=values, mode='lines', hovertemplate='Entry %{x}<br>Gain: %{y:.2f}')
+    fig = go.Figure(data=[trace])
+    fig.update_layout(title='Gains by Entry Scenario',
+                      xaxis_title='Scenario',
+                      yaxis_title='Gain',
+                      showlegend=False)
+    return fig
+
+
+def gains_figure(gains, threshold=WEBGL_THRESHOLD):
+    return _cached("gains", gains, (threshold,), _build_gains)
+
+
+def _outcome_label(i, count):
+    if i == count - 1:
+        return 'Win (All Entries)'
+    return 'Win (E1)' if i == 0 else f'Win (E1-E{i + 1})'
+
+
+def _build_outcomes(outcomes, threshold):
+    # outcomes: portfolio after a full TP with entries 1..i filled, then the portfolio after the stop
+    import plotly.graph_objects as go
+
+    wins, lose = outcomes[:-1], outcomes[-1]
+    if len(wins) <= threshold:
+        labels = [_outcome_label(i, len(wins)) for i in range(len(wins))] + ['Lose']
+        trace = go.Bar(x=labels, y=outcomes, text=[f"{value:.2f}" for value in outcomes], textposition='auto',
+                       marker_color=['green'] * len(wins) + ['red'])
+    else:
+        keep, values = downsample(wins)
+        trace = go.Scattergl(x=np.append(keep + 1, len(wins) + 1), y=np.append(values, lose), mode='lines+markers',
+                             marker=dict(color=['green'] * len(keep) + ['red'], size=4), line=dict(color='green'),
+                             hovertemplate='%{x}<br>Portfolio: %{y:.2f}')
+    fig = go.Figure(data=[trace])
+    fig.update_layout(title='Portfolio by Outcome',
+                      xaxis_title='Filled Entries (last point: stop loss)' if len(wins) > threshold else None,
+                      yaxis_title='Portfolio',
+                      showlegend=False)
+    return fig
+
+
+def outcome_figure(portfolio_size, profits, full_loss, threshold=WEBGL_THRESHOLD):
+    outcomes = np.append(portfolio_size + np.asarray(profits, dtype=float), portfolio_size - full_loss)
+    return _cached("outcomes", outcomes, (threshold,), _build_outcomes)
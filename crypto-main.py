@@ -1,42 +1,28 @@
 import streamlit as st
-import random
 
+from charts import tp_heatmap
+from liquidation import liquidation_report, risk_limits_panel, tiered_liquidation
+from plan_store import plan_store
+from profiling_panel import run_profiled
+from tables import HTML_BUDGET, join_within_budget, number_columns, paged_dataframe, summary_indices
+from poscalc import profiling
+from poscalc import liquidation_price, memoize, normalize_csv, parse_csv_floats, parse_trims, tp_schedule
+from poscalc.engine import crypto_plan
 
-def calc_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
-                   liquidation_buffer):
-    risk_amount = portfolio_size * (risk_level / 100) / 3  # Adjusted for the 3x issue
-    risk_per_entry = [risk_amount * prop for prop in entry_proportions]
 
-    positions = []
-    for price, risk in zip(entry_prices, risk_per_entry):
-        pos = risk / abs((price - stop_loss) / price)
-        positions.append(pos)
-
-    avg_prices = [
-        sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(positions[:i + 1])
-        for i in range(len(entry_prices))]
-
-    profits = [sum(positions[:i + 1]) * (take_profits[-1] - sum(
-        price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(positions[:i + 1])) / (
-                           sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(
-                       positions[:i + 1])) for i in range(len(entry_prices))]
-
-    cumulative_shares = [sum(positions[:i + 1]) / avg_prices[i] for i in range(len(entry_prices))]
-
-    full_profit, full_loss = profits[-1], risk_amount * 3  # Adjusted for the 3x issue
-    liquidation_price = stop_loss * (1 - liquidation_buffer / 100)
-
-    return positions, avg_prices, profits, full_profit, full_loss, liquidation_price, cumulative_shares
-
-def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_loss, original_entry_prices=None):
-    st.subheader("Results")
+def results_html(entry_prices, positions, avg_prices, cumulative_shares, full_loss, rungs=None, budget=None):
+    # rungs picks which entries get a block; past `budget` bytes of rung HTML this gives up and returns None
     total_position_size = 0
     entries = []
     stats = []
+    rungs = None if rungs is None else set(rungs)
+    size = 0
 
     for i, (price, pos, avg_price, shares) in enumerate(zip(entry_prices, positions, avg_prices, cumulative_shares),
                                                         start=1):
         total_position_size += pos
+        if rungs is not None and i - 1 not in rungs:
+            continue
         entry_html = f"""
         <div>
         <strong style='font-size: 35px;'>Entry {i} Bids</strong><br>
@@ -59,6 +45,9 @@ def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_l
         </div>
         """
         stats.append(stats_html)
+        size += len(entry_html) + len(stats_html)
+        if budget is not None and size > budget:
+            return None
 
     # Print all the entries in a single div
     entries_html = "".join(entries)
@@ -67,7 +56,6 @@ def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_l
         {entries_html}
         </div>
         """
-    st.markdown(entries_container, unsafe_allow_html=True)
 
     divider_container = f"""
             <div>
@@ -76,7 +64,6 @@ def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_l
             <span></span><br> 
             </div>
             """
-    st.markdown(divider_container, unsafe_allow_html=True)
 
     # Wrap all the stats in a single div with background color
     stats_html = "".join(stats)
@@ -86,7 +73,6 @@ def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_l
         {stats_html}
         </div>
         """
-    st.markdown(stats_container, unsafe_allow_html=True)
 
     # Display total loss
     total_loss_html = f"""
@@ -95,31 +81,88 @@ def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_l
         <span style='font-size: 25px;'>Total Loss: {full_loss:.2f}$</span>
         </div>
         """
-    st.markdown(total_loss_html, unsafe_allow_html=True)
+    return [entries_container, divider_container, stats_container, total_loss_html]
+
+
+@memoize(maxsize=256, ttl=3600, name="crypto-main.plan_results")
+def plan_results(portfolio_size, base_risk_level, previous_win_profit, entry_prices, stop_loss, take_profit,
+                 entries_between, weight_scheme, weight_param, liquidation_buffer, trims=""):
+    with profiling.stage("parse_inputs"):
+        original_entry_prices = list(parse_csv_floats(entry_prices))
+        take_profits = list(parse_csv_floats(take_profit))
+
+    with profiling.stage("calc_positions"):
+        (entry_prices, positions, avg_prices, profits, full_profit, full_loss, liquidation_price,
+         cumulative_shares) = crypto_plan(portfolio_size, base_risk_level, previous_win_profit, original_entry_prices,
+                                          stop_loss, take_profits, entries_between, weight_scheme, weight_param,
+                                          liquidation_buffer)
+    with profiling.stage("results_html"):
+        blocks = results_html(entry_prices, positions, avg_prices, cumulative_shares, full_loss, budget=HTML_BUDGET)
+    with profiling.stage("calc_take_profits"):
+        tp_surface = calc_take_profits(entry_prices, take_profits, avg_prices, cumulative_shares,
+                                        parse_trims(trims, len(take_profits)))
+    return (entry_prices, positions, avg_prices, cumulative_shares, full_loss, original_entry_prices, blocks,
+            take_profits, tp_surface)
+
+
+def results_frame(entry_prices, positions, avg_prices, cumulative_shares):
+    import pandas as pd
+
+    frame = pd.DataFrame({'Entry': range(1, len(entry_prices) + 1), 'Order at ($)': entry_prices,
+                          'Amount ($)': positions, 'Avg Price ($)': avg_prices, 'Total Shares': cumulative_shares})
+    frame['Total Amount so far ($)'] = frame['Amount ($)'].cumsum()
+    return frame
 
-def calc_take_profits(entry_prices, positions, take_profits, cumulative_shares):
-    st.subheader("Take Profits")
-    total_shares = cumulative_shares[-1]
-    remaining_shares = total_shares
-    for i, tp in enumerate(take_profits, start=1):
-        if i == 1:
-            sell_shares = total_shares * 0.25
-        elif i == 2:
-            sell_shares = total_shares * 0.75
-        else:
-            sell_shares = remaining_shares
 
-        profit = sell_shares * (tp - entry_prices[-1])
-        remaining_shares -= sell_shares
-        st.write(f"""
+def print_results(entry_prices, positions, avg_prices, cumulative_shares, full_loss, original_entry_prices=None,
+                  blocks=None):
+    st.subheader("Results")
+    if blocks is None:
+        blocks = results_html(entry_prices, positions, avg_prices, cumulative_shares, full_loss, budget=HTML_BUDGET)
+    if blocks is not None:
+        for block in blocks:
+            st.markdown(block, unsafe_allow_html=True)
+        return
+
+    # Too many rungs for HTML: first and last rung as cards, every rung in the grid
+    for block in results_html(entry_prices, positions, avg_prices, cumulative_shares, full_loss,
+                              rungs=summary_indices(len(entry_prices))):
+        st.markdown(block, unsafe_allow_html=True)
+    paged_dataframe(results_frame(entry_prices, positions, avg_prices, cumulative_shares), "crypto_results_page",
+                    number_columns({'Order at ($)': "%.10g", 'Amount ($)': "%.2f", 'Avg Price ($)': "%.5f",
+                                    'Total Shares': "%.5f", 'Total Amount so far ($)': "%.2f"}))
+
+def calc_take_profits(entry_prices, take_profits, avg_prices, cumulative_shares, trims):
+    # Entries x TPs surfaces priced off the running average, not the last entry
+    return tp_schedule(cumulative_shares, avg_prices, take_profits, trims)
+
+
+def print_take_profits(entry_prices, take_profits, tp_profits, tp_sold, tp_remaining):
+    st.subheader("Take Profits")
+    blocks = (f"""
         <div style='background-color: #d0ffd0; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>
         <strong>TP {i}</strong><br>
         Take Profit at: {str(tp).rstrip('0').rstrip('.')} $<br>
-        Sell Shares: {sell_shares:.5f}<br>
-        Profit: {profit:.2f} $<br>
-        Remaining Shares: {remaining_shares:.5f}
+        Sell Shares: {tp_sold[-1, i - 1]:.5f}<br>
+        Profit: {tp_profits[-1, i - 1]:.2f} $<br>
+        Remaining Shares: {tp_remaining[-1, i - 1]:.5f}
         </div>
-        """, unsafe_allow_html=True)
+        """ for i, tp in enumerate(take_profits, start=1))
+    html = join_within_budget(blocks)
+    if html is not None:
+        st.write(html, unsafe_allow_html=True)
+    else:
+        import pandas as pd
+        frame = pd.DataFrame({'TP': range(1, len(take_profits) + 1), 'Take Profit at ($)': take_profits,
+                              'Sell Shares': tp_sold[-1], 'Profit ($)': tp_profits[-1],
+                              'Remaining Shares': tp_remaining[-1]})
+        paged_dataframe(frame, "crypto_tp_page", number_columns({'Take Profit at ($)': "%.10g", 'Sell Shares': "%.5f",
+                                                                 'Profit ($)': "%.2f", 'Remaining Shares': "%.5f"}))
+
+    if len(take_profits) > 1 or len(entry_prices) > 1:
+        st.plotly_chart(tp_heatmap(tp_profits, [f"Entry {i + 1}" for i in range(len(entry_prices))],
+                                   [f"TP {i + 1}: {str(tp).rstrip('0').rstrip('.')}"
+                                    for i, tp in enumerate(take_profits)]))
 
 def main():
     st.set_page_config(page_title="Position Calculator", page_icon=":calculator:", layout="centered")
@@ -135,79 +178,81 @@ def main():
         base_risk_level = 1
 
     add_entries = st.checkbox("Add entries between provided ones", value=False)
+    if add_entries:
+        entries_between = st.number_input("Entries added between each pair", min_value=1, value=1, step=1)
     evenly_distributed_entries = st.checkbox("Evenly distributed entries", value=False)
+    if not evenly_distributed_entries:
+        weight_scheme = st.selectbox("Entry weighting", ("classic", "linear", "geometric", "exponential", "custom"))
+        weight_param = None
+        if weight_scheme == "geometric":
+            weight_param = st.number_input("Ratio between consecutive entries", min_value=1.0, value=1.5)
+        elif weight_scheme == "exponential":
+            weight_param = st.number_input("Growth rate", min_value=0.0, value=3.0)
+        elif weight_scheme == "custom":
+            weight_param = st.text_input("Weight curve (comma-separated, stretched to the ladder)", value="1, 2, 4")
 
     with st.expander("Input Parameters", expanded=True):
         portfolio_size = st.number_input("Current Portfolio Size", value=default_portfolio_size)
         base_risk_level = st.number_input("Base Risk", value=base_risk_level)
         previous_win_profit = st.number_input("Previous Winning Trade Profit (Optional)", value=0.0)
+        symbol = st.text_input("Symbol (optional, for the plan history)").strip().upper()
         entry_prices = st.text_input("Entry Prices (comma-separated)")
         stop_loss = st.number_input("Stop Loss", step=0.0000001, format="%0.7f")
         take_profit = st.text_input("Take Profits (comma-separated)", value="")
+        trims = st.text_input("TP Trims (% of remaining per TP, last TP closes the rest)", value="25, 100")
+        leverage = st.number_input("Leverage", min_value=1.0, value=1.0 if user == "Spot" else 10.0)
+        # Fallback for symbols without risk-limit tiers
         liquidation_buffer = 1
 
     if st.button("Calculate"):
         if entry_prices and stop_loss and take_profit:
-            original_entry_prices = [float(x.strip()) for x in entry_prices.split(",")]
-            take_profits = [float(x.strip()) for x in take_profit.split(",")]
-
-            if add_entries:
-                entry_prices = []
-                for i in range(len(original_entry_prices) - 1):
-                    entry_prices.append(original_entry_prices[i])
-                    price_diff = (original_entry_prices[i + 1] - original_entry_prices[i]) / 2
-                    entry_prices.append(original_entry_prices[i] + price_diff)
-                entry_prices.append(original_entry_prices[-1])
-            else:
-                entry_prices = original_entry_prices
-
-            # Calculate the risk tolerance based on the current portfolio value and previous winning trade's profit
-            if previous_win_profit > 0:
-                old_portfolio_size = portfolio_size - previous_win_profit
-            else:
-                old_portfolio_size = portfolio_size
-
-            og_risk_value = old_portfolio_size * (1 - base_risk_level / 100)
-            risk_tolerance = (portfolio_size - og_risk_value) / portfolio_size * 100
-
-            num_entries = len(entry_prices)
             if evenly_distributed_entries:
-                entry_proportions = [1/num_entries] * num_entries
+                weight_scheme, weight_param = "even", None
+            elif weight_scheme == "custom":
+                weight_param = normalize_csv(weight_param)
+            try:
+                with profiling.stage("plan_results"):
+                    (entry_prices, positions, avg_prices, cumulative_shares, full_loss, original_entry_prices,
+                     blocks, take_profits, tp_surface) = plan_results(portfolio_size, base_risk_level,
+                                                                      previous_win_profit, normalize_csv(entry_prices),
+                                                                      stop_loss, normalize_csv(take_profit),
+                                                                      int(entries_between) if add_entries else 0,
+                                                                      weight_scheme, weight_param, liquidation_buffer,
+                                                                      normalize_csv(trims))
+            except ValueError as e:
+                st.warning(str(e))
             else:
-                if num_entries == 2:
-                    entry_proportions = [0.35, 0.65]
-                elif num_entries == 3:
-                    entry_proportions = [0.15, 0.35, 0.50]
-                elif num_entries == 4:
-                    entry_proportions = [0.10, 0.15, 0.25, 0.50]
-                elif num_entries == 5:
-                    entry_proportions = [0.05, 0.10, 0.15, 0.25, 0.45]
-                elif num_entries == 6:
-                    entry_proportions = [0.05, 0.08, 0.12, 0.15, 0.25, 0.35]
-                elif num_entries == 7:
-                    entry_proportions = [0.03, 0.05, 0.07, 0.10, 0.15, 0.25, 0.35]
-                elif num_entries == 8:
-                    entry_proportions = [0.02, 0.03, 0.05, 0.07, 0.10, 0.15, 0.25, 0.33]
-                elif num_entries == 9:
-                    entry_proportions = [0.02, 0.03, 0.05, 0.07, 0.08, 0.10, 0.15, 0.20, 0.30]
-                elif num_entries == 10:
-                    entry_proportions = [0.02, 0.03, 0.05, 0.06, 0.07, 0.08, 0.09, 0.15, 0.20, 0.25]
-                elif num_entries == 11:
-                    entry_proportions = [0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.14, 0.20, 0.30]
-                elif num_entries == 12:
-                    entry_proportions = [0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.15, 0.20, 0.20]
-                else:
-                    st.warning(
-                        f"This script currently supports up to 12 entries for non-even distribution. You provided {num_entries} entries.")
-                    return
-
-            positions, avg_prices, profits, full_profit, full_loss, liquidation_price, cumulative_shares = calc_positions(
-                portfolio_size, risk_tolerance, entry_prices, stop_loss, entry_proportions, take_profits, liquidation_buffer
-            )
-            print_results(entry_prices, positions, avg_prices, cumulative_shares, full_loss, original_entry_prices)
+                with profiling.stage("print_results"):
+                    print_results(entry_prices, positions, avg_prices, cumulative_shares, full_loss,
+                                  original_entry_prices, blocks)
+                with profiling.stage("tiered_liquidation"):
+                    liquidation = tiered_liquidation(symbol, True, entry_prices, positions, stop_loss, leverage)
+                buffer_price = float(liquidation_price(stop_loss, liquidation_buffer))
+                liquidation_report(liquidation, symbol, leverage, buffer_price)
+                with profiling.stage("print_take_profits"):
+                    print_take_profits(entry_prices, take_profits, *tp_surface)
+                plan_store().save("crypto-main", user, symbol, "Long",
+                                  inputs={'portfolio_size': portfolio_size, 'base_risk_level': base_risk_level,
+                                          'previous_win_profit': previous_win_profit,
+                                          'entry_prices': original_entry_prices, 'stop_loss': stop_loss,
+                                          'take_profits': take_profits, 'weight_scheme': weight_scheme,
+                                          'trims': trims},
+                                  outputs={'entry_prices': entry_prices, 'positions': positions,
+                                           'avg_prices': avg_prices, 'full_loss': full_loss,
+                                           'liquidation_price': buffer_price if liquidation is None
+                                           else float(liquidation.full_fill[0]),
+                                           'full_profit': float(tp_surface[0][-1].sum()),
+                                           'tp_profits': tp_surface[0][-1].tolist()})
 
         else:
             st.warning("Please fill in all the required fields.")
 
+    with st.expander("Risk Limits"):
+        risk_limits_panel(symbol)
+
+    cache_stats = plan_results.cache.stats()
+    st.sidebar.caption(f"Plan cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['size']}/{cache_stats['maxsize']} plans)")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled("crypto-main", main)
\ No newline at end of file
@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+from bisect import bisect_right
+import itertools
+import json
+import threading
+import time
+
+import numpy as np
+
+
+class PriceCache:
+    def __init__(self):
+        self.prices = {}
+        self._lock = threading.Lock()
+
+    def update(self, symbol, price, ts):
+        with self._lock:
+            self.prices[symbol] = (price, ts)
+
+    def get(self, symbol):
+        with self._lock:
+            return self.prices.get(symbol)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.prices)
+
+
+class TrackedPlan:
+    # Rungs are kept in fill order with prefix sums, so a tick costs at most one binary search.
+    # Prices are compared as keys that grow as price moves against the plan (negated for longs)
+    def __init__(self, plan_id, symbol, is_long, entry_prices, positions, stop_loss, liquidation_price):
+        order = np.argsort(entry_prices)
+        if is_long:
+            order = order[::-1]
+        entry_prices = np.asarray(entry_prices, dtype=float)[order]
+        positions = np.asarray(positions, dtype=float)[order]
+        self.plan_id = plan_id
+        self.symbol = symbol
+        self.is_long = is_long
+        self.entry_prices = entry_prices.tolist()
+        self.positions = positions.tolist()
+        self.stop_loss = stop_loss
+        self.liquidation_price = liquidation_price
+        self.sign = -1.0 if is_long else 1.0
+        self.fill_keys = (entry_prices * self.sign).tolist()
+        self.stop_key = stop_loss * self.sign
+        self.liquidation_key = np.inf if liquidation_price is None else liquidation_price * self.sign
+        self.exit_key = min(self.stop_key, self.liquidation_key)
+        self.cost = [0.0] + np.cumsum(positions).tolist()
+        self.coins = [0.0] + np.cumsum(positions / entry_prices).tolist()
+        self.filled = 0
+        self.last_price = None
+        self.status = "open"
+        self.exit_price = None
+
+    def on_price(self, price):
+        # Fills are sticky: a rung stays filled once price has traded through it. Stop-outs and liquidations
+        # are final: later ticks only update the last price, never the fills or the PnL
+        self.last_price = price
+        if self.status != "open":
+            return self.state()
+        key = price * self.sign
+        # Rungs beyond the stop or the liquidation price never fill, even when a tick gaps past them
+        fill_key = min(key, self.exit_key)
+        if self.filled < len(self.fill_keys) and self.fill_keys[self.filled] <= fill_key:
+            self.filled = bisect_right(self.fill_keys, fill_key, lo=self.filled)
+        if key >= self.liquidation_key:
+            # Liquidation sits inside the stop, or price gapped through both: the position goes at liquidation
+            self.status, self.exit_price = "liquidated", self.liquidation_price
+        elif key >= self.stop_key:
+            self.status, self.exit_price = "stopped", price
+        return self.state()
+
+    def _pnl(self, price):
+        cost, coins = self.cost[self.filled], self.coins[self.filled]
+        return coins * price - cost if self.is_long else cost - coins * price
+
+    def state(self):
+        price = self.last_price
+        if self.status != "open":
+            unrealized, realized, distance = 0.0, self._pnl(self.exit_price), None
+        elif price is None:
+            unrealized, realized, distance = None, 0.0, None
+        else:
+            unrealized, realized = self._pnl(price), 0.0
+            distance = (price - self.stop_loss) / price * 100 * -self.sign
+        return {
+            'plan_id': self.plan_id,
+            'symbol': self.symbol,
+            'side': "Long" if self.is_long else "Short",
+            'last_price': price,
+            'filled_rungs': self.filled,
+            'total_rungs': len(self.entry_prices),
+            'filled_size': self.cost[self.filled],
+            'unrealized_pnl': unrealized,
+            'realized_pnl': realized,
+            'distance_to_stop_pct': distance,
+            'status': self.status,
+            'exit_price': self.exit_price,
+        }
+
+
+class PlanBook:
+    def __init__(self):
+        self.plans = {}
+        self.by_symbol = {}
+        self.states = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, symbol, is_long, entry_prices, positions, stop_loss, liquidation_price):
+        with self._lock:
+            plan = TrackedPlan(next(self._ids), symbol, is_long, entry_prices, positions, stop_loss,
+                               liquidation_price)
+            self.plans[plan.plan_id] = plan
+            self.by_symbol.setdefault(symbol, []).append(plan)
+            self.states[plan.plan_id] = plan.state()
+            return plan.plan_id
+
+    def remove(self, plan_id):
+        with self._lock:
+            plan = self.plans.pop(plan_id)
+            self.by_symbol[plan.symbol].remove(plan)
+            del self.states[plan_id]
+
+    def symbols(self):
+        with self._lock:
+            return [symbol for symbol, plans in self.by_symbol.items() if plans]
+
+    def on_tick(self, symbol, price):
+        # Only plans on the ticking symbol are touched
+        with self._lock:
+            updates = [plan.on_price(price) for plan in self.by_symbol.get(symbol, ())]
+            for state in updates:
+                self.states[state['plan_id']] = state
+            return updates
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.states.values())
+
+
+def parse_ticker_message(message):
+    # Bybit v5 public ticker: deltas only carry the fields that changed
+    data = message.get("data") or {}
+    if "lastPrice" not in data:
+        return None
+    return data["symbol"], float(data["lastPrice"]), message.get("ts")
+
+
+class FeedStats:
+    def __init__(self, window=10_000):
+        self.ticks = 0
+        self.updates = 0
+        self.started = time.perf_counter()
+        self.queue_delays = np.zeros(window)
+        self.processing = np.zeros(window)
+        self._window = window
+
+    def record(self, received, dequeued, processed, updates):
+        slot = self.ticks % self._window
+        self.queue_delays[slot] = dequeued - received
+        self.processing[slot] = processed - dequeued
+        self.ticks += 1
+        self.updates += updates
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        count = max(min(self.ticks, self._window), 1)
+        processing = self.processing[:count] * 1e6
+        queue_delays = self.queue_delays[:count] * 1e6
+        return {
+            'ticks': self.ticks,
+            'plan_updates': self.updates,
+            'ticks_per_sec': self.ticks / elapsed if elapsed else 0.0,
+            'plan_updates_per_sec': self.updates / elapsed if elapsed else 0.0,
+            'processing_p50_us': float(np.percentile(processing, 50)),
+            'processing_p99_us': float(np.percentile(processing, 99)),
+            'queue_delay_p50_us': float(np.percentile(queue_delays, 50)),
+            'queue_delay_p99_us': float(np.percentile(queue_delays, 99)),
+        }
+
+
+class LiveFeed:
+    # The pybit socket calls back from its own thread; ticks are handed to an asyncio
+    # queue and applied to the plan book by a single consumer coroutine. If the socket cannot be opened the
+    # feed resets, so the next start_in_thread retries, waiting retry_delay seconds, doubled after each failure
+    def __init__(self, book, websocket_factory=None, testnet=False, retry_delay=1.0, max_retry_delay=60.0):
+        self.book = book
+        self.prices = PriceCache()
+        self.stats = FeedStats()
+        self.websocket_factory = websocket_factory or (lambda: _pybit_websocket(testnet))
+        self.subscribed = set()
+        self.loop = None
+        self.queue = None
+        self.websocket = None
+        self.thread = None
+        self.error = None
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.failures = 0
+        self._retry_at = 0.0
+        self._subscribe_lock = threading.Lock()
+
+    def _on_message(self, message):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (time.perf_counter(), message))
+
+    def subscribe(self, symbols):
+        # Before run() has opened the socket, symbols are picked up from the plan book instead
+        with self._subscribe_lock:
+            if self.websocket is None:
+                return
+            new = [symbol for symbol in symbols if symbol not in self.subscribed]
+            if new:
+                self.subscribed.update(new)
+                self.websocket.ticker_stream(symbol=new, callback=self._on_message)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        try:
+            with self._subscribe_lock:
+                self.websocket = self.websocket_factory()
+        except Exception as e:
+            with self._subscribe_lock:
+                self.error = e
+                self.failures += 1
+                self._retry_at = time.monotonic() + min(self.retry_delay * 2 ** (self.failures - 1),
+                                                        self.max_retry_delay)
+                self.loop = self.queue = self.thread = None
+            return
+        self.error = None
+        self.failures = 0
+        self.subscribe(self.book.symbols())
+        while True:
+            received, message = await self.queue.get()
+            if message is None:
+                break
+            dequeued = time.perf_counter()
+            tick = parse_ticker_message(message)
+            if tick is None:
+                continue
+            symbol, price, ts = tick
+            self.prices.update(symbol, price, ts)
+            updates = self.book.on_tick(symbol, price)
+            self.stats.record(received, dequeued, time.perf_counter(), len(updates))
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (time.perf_counter(), None))
+        if self.websocket is not None and hasattr(self.websocket, "exit"):
+            self.websocket.exit()
+
+    def start_in_thread(self):
+        # None while a failed feed waits out its retry delay
+        with self._subscribe_lock:
+            if self.thread is None and time.monotonic() >= self._retry_at:
+                self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+                self.thread.start()
+        return self.thread
+
+
+def _pybit_websocket(testnet):
+    from pybit.unified_trading import WebSocket
+    return WebSocket(testnet=testnet, channel_type="linear")
+
+
+class ReplayWebSocket:
+    # Offline stand-in for pybit's WebSocket: replays recorded ticker messages to subscribers
+    def __init__(self, messages, speed=None, on_finished=None):
+        self.messages = messages
+        self.speed = speed
+        self.on_finished = on_finished
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def ticker_stream(self, symbol, callback):
+        symbols = {symbol} if isinstance(symbol, str) else set(symbol)
+        self._thread = threading.Thread(target=self._replay, args=(symbols, callback), daemon=True)
+        self._thread.start()
+
+    def _replay(self, symbols, callback):
+        previous_ts = None
+        for message in self.messages:
+            if self._stopped.is_set():
+                return
+            if message.get("data", {}).get("symbol") not in symbols:
+                continue
+            if self.speed and previous_ts is not None and message.get("ts"):
+                time.sleep(max(message["ts"] - previous_ts, 0) / 1000 / self.speed)
+            previous_ts = message.get("ts")
+            callback(message)
+        if self.on_finished:
+            self.on_finished()
+
+    def exit(self):
+        self._stopped.set()
+
+
+def load_recording(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_recording(symbols, ticks, start_price=100.0, volatility=0.001, seed=0):
+    rng = np.random.default_rng(seed)
+    walks = start_price * np.exp(np.cumsum(rng.normal(0, volatility, (len(symbols), ticks)), axis=1))
+    ts = 1_700_000_000_000
+    return [{"topic": f"tickers.{symbol}", "type": "snapshot", "ts": ts + i,
+             "data": {"symbol": symbol, "lastPrice": f"{walks[s, i]:.6f}"}}
+            for i in range(ticks) for s, symbol in enumerate(symbols)]
+
+
+def replay_benchmark(messages, plans_per_symbol=100, rungs=20, speed=None):
+    book = PlanBook()
+    symbols = sorted({m["data"]["symbol"] for m in messages if "data" in m})
+    first_price = {}
+    for message in messages:
+        tick = parse_ticker_message(message)
+        if tick:
+            first_price.setdefault(tick[0], tick[1])
+    for symbol in symbols:
+        price = first_price[symbol]
+        for i in range(plans_per_symbol):
+            entries = np.linspace(price * 0.99, price * (0.9 - i * 0.0005), rungs)
+            book.add(symbol, True, entries, np.full(rungs, 100.0), price * 0.85, price * 0.84)
+
+    async def run():
+        feed = LiveFeed(book, lambda: ReplayWebSocket(messages, speed, on_finished=lambda: feed.stop()))
+        await feed.run()
+        return feed.stats.summary()
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Bybit ticks through the live plan tracker")
+    parser.add_argument("--recording", help="JSONL file of recorded ticker messages")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT")
+    parser.add_argument("--ticks", type=int, default=20_000)
+    parser.add_argument("--plans", type=int, default=100, help="tracked plans per symbol")
+    parser.add_argument("--speed", type=float, help="replay at recorded pace times this factor (default: flat out)")
+    args = parser.parse_args()
+
+    if args.recording:
+        messages = load_recording(args.recording)
+    else:
+        messages = synthetic_recording(args.symbols.split(","), args.ticks)
+    stats = replay_benchmark(messages, args.plans, speed=args.speed)
+    for key, value in stats.items():
+        print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
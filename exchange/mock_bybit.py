@@ -0,0 +1,129 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from poscalc.margin import synthetic_tiers
+
+DEFAULT_INSTRUMENTS = {
+    "BTCUSDT": {"tickSize": "0.10", "qtyStep": "0.001", "minOrderQty": "0.001", "maxOrderQty": "100"},
+    "ETHUSDT": {"tickSize": "0.01", "qtyStep": "0.01", "minOrderQty": "0.01", "maxOrderQty": "1000"},
+    "SOLUSDT": {"tickSize": "0.001", "qtyStep": "0.1", "minOrderQty": "0.1", "maxOrderQty": "10000"},
+}
+
+DEFAULT_BASE_LIMITS = {"BTCUSDT": 2_000_000, "ETHUSDT": 1_000_000, "SOLUSDT": 200_000}
+
+
+class MockBybit:
+    # Local stand-in for the Bybit v5 REST endpoints the order ladder uses
+    def __init__(self, instruments=None, requests_per_second=10, latency=0.0, risk_limits=None):
+        self.instruments = instruments or DEFAULT_INSTRUMENTS
+        # Made-up tiers in Bybit's shape, not the exchange's real numbers
+        self.risk_limits = risk_limits or {symbol: synthetic_tiers(limit)
+                                           for symbol, limit in DEFAULT_BASE_LIMITS.items()}
+        self.requests_per_second = requests_per_second
+        self.latency = latency
+        self.orders = []
+        self.batch_requests = 0
+        self.rate_limited = 0
+        self._window = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path not in ("/v5/market/instruments-info", "/v5/market/risk-limit"):
+                    return self._reply({"retCode": 10001, "retMsg": "unknown path"})
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == "/v5/market/risk-limit":
+                    return self._reply(mock.risk_limit(query))
+                self._reply(mock.instruments_info(query))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                if urlparse(self.path).path != "/v5/order/create-batch":
+                    return self._reply({"retCode": 10001, "retMsg": "unknown path"})
+                self._reply(*mock.create_batch(body))
+
+            def _reply(self, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.endpoint
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def instruments_info(self, query):
+        symbols = [query["symbol"]] if "symbol" in query else list(self.instruments)
+        rows = [{"symbol": symbol,
+                 "priceFilter": {"tickSize": self.instruments[symbol]["tickSize"]},
+                 "lotSizeFilter": {key: self.instruments[symbol][key]
+                                   for key in ("qtyStep", "minOrderQty", "maxOrderQty")}}
+                for symbol in symbols if symbol in self.instruments]
+        return {"retCode": 0, "retMsg": "OK", "result": {"category": query.get("category"), "list": rows}}
+
+    def risk_limit(self, query):
+        symbols = [query["symbol"]] if "symbol" in query else list(self.risk_limits)
+        rows = [dict(row, id=i, symbol=symbol, isLowestRisk=int(i == 1))
+                for symbol in symbols for i, row in enumerate(self.risk_limits.get(symbol, ()), start=1)]
+        return {"retCode": 0, "retMsg": "OK", "result": {"category": query.get("category"), "list": rows}}
+
+    def create_batch(self, body):
+        now = time.time()
+        with self._lock:
+            while self._window and self._window[0] <= now - 1:
+                self._window.popleft()
+            if len(self._window) >= self.requests_per_second:
+                self.rate_limited += 1
+                reset = int((self._window[0] + 1) * 1000)
+                return ({"retCode": 10006, "retMsg": "Too many visits!"},
+                        {"X-Bapi-Limit-Reset-Timestamp": str(reset)})
+            self._window.append(now)
+            self.batch_requests += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        results, statuses = [], []
+        with self._lock:
+            for order in body.get("request", []):
+                order_id = f"mock-{next(self._ids)}"
+                self.orders.append(dict(order, orderId=order_id))
+                results.append({"category": body.get("category"), "symbol": order["symbol"], "orderId": order_id,
+                                "orderLinkId": order.get("orderLinkId", "")})
+                statuses.append({"code": 0, "msg": "OK"})
+        return ({"retCode": 0, "retMsg": "OK", "result": {"list": results}, "retExtInfo": {"list": statuses},
+                 "time": int(now * 1000)}, None)
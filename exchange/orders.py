@@ -0,0 +1,181 @@
+import argparse
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Instrument = namedtuple("Instrument", ["symbol", "tick_size", "qty_step", "min_qty", "max_qty"])
+
+RATE_LIMIT_CODE = 10006
+
+
+def make_session(api_key=None, api_secret=None, testnet=True, endpoint=None, timeout=10):
+    # One pybit HTTP object per process: it owns a requests.Session, so connections are pooled.
+    # Rate-limit errors are left to LadderSubmitter so its backoff and latency logging see them.
+    from pybit.unified_trading import HTTP
+    session = HTTP(testnet=testnet, api_key=api_key, api_secret=api_secret, timeout=timeout,
+                   retry_codes={10002})
+    if endpoint:
+        session.endpoint = endpoint
+    return session
+
+
+class InstrumentCache:
+    def __init__(self, session, category="linear"):
+        self.session = session
+        self.category = category
+        self.instruments = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        with self._lock:
+            if symbol not in self.instruments:
+                response = self.session.get_instruments_info(category=self.category, symbol=symbol)
+                rows = response["result"]["list"]
+                if not rows:
+                    raise ValueError(f"Unknown instrument: {symbol}")
+                row = rows[0]
+                lot = row["lotSizeFilter"]
+                self.instruments[symbol] = Instrument(symbol, Decimal(row["priceFilter"]["tickSize"]),
+                                                      Decimal(lot["qtyStep"]), Decimal(lot["minOrderQty"]),
+                                                      Decimal(lot["maxOrderQty"]))
+            return self.instruments[symbol]
+
+
+def round_to_step(value, step, rounding):
+    return (Decimal(repr(float(value))) / step).to_integral_value(rounding) * step
+
+
+def _format(value):
+    return format(value.normalize(), "f")
+
+
+def ladder_orders(instrument, is_long, entry_prices, positions, link_prefix=None):
+    # Buys round down and sells round up to the tick so no rung fills worse than planned;
+    # quantities always round down so the planned risk is never exceeded
+    side = "Buy" if is_long else "Sell"
+    price_rounding = ROUND_FLOOR if is_long else ROUND_CEILING
+    link_prefix = link_prefix or uuid.uuid4().hex[:12]
+    orders, skipped = [], []
+    for i, (price, position) in enumerate(zip(entry_prices, positions), start=1):
+        order_price = round_to_step(price, instrument.tick_size, price_rounding)
+        qty = min(round_to_step(position / float(order_price), instrument.qty_step, ROUND_FLOOR), instrument.max_qty)
+        if qty < instrument.min_qty:
+            skipped.append({'entry': i, 'price': price, 'position': position,
+                            'reason': f"qty below minimum {_format(instrument.min_qty)}"})
+            continue
+        orders.append({"symbol": instrument.symbol, "side": side, "orderType": "Limit", "qty": _format(qty),
+                       "price": _format(order_price), "timeInForce": "GTC", "orderLinkId": f"{link_prefix}-{i}"})
+    return orders, skipped
+
+
+class LadderSubmitter:
+    def __init__(self, session, category="linear", batch_size=10, concurrency=4, max_attempts=6,
+                 backoff=0.25, max_backoff=5.0):
+        self.session = session
+        self.category = category
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _retry_delay(self, error, attempt):
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        reset = (getattr(error, "resp_headers", None) or {}).get("X-Bapi-Limit-Reset-Timestamp")
+        if reset:
+            delay = max(delay, int(reset) / 1000 - time.time())
+        return delay
+
+    def _submit_batch(self, batch):
+        # Never raises: a failed batch reports an error result per order, so batches already placed
+        # by other workers are not lost. Every order is logged with the latency of the request that carried it
+        from pybit.exceptions import InvalidRequestError
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            try:
+                response = self.session.place_batch_order(category=self.category, request=batch)
+            except InvalidRequestError as e:
+                latency_ms = (time.perf_counter() - started) * 1000
+                if e.status_code != RATE_LIMIT_CODE or attempt == self.max_attempts - 1:
+                    return [self._result(order, None, e.status_code, e.message, latency_ms, attempt + 1)
+                            for order in batch]
+                delay = self._retry_delay(e, attempt)
+                logger.warning("Rate limited on batch of %d orders, retrying in %.2fs", len(batch), delay)
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                # Missing keys (PermissionError), network failures, pybit's FailedRequestError
+                latency_ms = (time.perf_counter() - started) * 1000
+                logger.warning("Batch of %d orders failed: %s", len(batch), e)
+                return [self._result(order, None, getattr(e, "status_code", None), getattr(e, "message", None) or
+                                     f"{type(e).__name__}: {e}", latency_ms, attempt + 1) for order in batch]
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            placed = response["result"]["list"]
+            statuses = response.get("retExtInfo", {}).get("list") or [{"code": 0, "msg": "OK"}] * len(batch)
+            return [self._result(order, placed_order.get("orderId"), status["code"], status["msg"], latency_ms,
+                                 attempt + 1)
+                    for order, placed_order, status in zip(batch, placed, statuses)]
+
+    @staticmethod
+    def _result(order, order_id, code, message, latency_ms, attempts):
+        logger.info("%s %s %s @ %s -> %s (%s) in %.1f ms", order["orderLinkId"], order["side"], order["qty"],
+                    order["price"], order_id or code, message, latency_ms)
+        return {'orderLinkId': order["orderLinkId"], 'orderId': order_id, 'price': order["price"],
+                'qty': order["qty"], 'code': code, 'message': message, 'latency_ms': latency_ms,
+                'attempts': attempts}
+
+    def submit(self, orders):
+        batches = [orders[i:i + self.batch_size] for i in range(0, len(orders), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return [result for batch_results in pool.map(self._submit_batch, batches) for result in batch_results]
+
+
+def place_ladder(session, instruments, symbol, is_long, entry_prices, positions, **submitter_options):
+    instrument = instruments.get(symbol)
+    orders, skipped = ladder_orders(instrument, is_long, entry_prices, positions)
+    results = LadderSubmitter(session, instruments.category, **submitter_options).submit(orders)
+    return results, skipped
+
+
+def main():
+    from exchange.mock_bybit import MockBybit
+
+    parser = argparse.ArgumentParser(description="Submit a synthetic order ladder to a local mock of Bybit")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests-per-second", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated server latency in seconds")
+    args = parser.parse_args()
+
+    with MockBybit(requests_per_second=args.requests_per_second, latency=args.latency) as mock:
+        session = make_session("mock-key", "mock-secret", endpoint=mock.endpoint)
+        instruments = InstrumentCache(session)
+        entry_prices = np.linspace(60_000, 50_000, args.orders)
+        positions = np.full(args.orders, 1_000.0)
+
+        started = time.perf_counter()
+        results, skipped = place_ladder(session, instruments, "BTCUSDT", True, entry_prices, positions,
+                                        batch_size=args.batch_size, concurrency=args.concurrency)
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([r['latency_ms'] for r in results if r['latency_ms'] is not None])
+    print(f"orders placed: {sum(r['code'] == 0 for r in results)} of {len(results)} ({len(skipped)} skipped)")
+    print(f"batch requests: {mock.batch_requests}, rate limited: {mock.rate_limited}")
+    print(f"end to end: {elapsed * 1000:.1f} ms, {len(results) / elapsed:.1f} orders/s")
+    if len(latencies):
+        print(f"request latency p50: {np.percentile(latencies, 50):.1f} ms, "
+              f"p99: {np.percentile(latencies, 99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+
+from poscalc.margin import TierTable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_ENV_VAR = "POSCALC_RISK_LIMITS"
+DEFAULT_SNAPSHOT = os.path.join(ROOT, "risk_limits.json")
+
+
+def snapshot_path():
+    return os.environ.get(SNAPSHOT_ENV_VAR, DEFAULT_SNAPSHOT)
+
+
+def fetch_risk_limits(session, symbol, category="linear"):
+    # Public endpoint: works with an unauthenticated session
+    response = session.get_risk_limit(category=category, symbol=symbol)
+    rows = [row for row in response["result"]["list"] if row.get("symbol", symbol) == symbol]
+    if not rows:
+        raise ValueError(f"No risk-limit tiers for {symbol}")
+    return rows
+
+
+def refresh(session, symbols, table=None, path=None, category="linear"):
+    # Fetches every symbol, then rewrites the snapshot once
+    table = table if table is not None else TierTable.load(path or snapshot_path())
+    for symbol in symbols:
+        table.update(symbol, fetch_risk_limits(session, symbol, category))
+    table.fetched = time.time()
+    table.save(path or snapshot_path())
+    return table
+
+
+def main():
+    from exchange.orders import make_session
+
+    parser = argparse.ArgumentParser(description="Refresh the local risk-limit tier snapshot from Bybit")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT")
+    parser.add_argument("--out", help=f"snapshot file (default: ${SNAPSHOT_ENV_VAR} or {DEFAULT_SNAPSHOT})")
+    parser.add_argument("--testnet", action="store_true")
+    parser.add_argument("--mock", action="store_true", help="fetch from a local mock of Bybit instead")
+    args = parser.parse_args()
+
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(",") if symbol.strip()]
+    if args.mock:
+        from exchange.mock_bybit import MockBybit
+        with MockBybit() as mock:
+            table = refresh(make_session(testnet=args.testnet, endpoint=mock.endpoint), symbols, path=args.out)
+    else:
+        table = refresh(make_session(testnet=args.testnet), symbols, path=args.out)
+    for symbol in symbols:
+        tiers = table.tiers[symbol]
+        print(f"{symbol}: {len(tiers.limits)} tiers, up to {tiers.limits[-1]:,.0f} USDT, "
+              f"maintenance margin {tiers.mmr[0]:.2%}-{tiers.mmr[-1]:.2%}")
+    print(f"Saved {len(table)} symbols to {args.out or snapshot_path()}")
+
+
+if __name__ == "__main__":
+    main()
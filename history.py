@@ -0,0 +1,74 @@
+import streamlit as st
+import datetime
+
+from plan_store import plan_store
+from profiling_panel import run_profiled
+from poscalc import profiling
+
+PAGE_SIZE = 50
+
+
+def day_bounds(day_range):
+    # date_input gives one date while the user is still picking the second
+    if not day_range:
+        return None, None
+    start = datetime.datetime.combine(day_range[0], datetime.time()).timestamp()
+    end = datetime.datetime.combine(day_range[-1] + datetime.timedelta(days=1), datetime.time()).timestamp()
+    return start, end
+
+
+def main():
+    st.set_page_config(page_title="Plan History", page_icon=":calculator:", layout="wide")
+    st.title("Plan History")
+    store = plan_store()
+
+    any_value = "All"
+    columns = st.columns(5)
+    filters = {
+        'user': columns[0].selectbox("User", [any_value] + store.distinct("user")),
+        'symbol': columns[1].selectbox("Symbol", [any_value] + store.distinct("symbol")),
+        'direction': columns[2].selectbox("Direction", [any_value, "Long", "Short"]),
+        'page': columns[3].selectbox("Calculator", [any_value, "main", "crypto-main"]),
+    }
+    filters = {column: value for column, value in filters.items() if value != any_value}
+    since, until = day_bounds(columns[4].date_input("Dates", value=()))
+
+    # Keyset cursors: each page starts after the last (created, id) of the page before it
+    query_key = (tuple(sorted(filters.items())), since, until)
+    if st.session_state.get("history_query") != query_key:
+        st.session_state.history_query = query_key
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    with profiling.stage("history_query"):
+        rows = store.query(PAGE_SIZE, cursors[-1], since, until, **filters)
+        total = store.count(since, until, **filters)
+    st.caption(f"{total:,} saved plans, page {len(cursors)} of {max(-(-total // PAGE_SIZE), 1):,}")
+
+    previous, following = st.columns(2)
+    if previous.button("Previous page", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if following.button("Next page", disabled=len(rows) < PAGE_SIZE):
+        cursors.append((rows[-1]['created'], rows[-1]['id']))
+        st.rerun()
+
+    if not rows:
+        st.info("No saved plans match these filters.")
+        return
+    for row in rows:
+        row['created'] = datetime.datetime.fromtimestamp(row['created'])
+    st.dataframe(rows, hide_index=True,
+                 column_config={'created': st.column_config.DatetimeColumn("Saved", format="YYYY-MM-DD HH:mm:ss"),
+                                'full_profit': st.column_config.NumberColumn(format="%.2f"),
+                                'full_loss': st.column_config.NumberColumn(format="%.2f")})
+
+    plan_id = st.selectbox("Plan details", [row['id'] for row in rows])
+    plan = store.get(plan_id)
+    inputs, outputs = st.columns(2)
+    inputs.json(plan['inputs'])
+    outputs.json(plan['outputs'], expanded=False)
+
+
+if __name__ == "__main__":
+    run_profiled("history", main)
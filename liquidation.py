@@ -0,0 +1,68 @@
+import datetime
+
+import streamlit as st
+
+from poscalc.margin import TierTable, ladder_liquidation
+from tables import summary_indices
+
+
+@st.cache_resource
+def risk_limits():
+    # One tier table per process, loaded from the local snapshot; refreshes update it in place
+    from exchange.risk_limits import snapshot_path
+    return TierTable.load(snapshot_path())
+
+
+def tiered_liquidation(symbol, is_long, entry_prices, positions, stop_loss, leverage):
+    # None without tiers for the symbol; the page then keeps its fixed buffer
+    table = risk_limits()
+    if not symbol or symbol not in table:
+        return None
+    return ladder_liquidation(table, symbol, entry_prices, positions, stop_loss, leverage, is_long)
+
+
+def _rungs(mask):
+    flagged = [i for i, hit in enumerate(mask) if hit]
+    shown = [flagged[i] + 1 for i in summary_indices(len(flagged))]
+    return (", ".join(map(str, shown)) if len(shown) == len(flagged)
+            else f"{shown[0]} ... {shown[-1]} ({len(flagged):,} entries)")
+
+
+def liquidation_report(liquidation, symbol, leverage, buffer_price):
+    if liquidation is None:
+        st.markdown(f"- **Liquidation Price:** {buffer_price:.4f} (stop ± fixed buffer; no risk-limit tiers "
+                    f"for {symbol or 'this plan'})")
+        return
+    st.markdown(f"- **Liquidation Price after all entries ({leverage:g}x, tiered):** "
+                f"{float(liquidation.full_fill[0]):.4f}")
+    if liquidation.inside_stop[0].any():
+        st.warning(f"Liquidation lands before the stop at entries {_rungs(liquidation.inside_stop[0])}; "
+                   f"lower the leverage or the size.")
+    if liquidation.over_limit[0].any():
+        st.warning(f"At entries {_rungs(liquidation.over_limit[0])} the position exceeds {symbol}'s risk limit "
+                   f"or the tier's maximum leverage.")
+
+
+def risk_limits_panel(symbol):
+    table = risk_limits()
+    if table.fetched:
+        fetched = datetime.datetime.fromtimestamp(table.fetched).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"Tiers for {len(table)} symbols, fetched {fetched}.")
+    else:
+        st.caption("No risk-limit snapshot yet; liquidation uses the fixed buffer.")
+    if st.button(f"Refresh Risk Limits for {symbol or 'the symbol above'}", disabled=not symbol):
+        from pybit.exceptions import FailedRequestError, InvalidRequestError
+        from exchange.orders import make_session
+        from exchange.risk_limits import refresh, snapshot_path
+        try:
+            refresh(make_session(testnet=False), [symbol], table, snapshot_path())
+        except (ValueError, FailedRequestError, InvalidRequestError) as e:
+            st.warning(str(e))
+        else:
+            st.success(f"{symbol}: {len(table.tiers[symbol].limits)} tiers saved.")
+
+
+def plan_liquidation_price(symbol, is_long, entry_prices, positions, stop_loss, leverage, buffer_price):
+    # Full-fill liquidation for tracking and saving: tiered when the snapshot has the symbol
+    liquidation = tiered_liquidation(symbol, is_long, entry_prices, positions, stop_loss, leverage)
+    return buffer_price if liquidation is None else float(liquidation.full_fill[0])
@@ -1,20 +1,19 @@
 import streamlit as st
-import plotly.graph_objects as go
 import random
 
+from charts import gains_figure, outcome_figure
+from liquidation import liquidation_report, risk_limits_panel, tiered_liquidation
+from profiling_panel import run_profiled
+from poscalc import (MAX_TRADES, build_ladder, compounding_risk, interpolate_entries, liquidation_price, profiling,
+                     simulate_paths)
+
 def calc_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profit,
                    liquidation_buffer):
     risk_amount = portfolio_size * (risk_level / 100)
-    risk_per_entry = [risk_amount * prop for prop in entry_proportions]
-    positions = [risk / ((price - stop_loss) / price) for price, risk in zip(entry_prices, risk_per_entry)]
-    profits = [sum(positions[:i + 1]) * (
-            take_profit - sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(
-        positions[:i + 1])) / (
-                       sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(
-                   positions[:i + 1])) for i in range(len(entry_prices))]
-    full_profit, full_loss = profits[-1], portfolio_size * (risk_level / 100)
-    liquidation_price = stop_loss * (1 - liquidation_buffer / 100)
-    return positions, profits, full_profit, full_loss, liquidation_price
+    ladder = build_ladder(risk_amount, entry_prices, stop_loss, entry_proportions, take_profit)
+    full_profit, full_loss = float(ladder.profits[-1]), risk_amount
+    return (ladder.positions.tolist(), ladder.profits.tolist(), full_profit, full_loss,
+            float(liquidation_price(stop_loss, liquidation_buffer)))
 
 def print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price, original_entry_prices=None):
     st.subheader("Results")
@@ -32,47 +31,8 @@ def print_results(entry_prices, positions, profits, full_profit, full_loss, liqu
     st.write(f"- Full Loss: {full_loss:.2f}")
 
 def visualize_gains(entry_prices, profits, portfolio_size, full_profit, full_loss, original_entry_prices=None):
-    scenarios = [f"Entry {i+1}" for i in range(len(entry_prices))]
-    gains = [profit for profit in profits]
-
-    fig = go.Figure(data=[go.Bar(x=scenarios, y=gains, text=[f"{gain:.2f}" for gain in gains], textposition='auto')])
-
-    fig.update_layout(title='Gains by Entry Scenario',
-                      xaxis_title='Scenario',
-                      yaxis_title='Gain',
-                      showlegend=False)
-
-    st.plotly_chart(fig)
-
-    if len(profits) == 1:
-        win_all = portfolio_size + full_profit
-        lose_portfolio = portfolio_size - full_loss
-        fig = go.Figure(data=[
-            go.Bar(x=['Win'], y=[win_all], text=[f"{win_all:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Lose'], y=[lose_portfolio], text=[f"{lose_portfolio:.2f}"], textposition='auto', marker_color='red')
-        ])
-    elif len(profits) == 2:
-        win_e1 = portfolio_size + profits[0]
-        win_all = portfolio_size + full_profit
-        lose_portfolio = portfolio_size - full_loss
-
-        fig = go.Figure(data=[
-            go.Bar(x=['Win (E1)'], y=[win_e1], text=[f"{win_e1:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Win (All Entries)'], y=[win_all], text=[f"{win_all:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Lose'], y=[lose_portfolio], text=[f"{lose_portfolio:.2f}"], textposition='auto', marker_color='red')
-        ])
-    else:
-        win_e1 = portfolio_size + profits[0]
-        win_e1_e2 = portfolio_size + profits[1]
-        win_all = portfolio_size + full_profit
-        lose_portfolio = portfolio_size - full_loss
-
-        fig = go.Figure(data=[
-            go.Bar(x=['Win (E1)'], y=[win_e1], text=[f"{win_e1:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Win (E1+E2)'], y=[win_e1_e2], text=[f"{win_e1_e2:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Win (All Entries)'], y=[win_all], text=[f"{win_all:.2f}"], textposition='auto', marker_color='green'),
-            go.Bar(x=['Lose'], y=[lose_portfolio], text=[f"{lose_portfolio:.2f}"], textposition='auto', marker_color='red')
-        ])
+    st.plotly_chart(gains_figure(profits))
+    st.plotly_chart(outcome_figure(portfolio_size, profits, full_loss))
 
 def calc_risk_reward(entry_prices, stop_loss, take_profit):
     avg_entry_price = sum(entry_prices) / len(entry_prices)
@@ -81,7 +41,7 @@ def calc_risk_reward(entry_prices, stop_loss, take_profit):
     risk_reward_ratio = reward / risk
     return risk_reward_ratio
 
-def simulate_compound_strategy(portfolio_size, risk_level, win_rate, num_trades):
+def simulate_compound_strategy(portfolio_size, risk_level, win_rate, num_trades, reward_multiple=3):
     portfolio = portfolio_size
     total_gains = 0
     total_losses = 0
@@ -90,7 +50,7 @@ def simulate_compound_strategy(portfolio_size, risk_level, win_rate, num_trades)
         risk_amount = portfolio * (risk_level / 100)
         if random.random() < win_rate:
             # Win trade
-            gain = risk_amount * 3  # Assuming a 1:3 risk-reward ratio for winning trades
+            gain = risk_amount * reward_multiple
             portfolio += gain
             total_gains += gain
         else:
@@ -105,6 +65,40 @@ def simulate_compound_strategy(portfolio_size, risk_level, win_rate, num_trades)
         'total_losses': total_losses
     }
 
+def visualize_simulation(simulation):
+    import plotly.graph_objects as go
+
+    percentiles = simulation['percentiles']
+    bands = simulation['bands']
+    trades = list(range(bands.shape[1]))
+
+    fig = go.Figure()
+    # Fill each band between its outer percentile pair, widest first
+    for low in range(len(percentiles) // 2):
+        high = len(percentiles) - 1 - low
+        fig.add_trace(go.Scatter(x=trades, y=bands[high], mode='lines', line=dict(width=0), showlegend=False,
+                                 hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=trades, y=bands[low], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor=f'rgba(0, 128, 0, {0.15 * (low + 1):.2f})',
+                                 name=f'P{percentiles[low]}-P{percentiles[high]}'))
+    if len(percentiles) % 2:
+        middle = len(percentiles) // 2
+        fig.add_trace(go.Scatter(x=trades, y=bands[middle], mode='lines', line=dict(color='green'),
+                                 name=f'P{percentiles[middle]}'))
+
+    fig.update_layout(title='Portfolio Percentile Bands',
+                      xaxis_title='Trade',
+                      yaxis_title='Portfolio')
+
+    st.plotly_chart(fig)
+
+    for p, value in simulation['final_percentiles'].items():
+        st.write(f"- Final Portfolio P{p}: {value:.2f}")
+    st.write(f"- Mean Final Portfolio: {simulation['mean_final']:.2f}")
+    for p, drawdown in simulation['max_drawdown_percentiles'].items():
+        st.write(f"- Max Drawdown P{p}: {drawdown * 100:.2f}%")
+    st.write(f"- Risk of Ruin: {simulation['risk_of_ruin'] * 100:.2f}%")
+
 def main():
     st.set_page_config(page_title="Position Calculator", page_icon=":calculator:", layout="centered")
     st.title("Position Calculator")
@@ -125,39 +119,37 @@ def main():
         entry_prices = st.text_input("Entry Prices (comma-separated)")
         stop_loss = st.number_input("Stop Loss", step=0.0000001, format="%0.7f")
         take_profit = st.number_input("Take Profit", step=0.0000001, format="%0.7f")
+        symbol = st.text_input("Symbol (optional, for tiered liquidation)").strip().upper()
+        leverage = st.number_input("Leverage", min_value=1.0, value=10.0)
+        # Fallback for symbols without risk-limit tiers
         liquidation_buffer = 1
 
     if st.button("Calculate"):
         if entry_prices and stop_loss and take_profit:
-            original_entry_prices = [float(x.strip()) for x in entry_prices.split(",")]
-
-            if add_entries:
-                entry_prices = []
-                for i in range(len(original_entry_prices) - 1):
-                    entry_prices.append(original_entry_prices[i])
-                    price_diff = (original_entry_prices[i + 1] - original_entry_prices[i]) / 5
-                    for j in range(1, 5):
-                        entry_prices.append(original_entry_prices[i] + price_diff * j)
-                entry_prices.append(original_entry_prices[-1])
-            else:
-                entry_prices = original_entry_prices
+            with profiling.stage("parse_inputs"):
+                original_entry_prices = [float(x.strip()) for x in entry_prices.split(",")]
 
-            # Calculate the risk tolerance based on the current portfolio value and previous winning trade's profit
-            if previous_win_profit > 0:
-                old_portfolio_size = portfolio_size - previous_win_profit
-            else:
-                old_portfolio_size = portfolio_size
+                if add_entries:
+                    entry_prices = interpolate_entries(original_entry_prices, 5).tolist()
+                else:
+                    entry_prices = original_entry_prices
 
-            og_risk_value = old_portfolio_size * (1 - base_risk_level / 100)
-            risk_tolerance = (portfolio_size - og_risk_value) / portfolio_size * 100
+            # Calculate the risk tolerance based on the current portfolio value and previous winning trade's profit
+            risk_tolerance = compounding_risk(portfolio_size, base_risk_level, previous_win_profit)
 
             num_entries = len(entry_prices)
             entry_proportions = [1/num_entries] * num_entries
-            positions, profits, full_profit, full_loss, liquidation_price = calc_positions(
-                portfolio_size, risk_tolerance, entry_prices, stop_loss, entry_proportions, take_profit, liquidation_buffer
-            )
-            print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price, original_entry_prices)
-            visualize_gains(entry_prices, profits, portfolio_size, full_profit, full_loss, original_entry_prices)
+            with profiling.stage("calc_positions"):
+                positions, profits, full_profit, full_loss, liquidation_price = calc_positions(
+                    portfolio_size, risk_tolerance, entry_prices, stop_loss, entry_proportions, take_profit, liquidation_buffer
+                )
+            with profiling.stage("print_results"):
+                print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price, original_entry_prices)
+            with profiling.stage("tiered_liquidation"):
+                liquidation = tiered_liquidation(symbol, True, entry_prices, positions, stop_loss, leverage)
+            liquidation_report(liquidation, symbol, leverage, liquidation_price)
+            with profiling.stage("visualize_gains"):
+                visualize_gains(entry_prices, profits, portfolio_size, full_profit, full_loss, original_entry_prices)
 
             risk_reward_ratio = calc_risk_reward(entry_prices, stop_loss, take_profit)
             st.write(f"- Risk-Reward Ratio: {risk_reward_ratio:.2f}")
@@ -165,6 +157,23 @@ def main():
         else:
             st.warning("Please fill in all the required fields.")
 
+    with st.expander("Risk Limits"):
+        risk_limits_panel(symbol)
+
+    with st.expander("Monte Carlo Simulation"):
+        win_rate = st.number_input("Win Rate (%)", min_value=0.0, max_value=100.0, value=40.0)
+        reward_multiple = st.number_input("Reward Multiple (R)", min_value=0.0, value=3.0)
+        num_trades = st.number_input("Trades per Path", min_value=1, max_value=MAX_TRADES, value=100, step=1)
+        num_paths = st.number_input("Paths", min_value=1000, value=100_000, step=1000)
+        seed = st.number_input("Seed", min_value=0, value=42, step=1)
+
+        if st.button("Simulate"):
+            with profiling.stage("simulate_paths"):
+                simulation = simulate_paths(portfolio_size, base_risk_level, win_rate / 100, int(num_trades),
+                                            int(num_paths), reward_multiple, int(seed))
+            with profiling.stage("visualize_simulation"):
+                visualize_simulation(simulation)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled("main-backup", main)
\ No newline at end of file
@@ -1,82 +1,192 @@
 import streamlit as st
-import pandas as pd
-import random
+import os
+
+from charts import tp_heatmap
+from liquidation import liquidation_report, plan_liquidation_price, risk_limits, risk_limits_panel, tiered_liquidation
+from plan_store import plan_store
+from profiling_panel import run_profiled
+from tables import fragment, number_columns, paged_dataframe, summary_indices
+from poscalc import profiling
+from poscalc import (OBJECTIVES, WEIGHT_SCHEMES, Portfolio, RiskBudget, calc_positions_batch, grid_axis, iter_sweep,
+                     memoize, normalize_csv, parse_csv_floats, parse_trims)
 
 
 def calc_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
-                   liquidation_buffer, additional_risk, is_long):
-    if additional_risk > 0:
-        temp_portfolio_size = portfolio_size - additional_risk
-        risk_amount = (temp_portfolio_size * (risk_level / 100))
-        total_risk = risk_amount + additional_risk
-    else:
-        risk_amount = (portfolio_size * (risk_level / 100))
-        total_risk = risk_amount
+                   liquidation_buffer, additional_risk, is_long, trims=None):
+    result = calc_positions_batch(portfolio_size, risk_level, [entry_prices], stop_loss, [entry_proportions],
+                                  [take_profits], liquidation_buffer, additional_risk, is_long,
+                                  None if trims is None else [trims])
+    positions = result.positions[0].tolist()
+    profits = [list(zip(entry_profits, entry_coins))
+               for entry_profits, entry_coins in zip(result.profits[0].tolist(), result.coins[0].tolist())]
+    return (positions, profits, float(result.full_profit[0]), float(result.full_loss[0]),
+            float(result.liquidation_price[0]))
 
-    risk_per_entry = [total_risk * prop for prop in entry_proportions]
 
-    if is_long:
-        positions = [risk / ((price - stop_loss) / price) for price, risk in zip(entry_prices, risk_per_entry)]
-    else:
-        positions = [risk / ((stop_loss - price) / price) for price, risk in zip(entry_prices, risk_per_entry)]
-
-    profits = []
-    for i in range(len(entry_prices)):
-        total_invested = sum(positions[:i + 1])
-        avg_buy_price = sum(entry_prices[:i + 1]) / (i + 1)
-        total_coins = total_invested / avg_buy_price
-
-        entry_profits = []
-        remaining_coins = total_coins
-        for tp in take_profits:
-            if tp != take_profits[-1]:
-                coins_to_trim = remaining_coins * 0.25
-                if is_long:
-                    trim_profit = coins_to_trim * (tp - avg_buy_price)
-                else:
-                    trim_profit = coins_to_trim * (avg_buy_price - tp)
-                remaining_coins -= coins_to_trim
-            else:
-                if is_long:
-                    trim_profit = remaining_coins * (tp - avg_buy_price)
-                else:
-                    trim_profit = remaining_coins * (avg_buy_price - tp)
-            entry_profits.append((trim_profit, coins_to_trim if tp != take_profits[-1] else remaining_coins))
-        profits.append(entry_profits)
-
-    full_profit = profits[-1][-1][0]
-    full_loss = total_risk
-    if is_long:
-        liquidation_price = stop_loss * (1 - liquidation_buffer / 100)
-    else:
-        liquidation_price = stop_loss * (1 + liquidation_buffer / 100)
-    return positions, profits, full_profit, full_loss, liquidation_price
+def full_fill_profit(profits):
+    # Every rung filled and every take profit hit, as the sweep, headless runs and crypto page report it
+    return sum(profit for profit, coins in profits[-1])
+
+
+def tp_headers(take_profits):
+    return [f"TP {i + 1}: {tp:.4f}" for i, tp in enumerate(take_profits)]
+
+
+def results_table(entry_prices, positions, profits, take_profits):
+    # Numbers stay numeric; formatting happens in the grid, not in the payload
+    import pandas as pd
+
+    table = pd.DataFrame({'Entry': range(1, len(entry_prices) + 1), 'Entry Price': entry_prices,
+                          'Position': positions})
+    tp_profits = pd.DataFrame([[profit for profit, coins in entry_profits] for entry_profits in profits],
+                              columns=tp_headers(take_profits))
+    return pd.concat([table, tp_profits], axis=1)
+
+
+@memoize(maxsize=256, ttl=3600, name="main.plan_results")
+def plan_results(portfolio_size, risk_level, entry_prices, stop_loss, take_profits, liquidation_buffer,
+                 additional_risk, is_long, trims=""):
+    with profiling.stage("parse_inputs"):
+        entry_prices = parse_csv_floats(entry_prices)
+        take_profits = parse_csv_floats(take_profits)
+        num_entries = len(entry_prices)
+        entry_proportions = [1 / num_entries] * num_entries
+        trims = parse_trims(trims, len(take_profits))
+    with profiling.stage("calc_positions"):
+        positions, profits, full_profit, full_loss, liquidation_price = calc_positions(
+            portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
+            liquidation_buffer, additional_risk, is_long, trims
+        )
+    with profiling.stage("results_table"):
+        table = results_table(entry_prices, positions, profits, take_profits)
+    return entry_prices, positions, profits, full_profit, full_loss, liquidation_price, take_profits, table
 
 
 def print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price, take_profits,
-                  portfolio_size):
+                  portfolio_size, table=None):
     st.subheader("Results")
 
-    tp_headers = [""] + [f"TP {i + 1}: {tp:.4f}" for i, tp in enumerate(take_profits)]
-    table_data = []
+    # Summary rows first; long ladders list only the first and full fill here, the rest is in the grid
+    summary = [f"- **Portfolio after E{i + 1} -> Full TP:** {portfolio_size + profits[i][-1][0]:.2f}"
+               for i in summary_indices(len(entry_prices))]
+    summary.append(f"- **Full Loss:** {full_loss:.2f}")
+    summary.append(f"- **Portfolio after Loss:** {portfolio_size - full_loss:.2f}")
+    st.markdown("\n".join(summary))
+
+    if table is None:
+        table = results_table(entry_prices, positions, profits, take_profits)
+    formats = {'Entry Price': "%.2f", 'Position': "%.2f"}
+    formats.update({header: "%.4f" for header in tp_headers(take_profits)})
+    with profiling.stage("render_table"):
+        paged_dataframe(table, "main_results_page", number_columns(formats))
+
+    if len(take_profits) > 1 or len(entry_prices) > 1:
+        with profiling.stage("tp_heatmap"):
+            st.plotly_chart(tp_heatmap([[profit for profit, coins in entry_profits] for entry_profits in profits],
+                                       [f"Entry {i + 1}" for i in range(len(entry_prices))],
+                                       tp_headers(take_profits)))
+
+
+def run_parameter_sweep(portfolio_size, risk_level, additional_risk, is_long, entry_prices, stop_range, tp_ranges,
+                        entry_counts, weight_schemes, objective, win_rate, top_n, liquidation_buffer, trims, symbol,
+                        leverage):
+    import pandas as pd
+
+    entry_prices = parse_csv_floats(entry_prices)
+    stop_losses = grid_axis(*parse_csv_floats(stop_range))
+    tp_levels = [grid_axis(*parse_csv_floats(group)) for group in tp_ranges.split(";") if group.strip()]
+    entry_counts = [int(n) for n in parse_csv_floats(entry_counts)]
+
+    progress = st.progress(0.0)
+    table = st.empty()
+    sweep = iter_sweep(portfolio_size, risk_level, entry_prices[0], entry_prices[-1], stop_losses, tp_levels,
+                       entry_counts, weight_schemes, is_long, additional_risk, liquidation_buffer, win_rate,
+                       objective, top_n, trims=parse_trims(trims, len(tp_levels)), symbol=symbol, tiers=risk_limits(),
+                       leverage=leverage, workers=os.cpu_count())
+    top = []
+    for done, total, top in sweep:
+        progress.progress(done / total, text=f"Evaluated {done:,} of {total:,} setups")
+        table.dataframe(pd.DataFrame(top), hide_index=True)
+    return top
+
+
+@st.cache_resource
+def plan_reviewer():
+    from review.llm import (CACHE_ENV_VAR, DEFAULT_CACHE_DIR, DEFAULT_MODEL, MODEL_ENV_VAR, ResponseCache, Reviewer,
+                            make_model)
+    name = os.environ.get(MODEL_ENV_VAR, DEFAULT_MODEL)
+    return Reviewer(make_model(name), name, ResponseCache(os.environ.get(CACHE_ENV_VAR, DEFAULT_CACHE_DIR)))
+
+
+def open_reviewer():
+    try:
+        return plan_reviewer()
+    except ImportError:
+        st.warning("Plan review needs langchain_groq (pip install -r requirements.txt), "
+                   "or set POSCALC_REVIEW_MODEL=stub for the offline stub.")
+    except Exception as e:
+        # A missing GROQ_API_KEY or an unknown model name fails here, when the client is built
+        st.warning(f"Could not start the chat model: {e}")
+    return None
+
+
+@st.cache_resource
+def live_tracker():
+    from exchange.live import LiveFeed, PlanBook
+    book = PlanBook()
+    return book, LiveFeed(book)
 
-    for i in range(len(entry_prices)):
-        row = [f"Entry {i + 1} ({entry_prices[i]:.2f}) - Position: {positions[i]:.2f}"]
-        row.extend([f"{profit:.4f}" for profit, coins in profits[i]])
-        table_data.append(row)
 
-    df = pd.DataFrame(table_data, columns=tp_headers)
-    st.table(df)
+@st.cache_resource
+def open_portfolio(user):
+    # One book of open plans per user, shared by every session in this process; each session's risk
+    # settings stay in its RiskBudget and are never written to the shared book
+    return Portfolio()
 
-    st.markdown("---")  # Add a horizontal line
 
-    # Use markdown for the results
-    for i in range(len(entry_prices)):
-        portfolio_after_tp = portfolio_size + profits[i][-1][0]
-        st.markdown(f"- **Portfolio after E{i + 1} -> Full TP:** {portfolio_after_tp:.2f}")
+def portfolio_panel(portfolio, budget):
+    totals = portfolio.aggregate()
+    cap = budget.portfolio_size * budget.max_risk_pct / 100
+    st.markdown(f"- **Open plans:** {totals['plans']}\n"
+                f"- **Risk if every plan fills and stops:** {totals['risk']:.2f} of {cap:.2f}\n"
+                f"- **Risk on filled rungs:** {totals['open_risk']:.2f}\n"
+                f"- **Margin at liquidation (filled / planned):** {totals['open_margin']:.2f} / "
+                f"{totals['margin']:.2f}\n"
+                f"- **Remaining risk budget:** {portfolio.remaining_risk(budget):.2f}")
+    if not totals['plans']:
+        return
+    import pandas as pd
+    st.dataframe(pd.DataFrame(portfolio.breakdown()), hide_index=True)
+    st.dataframe(pd.DataFrame(portfolio.rows()), hide_index=True)
 
-    st.markdown(f"- **Full Loss:** {full_loss:.2f}")
-    st.markdown(f"- **Portfolio after Loss:** {portfolio_size - full_loss:.2f}")
+
+@st.cache_resource
+def exchange_session(testnet):
+    from exchange.orders import InstrumentCache, make_session
+    session = make_session(os.environ.get("BYBIT_API_KEY"), os.environ.get("BYBIT_API_SECRET"), testnet,
+                           os.environ.get("BYBIT_ENDPOINT"))
+    return session, InstrumentCache(session)
+
+
+@fragment(run_every=1)
+def live_plans_table(book, feed):
+    import pandas as pd
+    # Retries a feed whose socket failed to open; the feed backs off between attempts
+    feed.start_in_thread()
+    if feed.error is not None:
+        st.warning(f"Price feed unavailable, retrying: {feed.error}")
+    st.dataframe(pd.DataFrame(book.snapshot()), hide_index=True)
+    stats = feed.stats.summary()
+    st.caption(f"{stats['ticks']:,} ticks, {stats['ticks_per_sec']:.1f}/s, "
+               f"p99 processing {stats['processing_p99_us']:.0f} us")
+
+
+def live_plans_panel(book, feed):
+    # The polling fragment only runs once there is something to track
+    if not book.snapshot():
+        st.caption("No tracked plans yet.")
+        return
+    live_plans_table(book, feed)
 
 
 def main():
@@ -95,26 +205,199 @@ def main():
         portfolio_size = st.number_input("Portfolio Size", value=default_portfolio_size)
         risk_level = st.number_input("Risk Level", value=3.0)
         additional_risk = st.number_input("Additional Risk ($)", value=0.0)
+        symbol = st.text_input("Symbol", value="BTCUSDT").strip().upper()
         entry_prices = st.text_input("Entry Prices (comma-separated)")
         stop_loss = st.number_input("Stop Loss", step=0.0000001, format="%0.7f")
         take_profits = st.text_input("Take Profits (comma-separated)")
+        trims = st.text_input("TP Trims (% of remaining per TP, last TP closes the rest)", value="25")
+        try:
+            parse_trims(normalize_csv(trims), 0)
+        except ValueError as e:
+            # Reported once here; every action below that needs the trims stays idle until they are fixed
+            st.warning(str(e))
+            trims = None
+        leverage = st.number_input("Leverage", min_value=1.0, value=10.0)
+        # Fallback for symbols without risk-limit tiers
         liquidation_buffer = 1
 
-    if st.button("Calculate"):
+    if st.button("Calculate") and trims is not None:
         if entry_prices and stop_loss and take_profits:
-            entry_prices = [float(x.strip()) for x in entry_prices.split(",")]
-            take_profits = [float(x.strip()) for x in take_profits.split(",")]
-            num_entries = len(entry_prices)
-            entry_proportions = [1 / num_entries] * num_entries
-            positions, profits, full_profit, full_loss, liquidation_price = calc_positions(
-                portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
-                liquidation_buffer, additional_risk, is_long
-            )
-            print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price, take_profits,
-                          portfolio_size)
+            with profiling.stage("plan_results"):
+                (entry_prices, positions, profits, full_profit, full_loss, liquidation_price, take_profits,
+                 table) = plan_results(portfolio_size, risk_level, normalize_csv(entry_prices), stop_loss,
+                                       normalize_csv(take_profits), liquidation_buffer, additional_risk, is_long,
+                                       normalize_csv(trims))
+            with profiling.stage("print_results"):
+                print_results(entry_prices, positions, profits, full_profit, full_loss, liquidation_price,
+                              take_profits, portfolio_size, table)
+            with profiling.stage("tiered_liquidation"):
+                liquidation = tiered_liquidation(symbol, is_long, entry_prices, positions, stop_loss, leverage)
+            liquidation_report(liquidation, symbol, leverage, liquidation_price)
+            if liquidation is not None:
+                liquidation_price = float(liquidation.full_fill[0])
+            plan_store().save("main", user, symbol, "Long" if is_long else "Short",
+                              inputs={'portfolio_size': portfolio_size, 'risk_level': risk_level,
+                                      'additional_risk': additional_risk, 'entry_prices': list(entry_prices),
+                                      'stop_loss': stop_loss, 'take_profits': list(take_profits), 'trims': trims},
+                              outputs={'positions': positions, 'full_profit': full_fill_profit(profits),
+                                       'full_loss': full_loss,
+                                       'liquidation_price': liquidation_price,
+                                       'tp_profits': [[profit for profit, coins in row] for row in profits]})
         else:
             st.warning("Please fill in all the required fields.")
 
+    with st.expander("Parameter Sweep"):
+        stop_range = st.text_input("Stop Loss Range (low, high, steps)")
+        tp_ranges = st.text_input("Take Profit Ranges (low, high, steps; one group per TP level)")
+        entry_counts = st.text_input("Number of Entries (comma-separated)", value="1, 2, 3")
+        weight_schemes = st.multiselect("Weight Schemes", [scheme for scheme in WEIGHT_SCHEMES if scheme != "custom"],
+                                        default=["even"])
+        objective = st.selectbox("Rank By", OBJECTIVES)
+        win_rate = st.number_input("Win Rate for Expected Value (%)", min_value=0.0, max_value=100.0, value=50.0)
+        top_n = st.number_input("Top Setups", min_value=1, value=20, step=1)
+        review_top = st.number_input("Review Best Setups with the Chat Model (0 = off)", min_value=0, value=0, step=1)
+
+        if st.button("Run Sweep") and trims is not None:
+            if entry_prices and stop_range and tp_ranges and entry_counts and weight_schemes:
+                with profiling.stage("parameter_sweep"):
+                    top = run_parameter_sweep(portfolio_size, risk_level, additional_risk, is_long, entry_prices,
+                                              stop_range, tp_ranges, entry_counts, weight_schemes, objective,
+                                              win_rate / 100, int(top_n), liquidation_buffer, trims, symbol,
+                                              leverage)
+                reviewer = open_reviewer() if review_top and top else None
+                if reviewer is not None:
+                    # One batched request for all of them; setups reviewed before come from the cache
+                    setups = [{'side': "Long" if is_long else "Short", 'portfolio_size': portfolio_size,
+                               'risk_level': risk_level, 'entry_prices': parse_csv_floats(entry_prices), **row}
+                              for row in top[:int(review_top)]]
+                    with st.spinner(f"Reviewing {len(setups)} setups"), profiling.stage("review_setups"):
+                        try:
+                            reviews = reviewer.review_many(setups)
+                        except TimeoutError:
+                            reviews = []
+                            st.warning("The chat model timed out.")
+                        except Exception as e:
+                            reviews = []
+                            st.warning(f"The chat model failed: {e}")
+                    for i, text in enumerate(reviews):
+                        st.markdown(f"**Setup {i + 1}**\n\n{text}")
+            else:
+                st.warning("Please fill in the entry prices and all sweep fields.")
+
+    with st.expander("Plan Review"):
+        if st.button("Review Plan") and trims is not None:
+            if not (entry_prices and stop_loss and take_profits):
+                st.warning("Please fill in all the required fields.")
+            else:
+                # The model client is only built once the plan itself computes
+                plan = plan_results(portfolio_size, risk_level, normalize_csv(entry_prices), stop_loss,
+                                    normalize_csv(take_profits), liquidation_buffer, additional_risk, is_long,
+                                    normalize_csv(trims))
+                reviewer = open_reviewer()
+                if reviewer is not None:
+                    review = {'symbol': symbol, 'side': "Long" if is_long else "Short",
+                              'portfolio_size': portfolio_size, 'risk_level': risk_level, 'entry_prices': plan[0],
+                              'positions': plan[1], 'stop_loss': stop_loss, 'take_profits': plan[6], 'trims': trims,
+                              'full_profit': full_fill_profit(plan[2]), 'full_loss': plan[4],
+                              'liquidation_price': plan_liquidation_price(symbol, is_long, plan[0], plan[1], stop_loss,
+                                                                          leverage, plan[5])}
+                    try:
+                        with profiling.stage("review_plan"):
+                            st.write_stream(reviewer.stream(review))
+                    except TimeoutError:
+                        st.warning("The chat model timed out.")
+                    except Exception as e:
+                        st.warning(f"The chat model failed: {e}")
+                    stats = reviewer.stats()
+                    st.caption(f"Review cache: {stats['hit_rate']:.0%} hit rate, {stats['requests']} model requests")
+
+    with st.expander("Live Tracking"):
+        book, feed = live_tracker()
+
+        if st.button("Track Plan") and trims is not None:
+            if entry_prices and stop_loss and take_profits and symbol:
+                plan = plan_results(portfolio_size, risk_level, normalize_csv(entry_prices), stop_loss,
+                                    normalize_csv(take_profits), liquidation_buffer, additional_risk, is_long,
+                                    normalize_csv(trims))
+                book.add(symbol, is_long, plan[0], plan[1], stop_loss,
+                         plan_liquidation_price(symbol, is_long, plan[0], plan[1], stop_loss, leverage, plan[5]))
+                feed.start_in_thread()
+                feed.subscribe([symbol])
+            else:
+                st.warning("Please fill in all the required fields and a symbol.")
+
+        live_plans_panel(book, feed)
+
+    with st.expander("Order Placement"):
+        testnet = st.checkbox("Use Bybit testnet", value=True)
+        confirmed = st.checkbox(f"I confirm placing this ladder on {symbol or 'the symbol above'}")
+
+        if st.button("Place Ladder") and trims is not None:
+            if not (entry_prices and stop_loss and take_profits and symbol):
+                st.warning("Please fill in all the required fields and a symbol.")
+            elif not confirmed:
+                st.warning("Please confirm before placing orders.")
+            else:
+                plan = plan_results(portfolio_size, risk_level, normalize_csv(entry_prices), stop_loss,
+                                    normalize_csv(take_profits), liquidation_buffer, additional_risk, is_long,
+                                    normalize_csv(trims))
+                from pybit.exceptions import FailedRequestError, InvalidRequestError
+                from exchange.orders import place_ladder
+                try:
+                    session, instruments = exchange_session(testnet)
+                    with profiling.stage("place_ladder"):
+                        results, skipped = place_ladder(session, instruments, symbol, is_long, plan[0], plan[1])
+                except (ValueError, OSError, FailedRequestError, InvalidRequestError) as e:
+                    # Missing BYBIT_API_KEY / BYBIT_API_SECRET, network errors and unknown symbols
+                    st.warning(f"Could not place the ladder: {e}")
+                else:
+                    placed = sum(result['code'] == 0 for result in results)
+                    st.markdown(f"- **Orders placed:** {placed} of {len(results)}")
+                    if placed < len(results):
+                        st.warning(f"{len(results) - placed} orders failed; see the message column.")
+                    if results:
+                        import pandas as pd
+                        st.dataframe(pd.DataFrame(results), hide_index=True)
+                    for order in skipped:
+                        st.warning(f"Entry {order['entry']} ({order['price']}) skipped: {order['reason']}")
+
+    with st.expander("Risk Limits"):
+        risk_limits_panel(symbol)
+
+    with st.expander("Portfolio"):
+        portfolio = open_portfolio(user)
+        max_risk_pct = st.number_input("Max Open Risk (% of portfolio)", min_value=0.0, value=10.0)
+        symbol_cap = st.number_input("Max Risk per Symbol (% of portfolio, 0 = no cap)", min_value=0.0, value=5.0)
+        budget = RiskBudget(portfolio_size, max_risk_pct, symbol_cap or None)
+
+        if st.button("Add Plan to Portfolio"):
+            if entry_prices and stop_loss and symbol:
+                try:
+                    plan_id = portfolio.open_plan(budget, symbol, is_long, parse_csv_floats(entry_prices), stop_loss,
+                                                  risk_level, additional_risk, liquidation_buffer=liquidation_buffer,
+                                                  tiers=risk_limits(), leverage=leverage)
+                except ValueError as e:
+                    st.warning(str(e))
+                else:
+                    st.success(f"Plan {plan_id} sized at {portfolio.plans[plan_id].row()['risk']:.2f} risk")
+            else:
+                st.warning("Please fill in the entry prices, stop loss and a symbol.")
+
+        if portfolio.plans:
+            plan_id = st.selectbox("Plan", list(portfolio.plans))
+            filled = st.number_input("Filled Rungs", min_value=0, value=portfolio.plans[plan_id].filled, step=1)
+            update, close = st.columns(2)
+            if update.button("Update Fills"):
+                portfolio.fill(plan_id, filled)
+            if close.button("Close Plan"):
+                portfolio.close(plan_id)
+
+        portfolio_panel(portfolio, budget)
+
+    cache_stats = plan_results.cache.stats()
+    st.sidebar.caption(f"Plan cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['size']}/{cache_stats['maxsize']} plans)")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled("main", main)
\ No newline at end of file
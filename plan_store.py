@@ -0,0 +1,14 @@
+import os
+
+import streamlit as st
+
+from poscalc.store import PlanStore
+
+DB_ENV_VAR = "POSCALC_DB"
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plans.db")
+
+
+@st.cache_resource
+def plan_store():
+    # One store (and its one SQLite connection) per process, shared by every page and session
+    return PlanStore(os.environ.get(DB_ENV_VAR, DEFAULT_DB))
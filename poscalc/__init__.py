@@ -0,0 +1,10 @@
+from poscalc.batch import BatchResult, as_matrix, calc_positions_batch, pad_ladders, per_setup
+from poscalc.ladder import Ladder, build_ladder, compounding_risk, interpolate_entries, liquidation_price
+from poscalc.weights import CLASSIC_PROPORTIONS, WEIGHT_SCHEMES, entry_weights, resample_curve
+from poscalc.montecarlo import DEFAULT_PERCENTILES, MAX_TRADES, simulate_paths
+from poscalc.cache import TTLCache, memoize, normalize_csv, parse_csv_floats, shared_cache
+from poscalc.sweep import OBJECTIVES, grid_axis, iter_sweep, run_sweep
+from poscalc.backtest import PlanRun, backtest_symbols, iter_candle_chunks, run_backtest, save_candles_npy
+from poscalc.takeprofit import DEFAULT_TRIM, default_trims, expand_trims, parse_trims, tp_schedule
+from poscalc.profiling import Profiler, StageStats, prometheus_text, serve_metrics
+from poscalc.portfolio import OpenPlan, Portfolio, RiskBudget
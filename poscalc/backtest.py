@@ -0,0 +1,189 @@
+import numpy as np
+
+CANDLE_COLUMNS = ("ts", "open", "high", "low", "close")
+
+
+def save_candles_npy(path, ts, open_, high, low, close):
+    np.save(path, np.column_stack([ts, open_, high, low, close]).astype(float))
+
+
+def iter_npy_chunks(path, chunk_rows=500_000):
+    # Memory-mapped, so only the chunk being walked is paged in
+    candles = np.load(path, mmap_mode="r")
+    for start in range(0, len(candles), chunk_rows):
+        block = np.asarray(candles[start:start + chunk_rows, :5], dtype=float)
+        yield {name: block[:, i] for i, name in enumerate(CANDLE_COLUMNS)}
+
+
+def iter_parquet_chunks(path, chunk_rows=500_000, ts_column="ts"):
+    import pyarrow.parquet as pq
+    columns = [ts_column, "open", "high", "low", "close"]
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+        yield {name: batch.column(column).to_numpy().astype(float)
+               for name, column in zip(CANDLE_COLUMNS, columns)}
+
+
+def iter_candle_chunks(path, chunk_rows=500_000):
+    if str(path).endswith(".parquet"):
+        return iter_parquet_chunks(path, chunk_rows)
+    return iter_npy_chunks(path, chunk_rows)
+
+
+class PlanRun:
+    # Shorts are walked as longs on negated prices, so one code path covers both sides
+    def __init__(self, plan_id, symbol, is_long, entry_prices, positions, stop_loss, take_profits,
+                 liquidation_price, trims=None, start_ts=None, cancel_entries_on_tp=True):
+        sign = 1.0 if is_long else -1.0
+        order = np.argsort(-sign * np.asarray(entry_prices, dtype=float))
+        self.plan_id = plan_id
+        self.symbol = symbol
+        self.is_long = is_long
+        self.sign = sign
+        self.entries = (sign * np.asarray(entry_prices, dtype=float)[order]).tolist()
+        self.positions = np.asarray(positions, dtype=float)[order].tolist()
+        self.stop = sign * stop_loss
+        self.liquidation = sign * liquidation_price
+        self.take_profits = (sign * np.asarray(take_profits, dtype=float)).tolist()
+        if trims is None:
+            trims = [0.25] * (len(take_profits) - 1) + [1.0]
+        self.trims = list(trims)
+        self.start_ts = start_ts
+        self.cancel_entries_on_tp = cancel_entries_on_tp
+
+        self.filled = 0
+        self.tps_hit = 0
+        self.coins = 0.0
+        self.cost = 0.0
+        self.realized = 0.0
+        self.entries_open = True
+        self.done = False
+        self.exit_reason = None
+        self.exit_ts = None
+        self.last_close = None
+
+    def exit_level(self):
+        # Without a position only the stop invalidates the plan; with one, whichever of stop and liquidation
+        # price reaches first
+        return max(self.stop, self.liquidation) if self.coins > 0 else self.stop
+
+    def next_levels(self):
+        # (adverse level hit when low <= it, favourable level hit when high >= it)
+        adverse = self.exit_level()
+        if self.entries_open and self.filled < len(self.entries):
+            adverse = max(adverse, self.entries[self.filled])
+        favourable = self.take_profits[self.tps_hit] if self.coins > 0 else np.inf
+        return adverse, favourable
+
+    def _sell(self, fraction, price):
+        coins = self.coins * fraction
+        avg_price = self.cost / self.coins
+        self.realized += coins * (price - avg_price)
+        self.cost -= coins * avg_price
+        self.coins -= coins
+
+    def apply_candle(self, ts, open_, high, low):
+        # Conservative order inside a candle: fills, then stop/liquidation, then take profits.
+        # Rungs past the exit level never fill: price reaches the exit first on its way down
+        while (self.entries_open and self.filled < len(self.entries) and low <= self.entries[self.filled]
+               and self.entries[self.filled] >= self.exit_level()):
+            price = min(self.entries[self.filled], open_)
+            coins = self.positions[self.filled] / abs(price)
+            self.coins += coins
+            self.cost += coins * price
+            self.filled += 1
+
+        if low <= self.exit_level():
+            if self.coins > 0:
+                # Liquidated when liquidation sits inside the stop, or the candle opens past it
+                liquidated = self.liquidation >= self.stop or open_ <= self.liquidation
+                self._sell(1.0, self.liquidation if liquidated else min(self.stop, open_))
+                self.exit_reason = "liquidated" if liquidated else "stopped"
+            else:
+                self.exit_reason = "invalidated"
+            self.done, self.exit_ts = True, ts
+            return
+
+        while self.coins > 0 and self.tps_hit < len(self.take_profits) and high >= self.take_profits[self.tps_hit]:
+            self._sell(self.trims[self.tps_hit], max(self.take_profits[self.tps_hit], open_))
+            self.tps_hit += 1
+            if self.cancel_entries_on_tp:
+                self.entries_open = False
+        if self.tps_hit == len(self.take_profits) or (self.coins <= 0 and self.tps_hit):
+            self.done, self.exit_ts, self.exit_reason = True, ts, "take_profit"
+
+    def walk(self, ts, open_, high, low, start=0):
+        # Jump from event to event with vectorized scans over growing windows of the chunk
+        i, n = start, len(ts)
+        while i < n and not self.done:
+            adverse, favourable = self.next_levels()
+            window = 256
+            while i < n:
+                end = min(i + window, n)
+                hits = (low[i:end] <= adverse) | (high[i:end] >= favourable)
+                k = int(hits.argmax())
+                if hits[k]:
+                    i += k
+                    break
+                i, window = end, window * 4
+            else:
+                break
+            self.apply_candle(ts[i], open_[i], high[i], low[i])
+            i += 1
+
+    def result(self):
+        unrealized = self.coins * (self.last_close - self.cost / self.coins) if self.coins > 0 else 0.0
+        return {
+            'plan_id': self.plan_id,
+            'symbol': self.symbol,
+            'side': "Long" if self.is_long else "Short",
+            'filled_rungs': self.filled,
+            'tps_hit': self.tps_hit,
+            'realized_pnl': self.realized,
+            'unrealized_pnl': unrealized if not self.done else 0.0,
+            'exit_reason': self.exit_reason or ("open" if self.filled else "not_filled"),
+            'exit_ts': self.exit_ts,
+        }
+
+
+def _oriented(chunk, sign):
+    if sign > 0:
+        return chunk["open"], chunk["high"], chunk["low"], chunk["close"]
+    return -chunk["open"], -chunk["low"], -chunk["high"], -chunk["close"]
+
+
+def run_backtest(plans, chunks):
+    # plans: PlanRun objects for one symbol; chunks: iterable of candle dicts in time order
+    active = list(plans)
+    for chunk in chunks:
+        if not active:
+            break
+        ts = chunk["ts"]
+        oriented = {sign: _oriented(chunk, sign) for sign in {plan.sign for plan in active}}
+        chunk_extremes = {sign: (values[1].max(), values[2].min()) for sign, values in oriented.items()}
+
+        # Bulk fast path: one vectorized check over all plans skips those with nothing to do in this chunk
+        levels = np.array([plan.next_levels() for plan in active])
+        highs = np.array([chunk_extremes[plan.sign][0] for plan in active])
+        lows = np.array([chunk_extremes[plan.sign][1] for plan in active])
+        starts = np.array([ts[0] if plan.start_ts is None else plan.start_ts for plan in active])
+        touched = ((lows <= levels[:, 0]) | (highs >= levels[:, 1])) & (starts <= ts[-1])
+
+        for plan, hit in zip(active, touched):
+            open_, high, low, close = oriented[plan.sign]
+            plan.last_close = close[-1]
+            if hit:
+                start = 0 if plan.start_ts is None else int(np.searchsorted(ts, plan.start_ts))
+                plan.walk(ts, open_, high, low, start)
+        active = [plan for plan in active if not plan.done]
+    return [plan.result() for plan in plans]
+
+
+def backtest_symbols(plans, data_paths, chunk_rows=500_000):
+    # data_paths maps symbol -> .npy or .parquet candle file; each symbol is streamed on its own
+    results = []
+    by_symbol = {}
+    for plan in plans:
+        by_symbol.setdefault(plan.symbol, []).append(plan)
+    for symbol, symbol_plans in by_symbol.items():
+        results.extend(run_backtest(symbol_plans, iter_candle_chunks(data_paths[symbol], chunk_rows)))
+    return results
@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+import numpy as np
+
+from poscalc.ladder import liquidation_price
+from poscalc.takeprofit import DEFAULT_TRIM, tp_schedule
+
+BatchResult = namedtuple("BatchResult", ["positions", "profits", "coins", "remaining", "full_profit", "full_loss",
+                                         "liquidation_price"])
+
+
+def pad_ladders(ladders, fill=np.nan):
+    # Ragged per-setup lists -> (setups, max_len) array padded with NaN
+    width = max(len(ladder) for ladder in ladders)
+    out = np.full((len(ladders), width), fill, dtype=float)
+    for i, ladder in enumerate(ladders):
+        out[i, :len(ladder)] = ladder
+    return out
+
+
+def as_matrix(values):
+    # One ladder or many, ragged or not -> (setups, rungs) float array
+    if len(values) and not np.isscalar(values[0]) and len({len(v) for v in values}) > 1:
+        return pad_ladders(values)
+    return np.atleast_2d(np.asarray(values, dtype=float))
+
+
+def per_setup(value, num_setups, dtype=float):
+    # A scalar shared by every setup or one value each -> (setups,) array
+    return np.broadcast_to(np.asarray(value, dtype=dtype), (num_setups,))
+
+
+def calc_positions_batch(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
+                         liquidation_buffer, additional_risk, is_long, trims=None):
+    entry_prices = as_matrix(entry_prices)
+    take_profits = as_matrix(take_profits)
+    num_setups = entry_prices.shape[0]
+    entry_proportions = np.broadcast_to(as_matrix(entry_proportions), entry_prices.shape)
+
+    portfolio_size = per_setup(portfolio_size, num_setups)
+    risk_level = per_setup(risk_level, num_setups)
+    stop_loss = per_setup(stop_loss, num_setups)
+    liquidation_buffer = per_setup(liquidation_buffer, num_setups)
+    additional_risk = per_setup(additional_risk, num_setups)
+    is_long = per_setup(is_long, num_setups, dtype=bool)
+    rows = np.arange(num_setups)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total_risk = np.where(additional_risk > 0,
+                              (portfolio_size - additional_risk) * (risk_level / 100) + additional_risk,
+                              portfolio_size * (risk_level / 100))
+        direction = np.where(is_long, 1.0, -1.0)[:, None]
+
+        risk_per_entry = total_risk[:, None] * entry_proportions
+        positions = risk_per_entry / ((entry_prices - stop_loss[:, None]) * direction / entry_prices)
+
+        # Running totals replace the per-entry sum(positions[:i + 1]) / sum(entry_prices[:i + 1])
+        entry_valid = ~np.isnan(entry_prices)
+        total_invested = np.cumsum(np.where(entry_valid, positions, 0.0), axis=1)
+        filled = np.cumsum(entry_valid, axis=1)
+        avg_buy_price = np.cumsum(np.where(entry_valid, entry_prices, 0.0), axis=1) / filled
+        total_coins = np.where(entry_valid, total_invested / avg_buy_price, np.nan)
+
+        tp_valid = ~np.isnan(take_profits)
+        num_tps = tp_valid.sum(axis=1)
+        if trims is None:
+            trims = np.where(np.arange(take_profits.shape[1]) < (num_tps - 1)[:, None], DEFAULT_TRIM, 1.0)
+        trims = np.where(tp_valid, np.broadcast_to(as_matrix(trims), take_profits.shape), 0.0)
+
+        profits, coins, remaining = tp_schedule(total_coins, avg_buy_price, take_profits, trims,
+                                                direction[:, :, None])
+        level_valid = tp_valid[:, None, :] & entry_valid[:, :, None]
+        profits = np.where(level_valid, profits, np.nan)
+        coins = np.where(level_valid, coins, np.nan)
+        remaining = np.where(level_valid, remaining, np.nan)
+
+    last_entry = entry_valid.sum(axis=1) - 1
+    full_profit = profits[rows, last_entry, num_tps - 1]
+    return BatchResult(np.where(entry_valid, positions, np.nan), profits, coins, remaining, full_profit, total_risk,
+                       liquidation_price(stop_loss, liquidation_buffer, is_long))
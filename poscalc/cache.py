@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class TTLCache:
+    # LRU cache with per-entry expiry; module-level instances are shared by every Streamlit session
+    def __init__(self, maxsize=256, ttl=3600, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > self.timer():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+
+_MISSING = object()
+_SHARED_CACHES = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_cache(name, maxsize=256, ttl=3600):
+    # Streamlit re-executes the page script on every rerun, so caches are kept here, keyed by name
+    with _SHARED_LOCK:
+        if name not in _SHARED_CACHES:
+            _SHARED_CACHES[name] = TTLCache(maxsize, ttl)
+        return _SHARED_CACHES[name]
+
+
+def _freeze(value):
+    # Hashable stand-in for an argument: lists and tuples by content, arrays by dtype, shape and bytes
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if hasattr(value, "tobytes") and hasattr(value, "shape"):
+        return ("ndarray", value.dtype.str, value.shape, value.tobytes())
+    return value
+
+
+def memoize(maxsize=256, ttl=3600, name=None):
+    def decorator(func):
+        cache = shared_cache(name or f"{func.__module__}.{func.__qualname__}", maxsize, ttl)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (_freeze(args), _freeze(kwargs))
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def normalize_csv(text):
+    # "1, 2 ,3" and "1,2,3" describe the same plan
+    return "".join(text.split())
+
+
+def parse_csv_floats(text):
+    return tuple(float(x.strip()) for x in text.split(",") if x.strip())
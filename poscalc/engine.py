@@ -0,0 +1,45 @@
+from poscalc.batch import calc_positions_batch
+from poscalc.cache import parse_csv_floats
+from poscalc.ladder import build_ladder, compounding_risk, interpolate_entries, liquidation_price
+from poscalc.weights import entry_weights
+
+# The calculators behind main.py and crypto-main.py; the pages and poscalc.headless both call these,
+# so a plan computed in batch matches the one on screen to the last digit
+
+
+def main_positions(portfolio_size, risk_level, entry_prices, stop_loss, take_profits, liquidation_buffer,
+                   additional_risk, is_long, trims=None):
+    # main.py's calculator for many setups at once; entry_prices / take_profits / trims may be ragged
+    entry_proportions = [[1 / len(ladder)] * len(ladder) for ladder in entry_prices]
+    return calc_positions_batch(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions,
+                                take_profits, liquidation_buffer, additional_risk, is_long, trims)
+
+
+def crypto_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
+                     liquidation_buffer):
+    risk_amount = portfolio_size * (risk_level / 100) / 3  # Adjusted for the 3x issue
+    ladder = build_ladder(risk_amount, entry_prices, stop_loss, entry_proportions, take_profits[-1])
+
+    full_profit, full_loss = float(ladder.profits[-1]), risk_amount * 3  # Adjusted for the 3x issue
+
+    return (ladder.positions.tolist(), ladder.avg_prices.tolist(), ladder.profits.tolist(), full_profit, full_loss,
+            float(liquidation_price(stop_loss, liquidation_buffer)), ladder.shares.tolist())
+
+
+def crypto_plan(portfolio_size, base_risk_level, previous_win_profit, entry_prices, stop_loss, take_profits,
+                entries_between=0, weight_scheme="classic", weight_param=None, liquidation_buffer=1):
+    # crypto-main.py from parsed inputs: optional extra rungs, compounding risk, weighted ladder.
+    # Returns the rung prices actually used followed by crypto_positions' results
+    if entries_between:
+        entry_prices = interpolate_entries(entry_prices, entries_between + 1).tolist()
+    else:
+        entry_prices = list(entry_prices)
+
+    # Calculate the risk tolerance based on the current portfolio value and previous winning trade's profit
+    risk_tolerance = compounding_risk(portfolio_size, base_risk_level, previous_win_profit)
+
+    if weight_scheme == "custom" and isinstance(weight_param, str):
+        weight_param = parse_csv_floats(weight_param)
+    entry_proportions = entry_weights(weight_scheme, len(entry_prices), weight_param)
+    return (entry_prices,) + crypto_positions(portfolio_size, risk_tolerance, entry_prices, stop_loss,
+                                              entry_proportions, take_profits, liquidation_buffer)
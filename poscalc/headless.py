@@ -0,0 +1,329 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from poscalc.cache import normalize_csv, parse_csv_floats
+from poscalc.engine import crypto_plan, main_positions
+from poscalc.margin import TierTable, ladder_liquidation, liquidation_batch
+from poscalc.takeprofit import parse_trims, tp_schedule
+
+# Optional input columns and the value each page's input widget starts with
+DEFAULTS = {
+    'main': {'additional_risk': 0.0, 'side': "Long", 'trims': "25", 'liquidation_buffer': 1, 'leverage': 10.0},
+    'crypto': {'previous_win_profit': 0.0, 'entries_between': 0, 'weight_scheme': "classic", 'weight_param': None,
+               'trims': "25, 100", 'liquidation_buffer': 1, 'leverage': 10.0},
+}
+REQUIRED = {
+    'main': ("portfolio_size", "risk_level", "entry_prices", "stop_loss", "take_profits"),
+    'crypto': ("portfolio_size", "base_risk_level", "entry_prices", "stop_loss", "take_profits"),
+}
+# full_fill_profit is the sum of tp_profits, every rung filled and every take profit hit, for both calculators;
+# it is the same number the sweep ranks on. liquidation_tiered says whether the symbol's risk-limit tiers priced the
+# liquidation or the fixed buffer did
+OUTPUT_COLUMNS = ("row", "id", "symbol", "side", "num_entries", "total_position", "full_fill_profit", "full_loss",
+                  "liquidation_price", "liquidation_tiered", "positions", "tp_profits", "error")
+
+
+def _text(value):
+    # CSV cells hold "100, 90" or "100; 90"; JSONL may hold real lists
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return normalize_csv(str(value)).replace(";", ",")
+
+
+def _floats(value):
+    return parse_csv_floats(_text(value))
+
+
+def _is_long(side):
+    # Long or Short in any case; anything else is a typo, not a silent long
+    normalized = str(side).strip().lower()
+    if normalized not in ("long", "short"):
+        raise ValueError(f"side must be Long or Short, got {side!r}")
+    return normalized == "long"
+
+
+def _setup(calculator, record):
+    # Blank cells fall back to the page defaults; a missing required column is an error for that row only
+    setup = dict(DEFAULTS[calculator])
+    setup.update({key: value for key, value in record.items() if value not in ("", None)})
+    missing = [column for column in REQUIRED[calculator] if column not in setup]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return setup
+
+
+def _result_row(row, record, side, positions, full_loss, liquidation, tiered, tp_profits):
+    return {'row': row, 'id': record.get('id'), 'symbol': record.get('symbol'), 'side': side,
+            'num_entries': len(positions), 'total_position': float(sum(positions)),
+            'full_fill_profit': float(sum(tp_profits)), 'full_loss': float(full_loss),
+            'liquidation_price': float(liquidation), 'liquidation_tiered': tiered,
+            'positions': json.dumps(list(positions)), 'tp_profits': json.dumps(list(tp_profits)), 'error': None}
+
+
+def _error_row(row, record, error):
+    return {**dict.fromkeys(OUTPUT_COLUMNS), 'row': row, 'id': record.get('id'), 'symbol': record.get('symbol'),
+            'error': str(error)}
+
+
+def _main_chunk(start, records, tiers=None):
+    # main.py's calculator is vectorised, so the whole chunk is one calc_positions_batch call
+    out = [None] * len(records)
+    parsed = []
+    for i, record in enumerate(records):
+        try:
+            setup = _setup("main", record)
+            take_profits = _floats(setup['take_profits'])
+            entry_prices = _floats(setup['entry_prices'])
+            if not entry_prices or not take_profits:
+                raise ValueError("entry_prices and take_profits need at least one value")
+            parsed.append((i, float(setup['portfolio_size']), float(setup['risk_level']), entry_prices,
+                           float(setup['stop_loss']), take_profits, float(setup['liquidation_buffer']),
+                           float(setup['additional_risk']), _is_long(setup['side']),
+                           parse_trims(_text(setup['trims']), len(take_profits)), float(setup['leverage'])))
+        except (ValueError, TypeError) as e:
+            out[i] = _error_row(start + i, record, e)
+
+    if parsed:
+        index, portfolio, risk, entries, stops, tps, buffers, additional, is_long, trims, leverage = zip(*parsed)
+        result = main_positions(portfolio, risk, entries, stops, tps, buffers, additional, is_long, trims)
+        liquidation = result.liquidation_price
+        # Setups on symbols with tiers are priced together, one liquidation_batch call for the chunk
+        tiered = [j for j, i in enumerate(index) if tiers is not None and records[i].get('symbol') in tiers]
+        if tiered:
+            liquidation = np.array(liquidation)
+            liquidation[tiered] = liquidation_batch(
+                tiers, [records[index[j]]['symbol'] for j in tiered], [entries[j] for j in tiered],
+                [result.positions[j, :len(entries[j])] for j in tiered], np.take(stops, tiered),
+                np.take(leverage, tiered), np.take(is_long, tiered)).full_fill
+        tiered = set(tiered)
+        for j, i in enumerate(index):
+            n, t = len(entries[j]), len(tps[j])
+            out[i] = _result_row(start + i, records[i], "Long" if is_long[j] else "Short",
+                                 result.positions[j, :n].tolist(), result.full_loss[j], liquidation[j],
+                                 j in tiered, result.profits[j, n - 1, :t].tolist())
+    return out
+
+
+def _crypto_chunk(start, records, tiers=None):
+    out = []
+    for i, record in enumerate(records):
+        try:
+            setup = _setup("crypto", record)
+            take_profits = list(_floats(setup['take_profits']))
+            weight_param = setup['weight_param']
+            if weight_param is not None and setup['weight_scheme'] != "custom":
+                weight_param = float(weight_param)
+            elif weight_param is not None:
+                weight_param = _text(weight_param)
+            (entry_prices, positions, avg_prices, _, _, full_loss, liquidation,
+             shares) = crypto_plan(float(setup['portfolio_size']), float(setup['base_risk_level']),
+                                   float(setup['previous_win_profit']), list(_floats(setup['entry_prices'])),
+                                   float(setup['stop_loss']), take_profits, int(setup['entries_between']),
+                                   setup['weight_scheme'], weight_param, float(setup['liquidation_buffer']))
+            # The same take-profit surface crypto-main.py prints; its last row is the full fill
+            tp_profits = tp_schedule(shares, avg_prices, take_profits, parse_trims(_text(setup['trims']),
+                                                                                   len(take_profits)))[0][-1]
+            tiered = tiers is not None and record.get('symbol') in tiers
+            if tiered:
+                liquidation = ladder_liquidation(tiers, record['symbol'], entry_prices, positions,
+                                                 float(setup['stop_loss']), float(setup['leverage'])).full_fill[0]
+            out.append(_result_row(start + i, record, "Long", positions, full_loss, liquidation, tiered,
+                                   tp_profits.tolist()))
+        except (ValueError, TypeError, IndexError, ZeroDivisionError) as e:
+            out.append(_error_row(start + i, record, e))
+    return out
+
+
+CALCULATORS = {'main': _main_chunk, 'crypto': _crypto_chunk}
+
+
+def _run_chunk(job):
+    # Tiers travel as plain rows for just the chunk's symbols, so jobs stay small and pickle to workers
+    calculator, start, records, tier_rows = job
+    return CALCULATORS[calculator](start, records, TierTable(tier_rows) if tier_rows else None)
+
+
+def _chunk_tiers(tiers, records):
+    if tiers is None:
+        return None
+    return {symbol: tiers.rows[symbol] for symbol in {record.get('symbol') for record in records} if symbol in tiers}
+
+
+def iter_records(path, fmt=None):
+    # One record at a time, whatever the file size
+    fmt = fmt or ("jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "csv")
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "jsonl":
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(stream)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def iter_chunks(records, chunk_size):
+    records = iter(records)
+    start = 0
+    while chunk := list(itertools.islice(records, chunk_size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+class CsvOutput:
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, OUTPUT_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetOutput:
+    # One row group per chunk, so nothing accumulates in memory
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([('row', pa.int64()), ('id', pa.string()), ('symbol', pa.string()),
+                                  ('side', pa.string()), ('num_entries', pa.int64()),
+                                  ('total_position', pa.float64()), ('full_fill_profit', pa.float64()),
+                                  ('full_loss', pa.float64()), ('liquidation_price', pa.float64()),
+                                  ('liquidation_tiered', pa.bool_()), ('positions', pa.string()),
+                                  ('tp_profits', pa.string()), ('error', pa.string())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        for row in rows:
+            if row['id'] is not None:
+                row['id'] = str(row['id'])
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_output(path):
+    return ParquetOutput(path) if str(path).endswith(".parquet") else CsvOutput(path)
+
+
+def run(records, output, calculator="main", chunk_size=2_000, workers=None, progress=None, tiers=None):
+    # At most 2 * workers chunks are in flight; results are written in input order as soon as they are ready.
+    # tiers: a TierTable; setups on its symbols get tiered liquidation prices, the rest the fixed buffer
+    if calculator not in CALCULATORS:
+        raise ValueError(f"Unknown calculator: {calculator}")
+    jobs = ((calculator, start, chunk, _chunk_tiers(tiers, chunk))
+            for start, chunk in iter_chunks(records, chunk_size))
+    writer = open_output(output) if isinstance(output, (str, os.PathLike)) else output
+    rows = errors = 0
+    started = time.perf_counter()
+
+    def write(result):
+        nonlocal rows, errors
+        writer.write(result)
+        rows += len(result)
+        errors += sum(row['error'] is not None for row in result)
+        if progress is not None:
+            progress(rows, errors, time.perf_counter() - started)
+
+    try:
+        if workers and workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for job in jobs:
+                    pending.append(pool.submit(_run_chunk, job))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            for job in jobs:
+                write(_run_chunk(job))
+    finally:
+        if writer is not output:
+            writer.close()
+    return rows, errors, time.perf_counter() - started
+
+
+def synthetic_records(count, calculator="main", seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        entries = sorted((round(rng.uniform(90, 110), 2) for _ in range(rng.randint(1, 8))), reverse=True)
+        take_profits = sorted(round(rng.uniform(115, 160), 2) for _ in range(rng.randint(1, 4)))
+        record = {'id': i, 'symbol': f"COIN{rng.randrange(200)}USDT", 'portfolio_size': 300.0,
+                  'entry_prices': ", ".join(map(str, entries)), 'stop_loss': round(entries[-1] * 0.9, 2),
+                  'take_profits': ", ".join(map(str, take_profits))}
+        if calculator == "main":
+            record['risk_level'] = rng.choice((1.0, 2.0, 3.0))
+        else:
+            record.update(base_risk_level=rng.choice((0.8, 1.0)), entries_between=rng.choice((0, 0, 1)),
+                          weight_scheme=rng.choice(("classic", "linear", "even")))
+        yield record
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the calculators over a CSV or JSONL file of setups, "
+                                                 "one output row per setup")
+    parser.add_argument("input", nargs="?", help="CSV or JSONL file of setups, - for stdin")
+    parser.add_argument("output", help="output .csv or .parquet file, - for CSV on stdout")
+    parser.add_argument("--calculator", choices=sorted(CALCULATORS), default="main",
+                        help="main: main.py's columns; crypto: crypto-main.py's columns")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from the file name)")
+    parser.add_argument("--chunk-size", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--synthetic", type=int, help="ignore input and run this many generated setups")
+    parser.add_argument("--risk-limits", help="risk-limit JSON snapshot for tiered liquidation (default: the one "
+                                              "python -m exchange.risk_limits writes)")
+    args = parser.parse_args()
+    if args.input is None and args.synthetic is None:
+        parser.error("an input file or --synthetic is required")
+
+    from exchange.risk_limits import snapshot_path
+    # A missing snapshot is an empty table: every setup keeps the fixed buffer
+    tiers = TierTable.load(args.risk_limits or snapshot_path())
+
+    records = (synthetic_records(args.synthetic, args.calculator) if args.synthetic is not None
+               else iter_records(args.input, args.format))
+    last_report = [0.0]
+
+    def progress(rows, errors, elapsed):
+        if elapsed - last_report[0] >= 1.0:
+            last_report[0] = elapsed
+            print(f"{rows:,} rows, {rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    rows, errors, elapsed = run(records, args.output, args.calculator, args.chunk_size, args.workers, progress,
+                                tiers if len(tiers) else None)
+    peak = _peak_rss_mb()
+    print(f"{rows:,} setups ({errors:,} with errors) in {elapsed:.2f} s, {rows / max(elapsed, 1e-9):,.0f} rows/s"
+          + (f", peak RSS {peak:,.0f} MB" if peak is not None else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+import numpy as np
+
+Ladder = namedtuple("Ladder", ["positions", "cumulative_size", "avg_prices", "shares", "profits"])
+
+
+def interpolate_entries(entry_prices, subdivisions=2):
+    # Split every gap between consecutive entries into `subdivisions` equal steps
+    entry_prices = np.asarray(entry_prices, dtype=float)
+    if len(entry_prices) < 2 or subdivisions < 2:
+        return entry_prices
+    steps = np.arange(subdivisions) / subdivisions
+    gaps = entry_prices[1:] - entry_prices[:-1]
+    rungs = entry_prices[:-1, None] + gaps[:, None] * steps
+    return np.append(rungs.ravel(), entry_prices[-1])
+
+
+def compounding_risk(portfolio_size, base_risk_level, previous_win_profit=0.0):
+    # Base risk on the portfolio before the last win, plus the whole win, as a % of the current portfolio
+    old_portfolio_size = portfolio_size - previous_win_profit if previous_win_profit > 0 else portfolio_size
+    og_risk_value = old_portfolio_size * (1 - base_risk_level / 100)
+    return (portfolio_size - og_risk_value) / portfolio_size * 100
+
+
+def liquidation_price(stop_loss, liquidation_buffer, is_long=True):
+    # Scalars or arrays; the buffer sits beyond the stop, below it for longs and above it for shorts
+    direction = np.where(is_long, 1.0, -1.0)
+    return stop_loss * (1 - direction * liquidation_buffer / 100)
+
+
+def build_ladder(risk_amount, entry_prices, stop_loss, entry_proportions, take_profit):
+    entry_prices = np.asarray(entry_prices, dtype=float)
+    risk_per_entry = risk_amount * np.asarray(entry_proportions, dtype=float)
+    positions = risk_per_entry / np.abs((entry_prices - stop_loss) / entry_prices)
+
+    # One pass of running totals gives every rung's weighted average in O(n)
+    cumulative_size = np.cumsum(positions)
+    avg_prices = np.cumsum(entry_prices * positions) / cumulative_size
+    shares = cumulative_size / avg_prices
+    profits = cumulative_size * (take_profit - avg_prices) / avg_prices
+    return Ladder(positions, cumulative_size, avg_prices, shares, profits)
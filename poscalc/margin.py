@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from poscalc.batch import as_matrix, per_setup
+
+Tiers = namedtuple("Tiers", ["limits", "mmr", "deduction", "max_leverage"])
+# Every symbol's tiers side by side, padded with infinite limits, so one pass serves a book of mixed symbols
+TierMatrix = namedtuple("TierMatrix", ["symbols", "limits", "mmr", "deduction", "max_leverage", "counts"])
+Liquidation = namedtuple("Liquidation", ["prices", "full_fill", "tier", "mmr", "inside_stop", "over_limit"])
+
+
+def tiers_from_rows(rows):
+    # Bybit v5 /v5/market/risk-limit rows, in any order -> arrays sorted by position value limit
+    rows = sorted(rows, key=lambda row: float(row['riskLimitValue']))
+    return Tiers(np.array([float(row['riskLimitValue']) for row in rows]),
+                 np.array([float(row['maintenanceMargin']) for row in rows]),
+                 np.array([float(row.get('mmDeduction') or 0) for row in rows]),
+                 np.array([float(row['maxLeverage']) for row in rows]))
+
+
+class TierTable:
+    # Risk-limit tiers per symbol; the raw rows are kept so the table round-trips through its JSON snapshot
+    def __init__(self, rows=None, fetched=None):
+        self.rows = {}
+        self.tiers = {}
+        self.fetched = fetched
+        self._matrix = None
+        self._lock = threading.Lock()
+        for symbol, symbol_rows in (rows or {}).items():
+            self.update(symbol, symbol_rows)
+
+    def __contains__(self, symbol):
+        return symbol in self.tiers
+
+    def __len__(self):
+        return len(self.tiers)
+
+    def update(self, symbol, rows):
+        if not rows:
+            raise ValueError(f"No risk-limit tiers for {symbol}")
+        tiers = tiers_from_rows(rows)
+        with self._lock:
+            self.rows[symbol] = list(rows)
+            self.tiers[symbol] = tiers
+            self._matrix = None
+
+    def matrix(self):
+        with self._lock:
+            if self._matrix is None:
+                symbols = sorted(self.tiers)
+                width = max((len(self.tiers[symbol].limits) for symbol in symbols), default=1)
+
+                def padded(field, fill):
+                    out = np.full((len(symbols), width), fill)
+                    for i, symbol in enumerate(symbols):
+                        values = getattr(self.tiers[symbol], field)
+                        out[i, :len(values)] = values
+                    return out
+
+                self._matrix = TierMatrix(np.array(symbols, dtype=str), padded("limits", np.inf),
+                                          padded("mmr", np.nan), padded("deduction", np.nan),
+                                          padded("max_leverage", np.nan),
+                                          np.array([len(self.tiers[symbol].limits) for symbol in symbols]))
+            return self._matrix
+
+    def symbol_index(self, symbols):
+        matrix = self.matrix()
+        symbols = np.asarray(symbols, dtype=str)
+        index = np.minimum(np.searchsorted(matrix.symbols, symbols), max(len(matrix.symbols) - 1, 0))
+        missing = matrix.symbols[index] != symbols if len(matrix.symbols) else np.ones(symbols.shape, dtype=bool)
+        if np.any(missing):
+            raise KeyError(f"No risk-limit tiers for {', '.join(sorted(set(symbols[missing].tolist())))}")
+        return index
+
+    @classmethod
+    def load(cls, path):
+        # A missing snapshot is an empty table; callers fall back to the fixed buffer
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(snapshot['symbols'], snapshot.get('fetched'))
+
+    def save(self, path):
+        with self._lock:
+            snapshot = {'fetched': self.fetched, 'symbols': self.rows}
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=1)
+        os.replace(tmp, path)
+
+
+def _fill_order(entry_prices, is_long):
+    # Longs fill from the highest rung down, shorts from the lowest up; padding stays last.
+    # None when the rungs already come in that order, which is how the pages build them
+    keys = np.where(is_long[:, None], -entry_prices, entry_prices)
+    keys = np.where(np.isnan(entry_prices), np.inf, keys)
+    if np.all(keys[:, 1:] >= keys[:, :-1]):
+        return None
+    return np.argsort(keys, axis=1, kind="stable")
+
+
+def _ladders(matrix, symbol_index, entry_prices, positions, stop_loss, leverage, is_long):
+    order = _fill_order(entry_prices, is_long)
+    if order is not None:
+        # Flat indices instead of take_along_axis: one gather per array
+        flat = (order + np.arange(len(order))[:, None] * order.shape[1]).ravel()
+        entry_prices = entry_prices.ravel()[flat].reshape(order.shape)
+        positions = positions.ravel()[flat].reshape(order.shape)
+    valid = ~np.isnan(entry_prices)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Running position value and size as each rung fills
+        notional = np.cumsum(np.where(valid, positions, 0.0), axis=1)
+        qty = np.cumsum(np.where(valid, positions / entry_prices, 0.0), axis=1)
+        avg_price = notional / qty
+
+        # Tier i covers values up to limits[i]. Each plan compares against its own symbol's sorted limits, one
+        # tier column at a time; with a handful of tiers this beats a searchsorted call per symbol
+        limits = matrix.limits[symbol_index]
+        tier = np.zeros(notional.shape, dtype=np.intp)
+        for column in range(limits.shape[1]):
+            tier += notional > limits[:, column:column + 1]
+        counts = matrix.counts[symbol_index][:, None]
+        over_limit = tier >= counts
+        np.minimum(tier, counts - 1, out=tier)
+        rows = symbol_index[:, None]
+        mmr = matrix.mmr[rows, tier]
+        over_limit |= leverage[:, None] > matrix.max_leverage[rows, tier]
+
+        # Isolated margin: liquidation once the loss eats initial margin down to maintenance margin,
+        # maintenance = value * mmr - deduction
+        direction = np.where(is_long, 1.0, -1.0)[:, None]
+        prices = (avg_price * (1 - direction * (1 / leverage[:, None] - mmr))
+                  - direction * matrix.deduction[rows, tier] / qty)
+        prices = np.where(valid, np.maximum(prices, 0.0), np.nan)
+        inside_stop = valid & np.where(direction > 0, prices >= stop_loss[:, None], prices <= stop_loss[:, None])
+        over_limit &= valid
+
+    full_fill = prices[np.arange(len(prices)), valid.sum(axis=1) - 1]
+    fields = [prices, tier, np.where(valid, mmr, np.nan), inside_stop, over_limit]
+    if order is not None:
+        # Back to the caller's rung order: each rung reports the liquidation once it and every rung before it
+        # have filled
+        restore = np.empty_like(flat)
+        restore[flat] = np.arange(len(flat))
+        fields = [field.ravel()[restore].reshape(order.shape) for field in fields]
+    prices, tier, mmr, inside_stop, over_limit = fields
+    return Liquidation(prices, full_fill, tier, mmr, inside_stop, over_limit)
+
+
+def liquidation_batch(table, symbols, entry_prices, positions, stop_loss, leverage, is_long=True):
+    # A (plans, rungs) book across symbols, ragged ladders NaN padded; rungs in any order
+    entry_prices = as_matrix(entry_prices)
+    positions = np.broadcast_to(as_matrix(positions), entry_prices.shape)
+    num_plans = entry_prices.shape[0]
+    symbol_index = table.symbol_index(np.broadcast_to(np.asarray(symbols, dtype=str), (num_plans,)))
+    return _ladders(table.matrix(), symbol_index, entry_prices, positions, per_setup(stop_loss, num_plans),
+                    per_setup(leverage, num_plans), per_setup(is_long, num_plans, dtype=bool))
+
+
+def ladder_liquidation(table, symbol, entry_prices, positions, stop_loss, leverage, is_long=True):
+    # One ladder on one symbol; every field comes back with a leading axis of one plan
+    return liquidation_batch(table, symbol, [entry_prices], [positions], stop_loss, leverage, is_long)
+
+
+def synthetic_tiers(base_limit, steps=10, base_mmr=0.005):
+    # Tier rows shaped like Bybit's: deductions keep maintenance margin continuous across tier boundaries
+    rows, deduction = [], 0.0
+    for i in range(steps):
+        mmr = base_mmr * (i + 1)
+        if i:
+            deduction += base_limit * i * base_mmr
+        rows.append({'riskLimitValue': str(base_limit * (i + 1)), 'maintenanceMargin': str(mmr),
+                     'mmDeduction': str(deduction), 'maxLeverage': str(round(1 / (2 * mmr), 2))})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time tiered liquidation prices for a book of open ladders")
+    parser.add_argument("--snapshot", help="risk-limit JSON snapshot (default: synthetic tiers)")
+    parser.add_argument("--plans", type=int, default=500)
+    parser.add_argument("--rungs", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=2_000)
+    args = parser.parse_args()
+
+    table = TierTable.load(args.snapshot) if args.snapshot else TierTable(
+        {f"COIN{i}USDT": synthetic_tiers(200_000 * (i + 1)) for i in range(20)})
+    symbols_available = sorted(table.tiers)
+    rng = np.random.default_rng(0)
+    symbols = rng.choice(symbols_available, args.plans)
+    is_long = rng.random(args.plans) < 0.5
+    tops = rng.uniform(50, 150, args.plans)
+    steps = np.linspace(0, 0.2, args.rungs)
+    entries = np.where(is_long[:, None], tops[:, None] * (1 - steps), tops[:, None] * (1 + steps))
+    stops = np.where(is_long, tops * 0.78, tops * 1.22)
+    positions = rng.uniform(1_000, 50_000, (args.plans, args.rungs))
+    leverage = rng.choice([2.0, 5.0, 10.0, 20.0], args.plans)
+
+    def timed(rows):
+        samples = []
+        for _ in range(args.ticks):
+            t = time.perf_counter()
+            result = liquidation_batch(table, symbols[rows], entries[rows], positions[rows], stops[rows],
+                                       leverage[rows], is_long[rows])
+            samples.append(time.perf_counter() - t)
+        samples.sort()
+        return result, [samples[min(int(len(samples) * p / 100), len(samples) - 1)] * 1e6 for p in (50, 99)]
+
+    result, (p50, p99) = timed(np.arange(args.plans))
+    print(f"{args.plans:,} plans x {args.rungs} rungs on {len(set(symbols.tolist()))} symbols: "
+          f"p50 {p50:,.0f} us, p99 {p99:,.0f} us per full recompute")
+    # A tick moves one symbol, so only that symbol's plans are recomputed
+    rows = np.flatnonzero(symbols == symbols[0])
+    _, (p50, p99) = timed(rows)
+    print(f"one tick ({len(rows)} plans on {symbols[0]}): p50 {p50:,.0f} us, p99 {p99:,.0f} us")
+    print(f"{int(result.inside_stop.any(axis=1).sum()):,} plans have rungs liquidating inside the stop, "
+          f"{int(result.over_limit.any(axis=1).sum()):,} exceed a tier's limit or leverage")
+
+
+if __name__ == "__main__":
+    main()
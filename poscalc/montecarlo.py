@@ -0,0 +1,95 @@
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# The (step, wins) histogram grows with the square of the trades per path: 1k trades is 8 MB
+MAX_TRADES = 1_000
+# Paths x trades simulated per chunk, so long paths get proportionally fewer paths per chunk
+CHUNK_CELLS = 2_000_000
+
+
+def _log_equity(wins, trades, log_win, log_loss):
+    # Guard 0 * -inf when a loss wipes the account (risk level of 100%)
+    losses = trades - wins
+    return wins * log_win + np.where(losses > 0, losses * log_loss, 0.0)
+
+
+def _simulate_chunk(args):
+    seed, num_paths, num_trades, win_rate, log_win, log_loss, log_ruin = args
+    rng = np.random.default_rng(seed)
+    wins = np.cumsum(rng.random((num_paths, num_trades)) < win_rate, axis=1, dtype=np.int32)
+
+    # Equity only depends on how many trades were won so far, so the per-step
+    # distribution is kept as a (step, wins) histogram that merges across chunks
+    steps = np.arange(1, num_trades + 1)
+    with np.errstate(invalid="ignore"):
+        log_equity = _log_equity(wins, steps, log_win, log_loss)
+    cells = (steps * (num_trades + 1) + wins).ravel()
+    wins_hist = np.bincount(cells, minlength=(num_trades + 1) ** 2).reshape(num_trades + 1, num_trades + 1)
+    wins_hist[0, 0] = num_paths
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        peak = np.maximum(np.maximum.accumulate(log_equity, axis=1), 0.0)
+        max_drawdown = 1 - np.exp(np.min(log_equity - peak, axis=1))
+    ruined = int(np.count_nonzero(log_equity.min(axis=1) <= log_ruin))
+    return wins_hist, max_drawdown, ruined
+
+
+def _histogram_percentiles(hist, percentiles):
+    cdf = np.cumsum(hist, axis=-1) / hist.sum(axis=-1, keepdims=True)
+    targets = np.asarray(percentiles, dtype=float) / 100
+    return np.stack([np.argmax(cdf >= min(max(p, 1e-12), 1.0) * (1 - 1e-12), axis=-1) for p in targets])
+
+
+def simulate_paths(portfolio_size, risk_level, win_rate, num_trades, num_paths=100_000, reward_multiple=3,
+                   seed=None, percentiles=DEFAULT_PERCENTILES, ruin_level=50, chunk_size=20_000, workers=None):
+    if not 1 <= num_trades <= MAX_TRADES:
+        raise ValueError(f"Trades per path must be between 1 and {MAX_TRADES:,}, got {num_trades:,}")
+    risk = risk_level / 100
+    with np.errstate(divide="ignore"):
+        log_win = np.log1p(risk * reward_multiple)
+        log_loss = np.log1p(-risk)
+        log_ruin = np.log(ruin_level / 100)
+
+    chunk_size = max(min(chunk_size, CHUNK_CELLS // num_trades), 1)
+    chunk_sizes = [chunk_size] * (num_paths // chunk_size)
+    if num_paths % chunk_size:
+        chunk_sizes.append(num_paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    jobs = [(s, n, num_trades, win_rate, log_win, log_loss, log_ruin) for s, n in zip(seeds, chunk_sizes)]
+
+    # Histograms are merged as chunks arrive rather than held until the end
+    wins_hist, drawdowns, ruined = 0, [], 0
+
+    def merge(chunks):
+        nonlocal wins_hist, ruined
+        for chunk_hist, chunk_drawdown, chunk_ruined in chunks:
+            wins_hist = wins_hist + chunk_hist
+            drawdowns.append(chunk_drawdown)
+            ruined += chunk_ruined
+
+    if workers and len(jobs) > 1:
+        # multiprocessing is only imported when a pool is actually used
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            merge(pool.map(_simulate_chunk, jobs))
+    else:
+        merge(map(_simulate_chunk, jobs))
+    max_drawdown = np.concatenate(drawdowns)
+
+    steps = np.arange(num_trades + 1)
+    band_wins = _histogram_percentiles(wins_hist, percentiles)
+    with np.errstate(invalid="ignore", over="ignore"):
+        bands = portfolio_size * np.exp(_log_equity(band_wins, steps, log_win, log_loss))
+        final_equity = portfolio_size * np.exp(_log_equity(steps, num_trades, log_win, log_loss))
+    final_hist = wins_hist[-1]
+
+    return {
+        'percentiles': tuple(percentiles),
+        'bands': bands,
+        'final_percentiles': dict(zip(percentiles, bands[:, -1].tolist())),
+        'mean_final': float(final_hist @ final_equity / num_paths),
+        'max_drawdown_percentiles': dict(zip(percentiles, np.percentile(max_drawdown, percentiles).tolist())),
+        'max_drawdowns': max_drawdown,
+        'risk_of_ruin': ruined / num_paths,
+        'num_paths': num_paths,
+    }
@@ -0,0 +1,175 @@
+import itertools
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from poscalc.batch import calc_positions_batch
+from poscalc.margin import ladder_liquidation
+
+# Per-plan contribution to every aggregate, in this order
+FIELDS = ("notional", "risk", "margin", "open_notional", "open_risk", "open_margin")
+
+# The caller's risk settings, passed per call: one Portfolio can be shared by sessions with different settings
+RiskBudget = namedtuple("RiskBudget", ["portfolio_size", "max_risk_pct", "max_symbol_risk_pct"],
+                        defaults=(10.0, None))
+
+
+class OpenPlan:
+    # Prefix sums over the rungs in fill order, so a fill is an O(1) lookup
+    def __init__(self, plan_id, symbol, is_long, entry_prices, positions, stop_loss, liquidation_price, filled=0):
+        order = np.argsort(entry_prices)
+        if is_long:
+            order = order[::-1]
+        self.plan_id = plan_id
+        self.symbol = symbol
+        self.is_long = is_long
+        self._order = order
+        self.entry_prices = np.asarray(entry_prices, dtype=float)[order]
+        self.positions = np.asarray(positions, dtype=float)[order]
+        self.filled = filled
+        self.reprice(stop_loss, liquidation_price)
+
+    def reprice(self, stop_loss, liquidation_price):
+        # liquidation_price is one price, or one per rung in the caller's order when it moves as the position
+        # grows through risk-limit tiers
+        self.stop_loss = stop_loss
+        self._liquidation = liquidation_price
+        liquidation = np.broadcast_to(np.asarray(liquidation_price, dtype=float), self._order.shape)[self._order]
+        self.liquidation_price = float(liquidation[-1])
+        # Loss per rung if price reaches the stop after that rung fills
+        at_stop = self.positions * np.abs(self.entry_prices - stop_loss) / self.entry_prices
+        # Loss on every filled rung at the liquidation price for that many fills
+        notional = np.cumsum(self.positions)
+        qty = np.cumsum(self.positions / self.entry_prices)
+        at_liquidation = (notional - liquidation * qty) * (1.0 if self.is_long else -1.0)
+        self._notional = np.concatenate([[0.0], notional]).tolist()
+        self._risk = np.concatenate([[0.0], np.cumsum(at_stop)]).tolist()
+        self._margin = np.concatenate([[0.0], at_liquidation]).tolist()
+
+    @property
+    def side(self):
+        return "Long" if self.is_long else "Short"
+
+    def contribution(self):
+        n = len(self.entry_prices)
+        return (self._notional[n], self._risk[n], self._margin[n],
+                self._notional[self.filled], self._risk[self.filled], self._margin[self.filled])
+
+    def row(self):
+        return {'plan_id': self.plan_id, 'symbol': self.symbol, 'side': self.side,
+                'filled_rungs': self.filled, 'total_rungs': len(self.entry_prices),
+                'stop_loss': self.stop_loss, 'liquidation_price': self.liquidation_price,
+                **dict(zip(FIELDS, self.contribution()))}
+
+
+class Portfolio:
+    # Aggregates are keyed by () for the total, (symbol,), (side,) and (symbol, side); every change to a plan
+    # subtracts its old contribution and adds the new one, so nothing is ever rescanned
+    def __init__(self):
+        self.plans = {}
+        self.aggregates = {}
+        self._ids = itertools.count(1)
+        # Re-entrant so open_plan can size and add under one lock
+        self._lock = threading.RLock()
+
+    def _keys(self, plan):
+        return ((), (plan.symbol,), (plan.side,), (plan.symbol, plan.side))
+
+    def _apply(self, plan, contribution, sign):
+        for key in self._keys(plan):
+            totals = self.aggregates.setdefault(key, [0.0] * (len(FIELDS) + 1))
+            for i, value in enumerate(contribution):
+                totals[i] += sign * value
+            totals[-1] += sign
+            if totals[-1] == 0:
+                del self.aggregates[key]
+
+    def add(self, symbol, is_long, entry_prices, positions, stop_loss, liquidation_price, filled=0):
+        with self._lock:
+            plan = OpenPlan(next(self._ids), symbol, is_long, entry_prices, positions, stop_loss,
+                            liquidation_price, filled)
+            self.plans[plan.plan_id] = plan
+            self._apply(plan, plan.contribution(), 1)
+            return plan.plan_id
+
+    def fill(self, plan_id, filled):
+        with self._lock:
+            plan = self.plans[plan_id]
+            before = plan.contribution()
+            plan.filled = max(0, min(int(filled), len(plan.entry_prices)))
+            self._apply(plan, before, -1)
+            self._apply(plan, plan.contribution(), 1)
+
+    def update(self, plan_id, stop_loss=None, liquidation_price=None):
+        with self._lock:
+            plan = self.plans[plan_id]
+            self._apply(plan, plan.contribution(), -1)
+            plan.reprice(plan.stop_loss if stop_loss is None else stop_loss,
+                         plan._liquidation if liquidation_price is None else liquidation_price)
+            self._apply(plan, plan.contribution(), 1)
+
+    def close(self, plan_id):
+        with self._lock:
+            plan = self.plans.pop(plan_id)
+            self._apply(plan, plan.contribution(), -1)
+
+    def aggregate(self, symbol=None, side=None):
+        key = tuple(part for part in (symbol, side) if part is not None)
+        with self._lock:
+            totals = self.aggregates.get(key, [0.0] * (len(FIELDS) + 1))
+            return {**dict(zip(FIELDS, totals)), 'plans': int(totals[-1])}
+
+    def breakdown(self):
+        # One row per (symbol, side) that has open plans
+        with self._lock:
+            keys = sorted(key for key in self.aggregates if len(key) == 2)
+            return [{'symbol': key[0], 'side': key[1], **dict(zip(FIELDS, self.aggregates[key])),
+                     'plans': int(self.aggregates[key][-1])} for key in keys]
+
+    def rows(self):
+        with self._lock:
+            return [plan.row() for plan in self.plans.values()]
+
+    def remaining_risk(self, budget, symbol=None):
+        # Budget left for new plans: the portfolio cap and, if set, the per-symbol cap
+        remaining = budget.portfolio_size * budget.max_risk_pct / 100 - self.aggregate()['risk']
+        if symbol is not None and budget.max_symbol_risk_pct is not None:
+            remaining = min(remaining, budget.portfolio_size * budget.max_symbol_risk_pct / 100
+                            - self.aggregate(symbol)['risk'])
+        return max(remaining, 0.0)
+
+    def size_plan(self, budget, symbol, is_long, entry_prices, stop_loss, risk_level, additional_risk=0.0,
+                  entry_proportions=None, liquidation_buffer=1, tiers=None, leverage=1.0):
+        # main.py's sizing through the batch engine, scaled down to what the budget has left. The liquidation
+        # price comes back per rung: tiered when the tier table has the symbol, else the fixed buffer on every rung
+        entry_prices = np.asarray(entry_prices, dtype=float)
+        if entry_proportions is None:
+            entry_proportions = np.full(len(entry_prices), 1 / len(entry_prices))
+        if np.any((entry_prices - stop_loss) * (1.0 if is_long else -1.0) <= 0):
+            raise ValueError("The stop loss must be beyond every entry")
+        # Profits are not needed here, so the take profit is a placeholder at the first entry
+        result = calc_positions_batch(budget.portfolio_size, risk_level, [entry_prices], stop_loss,
+                                      [entry_proportions], [[entry_prices[0]]], liquidation_buffer, additional_risk,
+                                      is_long)
+        total_risk = float(result.full_loss[0])
+        risk_amount = min(total_risk, self.remaining_risk(budget, symbol))
+        if risk_amount <= 0:
+            raise ValueError("No risk budget left for a new plan")
+        # Positions are linear in the risk, so capping the risk scales every rung alike
+        positions = result.positions[0] * (risk_amount / total_risk)
+        if tiers is not None and symbol in tiers:
+            # Tiers depend on the position value, so the capped positions are the ones to price
+            liquidation = ladder_liquidation(tiers, symbol, entry_prices, positions, stop_loss, leverage,
+                                             is_long).prices[0]
+        else:
+            liquidation = np.full(len(entry_prices), result.liquidation_price[0])
+        return risk_amount, positions.tolist(), liquidation.tolist()
+
+    def open_plan(self, budget, symbol, is_long, entry_prices, stop_loss, risk_level, additional_risk=0.0,
+                  entry_proportions=None, liquidation_buffer=1, tiers=None, leverage=1.0):
+        with self._lock:
+            risk_amount, positions, liquidation = self.size_plan(budget, symbol, is_long, entry_prices, stop_loss,
+                                                                 risk_level, additional_risk, entry_proportions,
+                                                                 liquidation_buffer, tiers, leverage)
+            return self.add(symbol, is_long, entry_prices, positions, stop_loss, liquidation)
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+ENV_VAR = "POSCALC_PROFILE"
+PORT_ENV_VAR = "POSCALC_PROFILE_PORT"
+# Upper bounds in seconds, Prometheus "le" style; anything slower lands in +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRUTHY = ("1", "true", "yes", "on")
+
+_NULL = nullcontext()
+_local = threading.local()
+_PROFILERS = {}
+_LOCK = threading.Lock()
+_SERVERS = {}
+
+
+class StageStats:
+    # Cumulative bucket counts for export plus a rolling window of recent timings for the panel
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=200):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def rolling_histogram(self):
+        counts = [0] * (len(self.buckets) + 1)
+        for seconds in self.recent:
+            counts[bisect_left(self.buckets, seconds)] += 1
+        return counts
+
+    def summary(self):
+        recent = sorted(self.recent)
+        if not recent:
+            return {'runs': self.count, 'last_ms': None, 'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+        return {
+            'runs': self.count,
+            'last_ms': self.recent[-1] * 1000,
+            'p50_ms': recent[(len(recent) - 1) // 2] * 1000,
+            'p95_ms': recent[int((len(recent) - 1) * 0.95)] * 1000,
+            'max_ms': recent[-1] * 1000,
+        }
+
+
+class Profiler:
+    def __init__(self, page, buckets=DEFAULT_BUCKETS, window=200):
+        self.page = page
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.buckets, self.window)
+            stats.observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def run(self):
+        # Makes this profiler the target of stage() for the current script thread, timing the whole rerun
+        previous = getattr(_local, "profiler", None)
+        _local.profiler = self
+        try:
+            with self.stage("total"):
+                yield self
+        finally:
+            _local.profiler = previous
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in self.stages.items()}
+
+    def rolling_histograms(self):
+        with self._lock:
+            return {name: stats.rolling_histogram() for name, stats in self.stages.items()}
+
+    def bucket_labels(self):
+        return [f"<= {bound * 1000:g} ms" for bound in self.buckets] + [f"> {self.buckets[-1] * 1000:g} ms"]
+
+    def prometheus_lines(self):
+        with self._lock:
+            stages = [(name, list(stats.counts), stats.sum, stats.count) for name, stats in self.stages.items()]
+        lines = []
+        for name, counts, total, count in stages:
+            labels = f'page="{_escape(self.page)}",stage="{_escape(name)}"'
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'poscalc_stage_seconds_bucket{{{labels},le="{le}"}} {running}')
+            lines.append(f"poscalc_stage_seconds_sum{{{labels}}} {total!r}")
+            lines.append(f"poscalc_stage_seconds_count{{{labels}}} {count}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def profiler(page, buckets=DEFAULT_BUCKETS, window=200):
+    # One profiler per page, kept here so it survives Streamlit reruns
+    with _LOCK:
+        if page not in _PROFILERS:
+            _PROFILERS[page] = Profiler(page, buckets, window)
+        return _PROFILERS[page]
+
+
+def stage(name):
+    # Near free when profiling is off: one thread-local lookup and a shared no-op context
+    active = getattr(_local, "profiler", None)
+    if active is None:
+        return _NULL
+    return active.stage(name)
+
+
+def enabled(query_value=None):
+    if query_value is not None:
+        return str(query_value).lower() in TRUTHY
+    return os.environ.get(ENV_VAR, "").lower() in TRUTHY
+
+
+def prometheus_text():
+    with _LOCK:
+        profilers = list(_PROFILERS.values())
+    lines = ["# HELP poscalc_stage_seconds Wall time spent in each stage of a page rerun.",
+             "# TYPE poscalc_stage_seconds histogram"]
+    for prof in profilers:
+        lines.extend(prof.prometheus_lines())
+    return "\n".join(lines) + "\n"
+
+
+def _metrics_handler():
+    # http.server pulls in the email package; only pay for it when the endpoint is asked for
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    # Idempotent per port; the scrape endpoint is http://host:port/metrics
+    with _LOCK:
+        if port not in _SERVERS:
+            from http.server import ThreadingHTTPServer
+            server = ThreadingHTTPServer((host, port), _metrics_handler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            _SERVERS[port] = server
+        return _SERVERS[port]
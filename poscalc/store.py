@@ -0,0 +1,219 @@
+import argparse
+import atexit
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    page TEXT NOT NULL,
+    user TEXT,
+    symbol TEXT,
+    direction TEXT,
+    num_entries INTEGER,
+    full_profit REAL,
+    full_loss REAL,
+    inputs TEXT,
+    outputs TEXT
+);
+CREATE INDEX IF NOT EXISTS plans_created ON plans (created, id);
+CREATE INDEX IF NOT EXISTS plans_user ON plans (user, created, id);
+CREATE INDEX IF NOT EXISTS plans_symbol ON plans (symbol, created, id);
+CREATE INDEX IF NOT EXISTS plans_direction ON plans (direction, created, id);
+"""
+SUMMARY_COLUMNS = ("id", "created", "page", "user", "symbol", "direction", "num_entries", "full_profit", "full_loss")
+FILTERS = ("user", "symbol", "direction", "page")
+# Refresh planner statistics after this many new rows, so combined filters pick the selective index
+ANALYZE_EVERY = 50_000
+
+
+class PlanStore:
+    # One connection over a WAL database, opened once and shared behind a lock: Streamlit runs every rerun and
+    # every flush timer on a new thread, so per-thread connections would reopen on each of them.
+    # Saves are buffered and written in batches
+    def __init__(self, path, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._unanalyzed = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        # Buffered saves must not die with the process
+        atexit.register(self.flush)
+        with self._db_lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None:
+                self._conn.execute("ANALYZE")
+
+    def _fetch(self, sql, params=()):
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def save(self, page, user=None, symbol=None, direction=None, inputs=None, outputs=None, created=None):
+        outputs = outputs or {}
+        row = (time.time() if created is None else created, page, user, symbol or None, direction,
+               len(outputs.get('positions') or ()), outputs.get('full_profit'), outputs.get('full_loss'),
+               json.dumps(inputs or {}), json.dumps(outputs))
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None and self.flush_interval is not None:
+                # A lone save still reaches disk within flush_interval
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if rows:
+            with self._db_lock, self._conn:
+                self._conn.executemany("INSERT INTO plans (created, page, user, symbol, direction, num_entries, "
+                                 "full_profit, full_loss, inputs, outputs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 rows)
+            self._unanalyzed += len(rows)
+            if self._unanalyzed >= ANALYZE_EVERY:
+                self.analyze()
+        return len(rows)
+
+    def analyze(self):
+        self._unanalyzed = 0
+        with self._db_lock:
+            self._conn.execute("ANALYZE")
+
+    def _where(self, filters, since, until):
+        clauses, params = [], []
+        for column in FILTERS:
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created < ?")
+            params.append(until)
+        return clauses, params
+
+    def query(self, limit=50, after=None, since=None, until=None, **filters):
+        # Newest first, keyset paged: pass the last row's (created, id) as `after` for the next page
+        self.flush()
+        clauses, params = self._where(filters, since, until)
+        if after is not None:
+            clauses.append("(created, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._fetch(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM plans {where} ORDER BY created DESC, id DESC LIMIT ?",
+            params + [limit])
+        return [dict(row) for row in rows]
+
+    def count(self, since=None, until=None, **filters):
+        self.flush()
+        clauses, params = self._where(filters, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._fetch(f"SELECT COUNT(*) FROM plans {where}", params)[0][0]
+
+    def get(self, plan_id):
+        self.flush()
+        rows = self._fetch("SELECT * FROM plans WHERE id = ?", (plan_id,))
+        if not rows:
+            return None
+        plan = dict(rows[0])
+        plan['inputs'] = json.loads(plan['inputs'])
+        plan['outputs'] = json.loads(plan['outputs'])
+        return plan
+
+    def distinct(self, column):
+        if column not in FILTERS:
+            raise ValueError(f"Unknown column: {column}")
+        self.flush()
+        rows = self._fetch(f"SELECT DISTINCT {column} FROM plans WHERE {column} IS NOT NULL ORDER BY {column}")
+        return [row[0] for row in rows]
+
+
+def _synthetic_plans(count, seed=0):
+    rng = random.Random(seed)
+    symbols = [f"COIN{i}USDT" for i in range(200)]
+    now = time.time()
+    for i in range(count):
+        entries = sorted((rng.uniform(50, 150) for _ in range(rng.randint(1, 10))), reverse=True)
+        yield {'page': rng.choice(("main", "crypto-main")), 'user': rng.choice(("Igor", "Erik", "Spot", "Leverage")),
+               'symbol': rng.choice(symbols), 'direction': rng.choice(("Long", "Short")),
+               'inputs': {'entry_prices': entries, 'stop_loss': entries[-1] * 0.9},
+               'outputs': {'positions': [rng.uniform(10, 100) for _ in entries], 'full_profit': rng.uniform(0, 50),
+                           'full_loss': rng.uniform(1, 10)},
+               'created': now - (count - i) * 60}
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(int(len(samples) * p / 100), len(samples) - 1)] * 1000 for p in (50, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic plans and time history queries")
+    parser.add_argument("--plans", type=int, default=300_000)
+    parser.add_argument("--db", help="database file (default: a temporary one)")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "plans.db")
+    store = PlanStore(path, batch_size=5_000, flush_interval=None)
+    started = time.perf_counter()
+    for plan in _synthetic_plans(args.plans):
+        store.save(**plan)
+    store.flush()
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {args.plans:,} plans in {elapsed:.2f} s ({args.plans / elapsed:,.0f} plans/s) into {path}")
+
+    rng = random.Random(1)
+    cases = {
+        'newest page': lambda: store.query(limit=50),
+        'by user': lambda: store.query(limit=50, user=rng.choice(("Igor", "Erik"))),
+        'by symbol': lambda: store.query(limit=50, symbol=f"COIN{rng.randrange(200)}USDT"),
+        'by direction': lambda: store.query(limit=50, direction=rng.choice(("Long", "Short"))),
+        'by user + symbol + direction': lambda: store.query(limit=50, user="Igor",
+                                                            symbol=f"COIN{rng.randrange(200)}USDT", direction="Long"),
+        'last day by symbol': lambda: store.query(limit=50, since=time.time() - 86_400,
+                                                  symbol=f"COIN{rng.randrange(200)}USDT"),
+    }
+    for name, query in cases.items():
+        samples = []
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - t)
+        p = _percentiles(samples)
+        print(f"{name:<32} p50 {p[50]:.3f} ms  p95 {p[95]:.3f} ms  p99 {p[99]:.3f} ms")
+
+    # Walk ten pages deep the way the history page does
+    samples, after = [], None
+    for _ in range(10):
+        t = time.perf_counter()
+        rows = store.query(limit=50, after=after, user="Erik")
+        samples.append(time.perf_counter() - t)
+        after = (rows[-1]['created'], rows[-1]['id'])
+    p = _percentiles(samples)
+    print(f"{'keyset paging, 10 pages':<32} p50 {p[50]:.3f} ms  p95 {p[95]:.3f} ms  p99 {p[99]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
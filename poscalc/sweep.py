@@ -0,0 +1,126 @@
+import heapq
+
+import numpy as np
+
+from poscalc.batch import calc_positions_batch
+from poscalc.margin import TierTable, liquidation_batch
+from poscalc.weights import entry_weights
+
+OBJECTIVES = ("reward_to_risk", "expected_value", "full_fill_profit")
+
+
+def grid_axis(low, high, steps):
+    return np.linspace(low, high, max(int(steps), 1))
+
+
+def _ladder_tables(entry_low, entry_high, entry_counts, weight_schemes):
+    width = max(entry_counts)
+    ladders = np.full((len(entry_counts), width), np.nan)
+    proportions = np.full((len(weight_schemes), len(entry_counts), width), np.nan)
+    for i, n in enumerate(entry_counts):
+        ladders[i, :n] = np.linspace(entry_low, entry_high, n)
+        for j, scheme in enumerate(weight_schemes):
+            proportions[j, i, :n] = entry_weights(scheme, n)
+    return ladders, proportions
+
+
+def _evaluate_chunk(args):
+    (start, stop, shape, stop_losses, tp_levels, ladders, proportions, setup, win_rate, objective, top_n) = args
+    index = np.unravel_index(np.arange(start, stop), shape)
+    stop_idx, count_idx, scheme_idx, tp_idx = index[0], index[1], index[2], index[3:]
+
+    take_profits = np.column_stack([levels[i] for levels, i in zip(tp_levels, tp_idx)])
+    result = calc_positions_batch(setup['portfolio_size'], setup['risk_level'], ladders[count_idx],
+                                  stop_losses[stop_idx], proportions[scheme_idx, count_idx], take_profits,
+                                  setup['liquidation_buffer'], setup['additional_risk'], setup['is_long'],
+                                  setup['trims'])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        last_entry = np.isfinite(result.positions).sum(axis=1) - 1
+        full_fill_profit = np.nansum(result.profits[np.arange(len(last_entry)), last_entry], axis=1)
+        metrics = {
+            'full_fill_profit': full_fill_profit,
+            'reward_to_risk': full_fill_profit / result.full_loss,
+            'expected_value': win_rate * full_fill_profit - (1 - win_rate) * result.full_loss,
+        }
+        # A stop on the wrong side of the ladder gives negative sizes; those setups never rank
+        valid = np.all(np.nan_to_num(result.positions, nan=1.0) > 0, axis=1) & np.isfinite(metrics[objective])
+    score = np.where(valid, metrics[objective], -np.inf)
+
+    keep = min(top_n, len(score))
+    best = np.argpartition(-score, keep - 1)[:keep]
+    best = best[np.isfinite(score[best])]
+    liquidation = result.liquidation_price
+    if setup['tier_rows'] is not None and len(best):
+        # Tiered liquidation only for the rows that can still rank; the table travels as plain rows so chunks
+        # pickle to worker processes
+        liquidation = np.array(liquidation)
+        liquidation[best] = liquidation_batch(TierTable({setup['symbol']: setup['tier_rows']}), setup['symbol'],
+                                              ladders[count_idx[best]], result.positions[best],
+                                              stop_losses[stop_idx[best]], setup['leverage'],
+                                              setup['is_long']).full_fill
+    rows = []
+    for i in best:
+        rows.append((float(score[i]), int(start + i), {
+            'stop_loss': float(stop_losses[stop_idx[i]]),
+            'take_profits': tuple(take_profits[i].tolist()),
+            'num_entries': int(last_entry[i] + 1),
+            'weight_scheme': setup['weight_schemes'][scheme_idx[i]],
+            'full_fill_profit': float(metrics['full_fill_profit'][i]),
+            'full_loss': float(result.full_loss[i]),
+            'reward_to_risk': float(metrics['reward_to_risk'][i]),
+            'expected_value': float(metrics['expected_value'][i]),
+            'liquidation_price': float(liquidation[i]),
+        }))
+    return stop - start, rows
+
+
+def iter_sweep(portfolio_size, risk_level, entry_low, entry_high, stop_losses, tp_levels, entry_counts,
+               weight_schemes=("even",), is_long=True, additional_risk=0.0, liquidation_buffer=1, win_rate=0.5,
+               objective="reward_to_risk", top_n=20, trims=None, symbol=None, tiers=None, leverage=1.0,
+               chunk_size=50_000, workers=None):
+    # With a tier table that has the symbol, liquidation is tiered at this leverage; otherwise the fixed buffer
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    stop_losses = np.asarray(stop_losses, dtype=float)
+    tp_levels = [np.asarray(levels, dtype=float) for levels in tp_levels]
+    entry_counts = [int(n) for n in entry_counts]
+    weight_schemes = tuple(weight_schemes)
+    ladders, proportions = _ladder_tables(entry_low, entry_high, entry_counts, weight_schemes)
+
+    shape = (len(stop_losses), len(entry_counts), len(weight_schemes)) + tuple(len(t) for t in tp_levels)
+    total = int(np.prod(shape))
+    setup = {'portfolio_size': portfolio_size, 'risk_level': risk_level, 'liquidation_buffer': liquidation_buffer,
+             'additional_risk': additional_risk, 'is_long': is_long, 'weight_schemes': weight_schemes,
+             'trims': trims, 'symbol': symbol, 'leverage': leverage,
+             'tier_rows': tiers.rows[symbol] if tiers is not None and symbol in tiers else None}
+    jobs = [(start, min(start + chunk_size, total), shape, stop_losses, tp_levels, ladders, proportions, setup,
+             win_rate, objective, top_n) for start in range(0, total, chunk_size)]
+
+    # Keep the best rows seen so far; the grid index breaks score ties deterministically
+    top = []
+    done = 0
+
+    def merge(chunk):
+        nonlocal top, done
+        evaluated, rows = chunk
+        done += evaluated
+        top = heapq.nlargest(top_n, top + rows, key=lambda row: (row[0], -row[1]))
+        return done, total, [row[2] for row in top]
+
+    if workers and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_evaluate_chunk, job) for job in jobs]
+            for future in as_completed(futures):
+                yield merge(future.result())
+    else:
+        for job in jobs:
+            yield merge(_evaluate_chunk(job))
+
+
+def run_sweep(*args, **kwargs):
+    top = []
+    for _, _, top in iter_sweep(*args, **kwargs):
+        pass
+    return top
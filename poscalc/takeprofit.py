@@ -0,0 +1,42 @@
+import numpy as np
+
+DEFAULT_TRIM = 0.25
+
+
+def default_trims(num_tps, trim=DEFAULT_TRIM):
+    # Trim a fixed share of what is left at every level, close the rest at the last one
+    return np.append(np.full(max(num_tps - 1, 0), trim), 1.0)
+
+
+def expand_trims(trims, num_tps):
+    # Fractions apply to the levels before the last, which always closes what is left;
+    # the last fraction given repeats for any levels it does not cover. Each one is a share of what is
+    # left, so staying within 0-100% keeps the remaining size from ever going negative
+    trims = [float(t) for t in trims] or [DEFAULT_TRIM]
+    bad = [t for t in trims if not 0 <= t <= 1]
+    if bad:
+        raise ValueError(f"TP trims must be between 0 and 100%, got {', '.join(f'{t * 100:g}%' for t in bad)}")
+    trims = (trims + [trims[-1]] * num_tps)[:max(num_tps - 1, 0)]
+    return np.asarray(trims + [1.0])
+
+
+def parse_trims(text, num_tps):
+    # "25, 50" -> fractions of the remaining size per TP level
+    return expand_trims([float(x.strip()) / 100 for x in text.split(",") if x.strip()], num_tps)
+
+
+def tp_schedule(total_coins, avg_prices, take_profits, trims, direction=1.0):
+    # total_coins / avg_prices: (..., entries); take_profits / trims: (..., tps)
+    # direction: +1 long / -1 short, broadcastable to (..., entries, tps)
+    # Returns (..., entries, tps) matrices of profit, size sold and size remaining after each level
+    total_coins = np.asarray(total_coins, dtype=float)[..., :, None]
+    avg_prices = np.asarray(avg_prices, dtype=float)[..., :, None]
+    take_profits = np.asarray(take_profits, dtype=float)[..., None, :]
+    trims = np.asarray(trims, dtype=float)
+
+    kept = np.cumprod(1 - trims, axis=-1)
+    kept_before = np.concatenate([np.ones_like(kept[..., :1]), kept[..., :-1]], axis=-1)
+    sold = total_coins * (trims * kept_before)[..., None, :]
+    profits = sold * (take_profits - avg_prices) * direction
+    remaining = total_coins * kept[..., None, :]
+    return profits, sold, remaining
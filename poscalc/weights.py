@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Hand-tuned back-weighted proportions used by crypto-main.py for 2-12 entries
+CLASSIC_PROPORTIONS = {
+    2: (0.35, 0.65),
+    3: (0.15, 0.35, 0.50),
+    4: (0.10, 0.15, 0.25, 0.50),
+    5: (0.05, 0.10, 0.15, 0.25, 0.45),
+    6: (0.05, 0.08, 0.12, 0.15, 0.25, 0.35),
+    7: (0.03, 0.05, 0.07, 0.10, 0.15, 0.25, 0.35),
+    8: (0.02, 0.03, 0.05, 0.07, 0.10, 0.15, 0.25, 0.33),
+    9: (0.02, 0.03, 0.05, 0.07, 0.08, 0.10, 0.15, 0.20, 0.30),
+    10: (0.02, 0.03, 0.05, 0.06, 0.07, 0.08, 0.09, 0.15, 0.20, 0.25),
+    11: (0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.14, 0.20, 0.30),
+    12: (0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.15, 0.20, 0.20),
+}
+
+WEIGHT_SCHEMES = ("even", "classic", "linear", "geometric", "exponential", "custom")
+
+
+def resample_curve(points, n):
+    # Stretch a weight curve given at evenly spaced control points onto n rungs
+    points = np.asarray(points, dtype=float)
+    if len(points) == 1:
+        return np.repeat(points, n)
+    return np.interp(np.linspace(0, 1, n), np.linspace(0, 1, len(points)), points)
+
+
+@lru_cache(maxsize=256)
+def entry_weights(scheme, n, param=None):
+    if n < 1:
+        raise ValueError(f"Need at least one entry, got {n}")
+    positions = np.arange(n, dtype=float)
+
+    if scheme == "even":
+        weights = np.ones(n)
+    elif scheme == "classic":
+        if n == 1:
+            weights = np.ones(1)
+        elif n in CLASSIC_PROPORTIONS:
+            weights = np.array(CLASSIC_PROPORTIONS[n])
+        else:
+            weights = resample_curve(CLASSIC_PROPORTIONS[12], n)
+    elif scheme == "linear":
+        weights = positions + 1
+    elif scheme == "geometric":
+        ratio = 1.5 if param is None else param
+        weights = ratio ** (positions - positions[-1])
+    elif scheme == "exponential":
+        rate = 3.0 if param is None else param
+        weights = np.exp(rate * (positions / max(n - 1, 1) - 1))
+    elif scheme == "custom":
+        if not param:
+            raise ValueError("Custom weight scheme needs control points")
+        weights = resample_curve(param, n)
+    else:
+        raise ValueError(f"Unknown weight scheme: {scheme}")
+
+    if np.any(weights < 0) or weights.sum() <= 0:
+        raise ValueError("Weights must be non-negative and not all zero")
+    weights = weights / weights.sum()
+    weights.flags.writeable = False
+    return weights
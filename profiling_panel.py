@@ -0,0 +1,43 @@
+import os
+
+import streamlit as st
+
+from poscalc import profiling
+
+
+def run_profiled(page, main):
+    # Opt in with ?profile=1 or POSCALC_PROFILE=1; otherwise main() runs untouched
+    if not profiling.enabled(st.query_params.get("profile")):
+        main()
+        return
+    prof = profiling.profiler(page)
+    port = os.environ.get(profiling.PORT_ENV_VAR)
+    if port:
+        try:
+            profiling.serve_metrics(int(port))
+        except (OSError, ValueError) as e:
+            st.sidebar.warning(f"Metrics endpoint unavailable: {e}")
+    with prof.run():
+        main()
+    profile_sidebar(prof, port)
+
+
+def profile_sidebar(prof, port=None):
+    import pandas as pd
+
+    summary = prof.summary()
+    if not summary:
+        return
+    st.sidebar.subheader("Profiling")
+    st.sidebar.dataframe(pd.DataFrame.from_dict(summary, orient="index").round(2))
+
+    stage = st.sidebar.selectbox("Stage histogram", list(summary), key="profiling_stage")
+    histogram = prof.rolling_histograms()[stage]
+    # bar_chart orders categories alphabetically and the pinned Streamlit 1.33 has no sort=, so labels carry their rank
+    labels = [f"{i:02d} {label}" for i, label in enumerate(prof.bucket_labels(), start=1)]
+    st.sidebar.bar_chart(pd.DataFrame({'runs': histogram}, index=labels))
+
+    if port:
+        st.sidebar.caption(f"Prometheus scrape endpoint: http://127.0.0.1:{port}/metrics")
+    st.sidebar.download_button("Export timings (Prometheus)", profiling.prometheus_text(),
+                               file_name="poscalc_metrics.prom", mime="text/plain")
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from poscalc.cache import TTLCache
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+MODEL_ENV_VAR = "POSCALC_REVIEW_MODEL"
+CACHE_ENV_VAR = "POSCALC_REVIEW_CACHE"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "poscalc", "reviews")
+SYSTEM_PROMPT = ("You review position-sizing plans for leveraged crypto trades. The plan is JSON: entry prices, "
+                 "position sizes, stop loss, take profits, profit at full fill, loss at the stop and the "
+                 "liquidation price. Point out sizing, stop and liquidation problems in at most five short "
+                 "bullet points. Do not restate the numbers.")
+_DONE = object()
+
+
+def canonical_plan(value):
+    # Same plan, same bytes: floats rounded to 10 significant digits, tuples and NumPy values made plain
+    if isinstance(value, dict):
+        return {str(key): canonical_plan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_plan(item) for item in value]
+    if hasattr(value, "tolist"):
+        return canonical_plan(value.tolist())
+    if isinstance(value, float):
+        return float(f"{value:.10g}")
+    return value
+
+
+def plan_json(plan):
+    return json.dumps(canonical_plan(plan), sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(model_name, plan):
+    return hashlib.sha256("\0".join((model_name, SYSTEM_PROMPT, plan_json(plan))).encode()).hexdigest()
+
+
+def review_messages(plan):
+    # (role, content) tuples, which every langchain_core chat model accepts
+    return [("system", SYSTEM_PROMPT), ("human", "Review this plan:\n" + plan_json(plan))]
+
+
+def make_model(name=None, temperature=0.2):
+    name = name or os.environ.get(MODEL_ENV_VAR, DEFAULT_MODEL)
+    if name == "stub":
+        from review.stub_model import StubChatModel
+        return StubChatModel()
+    from langchain_groq import ChatGroq
+    # Reads GROQ_API_KEY from the environment
+    return ChatGroq(model=name, temperature=temperature)
+
+
+class ResponseCache:
+    # In-memory LRU in front of one file per content hash, so reviews survive restarts
+    def __init__(self, directory=None, maxsize=512):
+        self.directory = directory
+        self.memory = TTLCache(maxsize, ttl=float("inf"))
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        text = self.memory.get(key)
+        if text is not None or not self.directory:
+            if text is None:
+                self.misses += 1
+            return text
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, text)
+        return text
+
+    def put(self, key, text):
+        self.memory.put(key, text)
+        if self.directory:
+            # Write then rename, so a reader never sees half a review
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self._path(key))
+
+    def stats(self):
+        hits = self.memory.hits + self.disk_hits
+        lookups = hits + self.misses
+        return {'memory_hits': self.memory.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0, 'size': len(self.memory)}
+
+
+class Reviewer:
+    # Every model request for a plan goes through the in-flight table, so one plan is never sent twice at once;
+    # finished reviews land in the cache, so it is never sent twice at all
+    def __init__(self, model, model_name, cache=None, timeout=30.0, max_concurrency=4):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache or ResponseCache()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.requests = 0
+        self.batches = 0
+        self.joined = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def key(self, plan):
+        return content_hash(self.model_name, plan)
+
+    async def _wait(self, future):
+        # None when the request we were waiting on was abandoned; the caller then sends its own.
+        # The owner's timeout bounds the wait
+        self.joined += 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return None
+            raise
+
+    async def astream(self, plan):
+        key = self.key(plan)
+        while True:
+            text = self.cache.get(key)
+            if text is None and key in self._inflight:
+                text = await self._wait(self._inflight[key])
+            if text is not None:
+                yield text
+                return
+            if key not in self._inflight:
+                break
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        parts = []
+        try:
+            # The timeout starts once a request slot is free, not while queueing behind other plans
+            async with self._slots:
+                self.requests += 1
+                stream = self.model.astream(review_messages(plan))
+                deadline = loop.time() + self.timeout
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(anext(stream), deadline - loop.time())
+                        except StopAsyncIteration:
+                            break
+                        parts.append(chunk.content)
+                        yield chunk.content
+                finally:
+                    if hasattr(stream, "aclose"):
+                        await stream.aclose()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            text = "".join(parts)
+            self.cache.put(key, text)
+            future.set_result(text)
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+    async def areview(self, plan):
+        return "".join([token async for token in self.astream(plan)])
+
+    async def areview_many(self, plans):
+        # Cached plans are answered locally, duplicates collapse to one prompt, the rest go out as one batch
+        keys = [self.key(plan) for plan in plans]
+        results, waiting, todo = {}, {}, {}
+        for key, plan in zip(keys, plans):
+            if key in results or key in waiting or key in todo:
+                continue
+            text = self.cache.get(key)
+            if text is not None:
+                results[key] = text
+            elif key in self._inflight:
+                waiting[key] = (self._inflight[key], plan)
+            else:
+                todo[key] = plan
+
+        if todo:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in todo}
+            self._inflight.update(futures)
+            self.requests += len(todo)
+            self.batches += 1
+            rounds = -(-len(todo) // self.max_concurrency)
+            try:
+                replies = await asyncio.wait_for(
+                    self.model.abatch([review_messages(plan) for plan in todo.values()],
+                                      config={'max_concurrency': self.max_concurrency}),
+                    self.timeout * rounds)
+                for (key, future), reply in zip(futures.items(), replies):
+                    results[key] = reply.content
+                    self.cache.put(key, reply.content)
+                    future.set_result(reply.content)
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()
+                raise
+            finally:
+                for key, future in futures.items():
+                    self._inflight.pop(key, None)
+                    if not future.done():
+                        future.cancel()
+
+        for key, (future, plan) in waiting.items():
+            text = await self._wait(future)
+            results[key] = text if text is not None else await self.areview(plan)
+        return [results[key] for key in keys]
+
+    def _submit(self, coro):
+        # Streamlit scripts are synchronous; reviews run on one background event loop shared by every session
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="plan-review", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stream(self, plan):
+        # Sync token generator for st.write_stream; errors and timeouts are raised once the stream ends
+        tokens = queue.Queue()
+
+        async def pump():
+            try:
+                async for token in self.astream(plan):
+                    tokens.put(token)
+            finally:
+                tokens.put(_DONE)
+
+        future = self._submit(pump())
+        while (token := tokens.get()) is not _DONE:
+            yield token
+        future.result()
+
+    def review_many(self, plans):
+        return self._submit(self.areview_many(plans)).result()
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches, 'joined': self.joined, **self.cache.stats()}
+
+
+def _synthetic_plans(count, seed=0):
+    from poscalc import calc_positions_batch
+
+    rng = random.Random(seed)
+    for _ in range(count):
+        entries = sorted((rng.uniform(90, 110) for _ in range(rng.randint(1, 6))), reverse=True)
+        stop_loss = entries[-1] * rng.uniform(0.85, 0.98)
+        take_profits = sorted(rng.uniform(115, 160) for _ in range(rng.randint(1, 3)))
+        result = calc_positions_batch(300.0, 3.0, [entries], stop_loss, [[1 / len(entries)] * len(entries)],
+                                      [take_profits], 1, 0.0, True)
+        yield {'is_long': True, 'entry_prices': entries, 'positions': result.positions[0],
+               'stop_loss': stop_loss, 'take_profits': take_profits, 'full_profit': result.full_profit[0],
+               'full_loss': result.full_loss[0], 'liquidation_price': result.liquidation_price[0]}
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(int(len(samples) * p / 100), len(samples) - 1)] * 1000 for p in (50, 95)}
+
+
+async def _timed(reviewer, plans):
+    async def one(plan):
+        t = time.perf_counter()
+        await reviewer.areview(plan)
+        return time.perf_counter() - t
+    results = await asyncio.gather(*(one(plan) for plan in plans), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    return [result for result in results if not isinstance(result, BaseException)], errors
+
+
+async def _benchmark(args, directory):
+    from review.stub_model import StubChatModel
+
+    failures = []
+    unique = list(_synthetic_plans(args.plans))
+    rng = random.Random(1)
+    # Every plan is asked for several times, concurrently, the way several sessions reviewing it would
+    workload = [rng.choice(unique) for _ in range(args.requests)]
+    expected = len({plan_json(plan) for plan in workload})
+
+    model = StubChatModel(call_latency=args.latency / 1000)
+    reviewer = Reviewer(model, "stub", ResponseCache(directory), timeout=5.0, max_concurrency=args.concurrency)
+    for label in ("cold", "warm"):
+        before = reviewer.stats()
+        latencies, errors = await _timed(reviewer, workload)
+        if errors:
+            failures.append(f"{label}: {len(errors)} reviews failed, first: {errors[0]!r}")
+            continue
+        p = _percentiles(latencies)
+        stats = reviewer.stats()
+        hits = stats['memory_hits'] + stats['disk_hits'] - before['memory_hits'] - before['disk_hits']
+        print(f"{label:<8} {len(workload):,} reviews of {expected:,} plans: {model.calls:,} model calls, "
+              f"{stats['joined'] - before['joined']:,} joined in flight, cache hit rate {hits / len(workload):.1%}, "
+              f"p50 {p[50]:.2f} ms, p95 {p[95]:.2f} ms")
+        if model.calls != expected:
+            failures.append(f"{label}: {model.calls} model calls for {expected} distinct plans")
+
+    batch = list(_synthetic_plans(args.plans, seed=2))
+    batch_workload = batch + batch[: len(batch) // 2] + workload[:10]
+    t = time.perf_counter()
+    replies = await reviewer.areview_many(batch_workload)
+    elapsed = (time.perf_counter() - t) * 1000
+    print(f"{'batch':<8} {len(batch_workload):,} plans ({len(batch):,} new) in {model.batch_requests} batch "
+          f"request(s), {model.calls - expected:,} model calls, {elapsed:.1f} ms")
+    if model.calls != expected + len(batch) or model.batch_requests != 1 or len(replies) != len(batch_workload):
+        failures.append(f"batch: {model.calls - expected} model calls for {len(batch)} new plans")
+
+    # A fresh process: empty memory, same directory
+    restarted = StubChatModel(call_latency=args.latency / 1000)
+    reviewer = Reviewer(restarted, "stub", ResponseCache(directory), timeout=5.0)
+    latencies, errors = await _timed(reviewer, workload)
+    if errors:
+        failures.append(f"restart: {len(errors)} reviews failed, first: {errors[0]!r}")
+    p = _percentiles(latencies or [0.0])
+    print(f"{'restart':<8} {len(workload):,} reviews from disk: {restarted.calls} model calls, "
+          f"{reviewer.cache.disk_hits:,} disk hits, p50 {p[50]:.2f} ms, p95 {p[95]:.2f} ms")
+    if restarted.calls:
+        failures.append(f"restart: {restarted.calls} model calls despite the disk cache")
+
+    reviewer = Reviewer(StubChatModel(hang=True), "stub", ResponseCache(), timeout=0.2)
+    t = time.perf_counter()
+    try:
+        await reviewer.areview(unique[0])
+        failures.append("timeout: a hung model returned")
+    except TimeoutError:
+        print(f"{'timeout':<8} hung model abandoned after {(time.perf_counter() - t) * 1000:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the plan review cache and batching against a local stub "
+                                                 "model")
+    parser.add_argument("--plans", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=50.0, help="stub model latency per call, ms")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        failures = asyncio.run(_benchmark(args, directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
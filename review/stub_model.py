@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+
+class StubChunk:
+    # Quacks like langchain_core's AIMessage / AIMessageChunk: only .content is read
+    def __init__(self, content):
+        self.content = content
+
+
+class StubChatModel:
+    # Local stand-in for a LangChain chat model; deterministic replies, configurable latency and call counting
+    def __init__(self, call_latency=0.05, token_delay=0.002, hang=False):
+        self.call_latency = call_latency
+        self.token_delay = token_delay
+        self.hang = hang
+        self.calls = 0
+        self.batch_requests = 0
+        self.prompts = []
+
+    def _reply(self, messages):
+        plan = json.loads(messages[-1][1].split("\n", 1)[1])
+        lines = []
+        positions = plan.get('positions') or []
+        # Sweep setups carry full_fill_profit instead of full_profit
+        profit = plan.get('full_profit', plan.get('full_fill_profit'))
+        if plan.get('full_loss') and profit is not None:
+            lines.append(f"- Reward to risk at full fill is {profit / plan['full_loss']:.2f}.")
+        if positions:
+            lines.append(f"- {len(positions)} entries; the largest position is {max(positions):.2f}.")
+        if plan.get('stop_loss') is not None and plan.get('liquidation_price') is not None:
+            gap = abs(plan['stop_loss'] - plan['liquidation_price']) / plan['stop_loss'] * 100
+            lines.append(f"- Liquidation sits {gap:.2f}% beyond the stop.")
+        lines.append("- Stub review: no model was called.")
+        return "\n".join(lines)
+
+    async def _call(self, messages):
+        self.calls += 1
+        self.prompts.append(messages[-1][1])
+        if self.hang:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.call_latency)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages, config=None):
+        return StubChunk(await self._call(messages))
+
+    async def astream(self, messages, config=None):
+        text = await self._call(messages)
+        for token in text.split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield StubChunk(token + " ")
+
+    async def abatch(self, inputs, config=None):
+        self.batch_requests += 1
+        limit = asyncio.Semaphore((config or {}).get('max_concurrency') or len(inputs) or 1)
+
+        async def one(messages):
+            async with limit:
+                return await self.ainvoke(messages)
+
+        return await asyncio.gather(*(one(messages) for messages in inputs))
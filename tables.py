@@ -0,0 +1,43 @@
+import streamlit as st
+
+# Streamlit 1.33 only has the experimental name; the pages import the decorator from here
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+# Rows sent to the browser per grid page; st.dataframe only draws the rows in view
+PAGE_SIZE = 500
+# Raw HTML a results section may send before it falls back to the grid
+HTML_BUDGET = 32 * 1024
+# Per-entry bullet lists longer than this collapse to the first and last entry
+SUMMARY_LIMIT = 10
+
+
+def number_columns(formats):
+    # {"column": "%.4f"} -> st.dataframe column_config with numeric, right-aligned cells
+    return {column: st.column_config.NumberColumn(format=fmt) for column, fmt in formats.items()}
+
+
+def summary_indices(count, limit=SUMMARY_LIMIT):
+    return list(range(count)) if count <= limit else [0, count - 1]
+
+
+def join_within_budget(blocks, budget=HTML_BUDGET):
+    # Stops building as soon as the budget is spent, so huge ladders never format their full HTML
+    parts = []
+    size = 0
+    for block in blocks:
+        size += len(block)
+        if size > budget:
+            return None
+        parts.append(block)
+    return "".join(parts)
+
+
+@fragment
+def paged_dataframe(frame, key, column_config=None, page_size=PAGE_SIZE):
+    # A fragment, so flipping pages reruns only the grid and the results above it stay on screen
+    pages = max(-(-len(frame) // page_size), 1)
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages:,}, {page_size:,} rows each)", min_value=1, max_value=pages,
+                               value=1, step=1, key=key)
+        frame = frame.iloc[(int(page) - 1) * page_size:int(page) * page_size]
+    st.dataframe(frame, column_config=column_config, hide_index=True)
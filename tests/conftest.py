@@ -0,0 +1,10 @@
+import pytest
+
+from benchmarks.harness import StreamlitStub, load_script
+
+
+@pytest.fixture(scope="session")
+def pages():
+    # The page scripts loaded with Streamlit stubbed out, so their calculators can be called directly
+    stub = StreamlitStub()
+    return {name: load_script(f"{name}.py", stub) for name in ("main", "crypto-main", "main-backup")}
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from poscalc import PlanRun, run_backtest
+
+
+def candles(*bars):
+    # (open, high, low, close) per bar, one minute apart
+    bars = np.array(bars, dtype=float)
+    return [{'ts': np.arange(len(bars)) * 60_000.0, 'open': bars[:, 0], 'high': bars[:, 1], 'low': bars[:, 2],
+             'close': bars[:, 3]}]
+
+
+def test_long_liquidated_inside_the_stop():
+    plan = PlanRun(1, "BTCUSDT", True, [100.0], [1_000.0], 80.0, [130.0], 90.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (100, 100, 84, 86), (86, 101, 85, 100)))
+    assert result['exit_reason'] == "liquidated"
+    assert result['exit_ts'] == 60_000.0
+    assert result['realized_pnl'] == pytest.approx(-100.0)
+    assert result['unrealized_pnl'] == 0.0
+
+
+def test_short_liquidated_inside_the_stop():
+    plan = PlanRun(1, "BTCUSDT", False, [100.0], [1_000.0], 120.0, [70.0], 110.0)
+    result, = run_backtest([plan], candles((99, 101, 98, 100), (100, 116, 100, 114)))
+    assert result['exit_reason'] == "liquidated"
+    assert result['realized_pnl'] == pytest.approx(-100.0)
+
+
+def test_stop_inside_liquidation_stops_out():
+    plan = PlanRun(1, "BTCUSDT", True, [100.0, 95.0], [1_000.0, 1_000.0], 90.0, [130.0], 85.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (100, 100, 88, 89)))
+    assert result['exit_reason'] == "stopped"
+    assert result['filled_rungs'] == 2
+    coins = 1_000 / 100 + 1_000 / 95
+    assert result['realized_pnl'] == pytest.approx(coins * 90 - 2_000)
+
+
+def test_gap_past_liquidation_exits_at_liquidation():
+    plan = PlanRun(1, "BTCUSDT", True, [100.0], [1_000.0], 90.0, [130.0], 85.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (80, 81, 79, 80)))
+    assert result['exit_reason'] == "liquidated"
+    assert result['realized_pnl'] == pytest.approx(-150.0)
+
+
+def test_rungs_past_liquidation_never_fill():
+    plan = PlanRun(1, "BTCUSDT", True, [100.0, 85.0], [1_000.0, 1_000.0], 80.0, [130.0], 90.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (100, 100, 82, 83)))
+    assert result['exit_reason'] == "liquidated" and result['filled_rungs'] == 1
+
+
+def test_no_position_ignores_liquidation():
+    plan = PlanRun(1, "BTCUSDT", True, [95.0], [1_000.0], 80.0, [130.0], 99.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (100, 131, 96, 130)))
+    assert result['exit_reason'] == "not_filled"
+
+
+def test_take_profits_trim_then_close():
+    plan = PlanRun(1, "BTCUSDT", True, [100.0], [1_000.0], 80.0, [110.0, 120.0], 79.0)
+    result, = run_backtest([plan], candles((101, 102, 99, 100), (100, 111, 100, 110), (110, 121, 109, 120)))
+    assert result['exit_reason'] == "take_profit" and result['tps_hit'] == 2
+    assert result['realized_pnl'] == pytest.approx(10 * 0.25 * 10 + 10 * 0.75 * 20)
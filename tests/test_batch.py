@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from poscalc import calc_positions_batch
+
+
+def reference_calc_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
+                             liquidation_buffer, additional_risk, is_long):
+    # main.py's calc_positions before the batch engine, kept verbatim as the oracle
+    if additional_risk > 0:
+        temp_portfolio_size = portfolio_size - additional_risk
+        risk_amount = (temp_portfolio_size * (risk_level / 100))
+        total_risk = risk_amount + additional_risk
+    else:
+        risk_amount = (portfolio_size * (risk_level / 100))
+        total_risk = risk_amount
+
+    risk_per_entry = [total_risk * prop for prop in entry_proportions]
+
+    if is_long:
+        positions = [risk / ((price - stop_loss) / price) for price, risk in zip(entry_prices, risk_per_entry)]
+    else:
+        positions = [risk / ((stop_loss - price) / price) for price, risk in zip(entry_prices, risk_per_entry)]
+
+    profits = []
+    for i in range(len(entry_prices)):
+        total_invested = sum(positions[:i + 1])
+        avg_buy_price = sum(entry_prices[:i + 1]) / (i + 1)
+        total_coins = total_invested / avg_buy_price
+
+        entry_profits = []
+        remaining_coins = total_coins
+        for tp in take_profits:
+            if tp != take_profits[-1]:
+                coins_to_trim = remaining_coins * 0.25
+                if is_long:
+                    trim_profit = coins_to_trim * (tp - avg_buy_price)
+                else:
+                    trim_profit = coins_to_trim * (avg_buy_price - tp)
+                remaining_coins -= coins_to_trim
+            else:
+                if is_long:
+                    trim_profit = remaining_coins * (tp - avg_buy_price)
+                else:
+                    trim_profit = remaining_coins * (avg_buy_price - tp)
+            entry_profits.append((trim_profit, coins_to_trim if tp != take_profits[-1] else remaining_coins))
+        profits.append(entry_profits)
+
+    full_profit = profits[-1][-1][0]
+    full_loss = total_risk
+    if is_long:
+        liquidation_price = stop_loss * (1 - liquidation_buffer / 100)
+    else:
+        liquidation_price = stop_loss * (1 + liquidation_buffer / 100)
+    return positions, profits, full_profit, full_loss, liquidation_price
+
+
+SETUPS = [
+    (300.0, 3.0, [100.0], 90.0, [120.0], 1, 0.0, True),
+    (300.0, 3.0, [100.0, 95.0, 92.0], 85.0, [110.0, 120.0, 135.0], 1, 0.0, True),
+    (1_000.0, 2.0, [50.0, 52.5, 55.0, 57.5], 60.0, [45.0, 40.0], 2, 25.0, False),
+    (100.0, 1.5, list(np.linspace(100, 80, 40)), 70.0, [105.0, 110.0, 120.0, 130.0, 150.0], 1, 5.0, True),
+]
+
+
+@pytest.mark.parametrize("setup", SETUPS)
+def test_main_calc_positions_matches_the_reference(pages, setup):
+    portfolio, risk, entries, stop, tps, buffer, additional, is_long = setup
+    proportions = [1 / len(entries)] * len(entries)
+    expected = reference_calc_positions(portfolio, risk, entries, stop, proportions, tps, buffer, additional,
+                                        is_long)
+    actual = pages['main'].calc_positions(portfolio, risk, entries, stop, proportions, tps, buffer, additional,
+                                          is_long)
+
+    np.testing.assert_allclose(actual[0], expected[0], rtol=1e-12)
+    np.testing.assert_allclose(np.array(actual[1]), np.array(expected[1]), rtol=1e-12, atol=1e-12)
+    assert actual[2:] == pytest.approx(expected[2:], rel=1e-12)
+
+
+def test_ragged_batch_matches_one_call_per_setup():
+    portfolio, risk, entries, stops, tps, buffers, additional, is_long = zip(*SETUPS)
+    proportions = [[1 / len(ladder)] * len(ladder) for ladder in entries]
+    batch = calc_positions_batch(portfolio, risk, entries, stops, proportions, tps, buffers, additional, is_long)
+
+    for i, setup in enumerate(SETUPS):
+        positions, profits, full_profit, full_loss, liquidation = reference_calc_positions(
+            *setup[:4], proportions[i], *setup[4:])
+        n, t = len(setup[2]), len(setup[4])
+        np.testing.assert_allclose(batch.positions[i, :n], positions, rtol=1e-12)
+        assert np.isnan(batch.positions[i, n:]).all()
+        np.testing.assert_allclose(batch.profits[i, :n, :t], [[profit for profit, _ in row] for row in profits],
+                                   rtol=1e-12, atol=1e-12)
+        assert np.isnan(batch.profits[i, n:]).all() and np.isnan(batch.profits[i, :, t:]).all()
+        assert batch.full_profit[i] == pytest.approx(full_profit, rel=1e-12)
+        assert batch.full_loss[i] == pytest.approx(full_loss, rel=1e-12)
+        assert batch.liquidation_price[i] == pytest.approx(liquidation, rel=1e-12)
+
+
+def test_scalar_inputs_broadcast_across_setups():
+    entries = [[100.0, 95.0], [100.0, 95.0]]
+    batch = calc_positions_batch(300.0, [1.0, 2.0], entries, 90.0, [0.5, 0.5], [[120.0]] * 2, 1, 0.0, True)
+    np.testing.assert_allclose(batch.positions[1], batch.positions[0] * 2)
+    np.testing.assert_allclose(batch.full_loss, [3.0, 6.0])
@@ -0,0 +1,105 @@
+import numpy as np
+
+from poscalc.cache import TTLCache, memoize, normalize_csv, parse_csv_floats, shared_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = TTLCache(maxsize=4, ttl=10, timer=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    # The expired entry is dropped, not just hidden
+    assert len(cache) == 0
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0, 'maxsize': 4}
+
+
+def test_put_refreshes_the_expiry():
+    clock = Clock()
+    cache = TTLCache(ttl=10, timer=clock)
+    cache.put("a", 1)
+    clock.now = 8.0
+    cache.put("a", 2)
+    clock.now = 15.0
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = TTLCache(maxsize=3, ttl=float("inf"))
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"
+    cache.put("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+    cache.put("e", "E")
+    assert cache.get("a") is None and len(cache) == 3
+
+
+def test_clear_resets_the_counters():
+    cache = TTLCache()
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 256}
+
+
+def test_shared_caches_survive_reruns_by_name():
+    first = shared_cache("tests.shared", maxsize=8)
+    first.put("plan", 1)
+    # A rerun re-executes the page and asks again: same object, same contents
+    assert shared_cache("tests.shared", maxsize=8) is first
+    assert shared_cache("tests.shared").get("plan") == 1
+    assert shared_cache("tests.other") is not first
+
+
+def test_memoize_counts_hits_and_misses():
+    calls = []
+
+    @memoize(maxsize=8, name="tests.memoize.counts")
+    def plan(size, risk=1.0):
+        calls.append((size, risk))
+        return size * risk
+
+    plan.cache.clear()
+    assert plan(100.0, risk=2.0) == 200.0
+    assert plan(100.0, risk=2.0) == 200.0
+    assert plan(100.0) == 100.0
+    assert calls == [(100.0, 2.0), (100.0, 1.0)]
+    assert plan.cache.stats()['hits'] == 1 and plan.cache.stats()['misses'] == 2
+
+
+def test_memoize_keys_lists_and_arrays_by_content():
+    calls = []
+
+    @memoize(name="tests.memoize.arrays")
+    def total(values, weights=None):
+        calls.append(1)
+        return float(np.sum(np.multiply(values, 1 if weights is None else weights)))
+
+    total.cache.clear()
+    assert total([1.0, 2.0], weights=np.array([1.0, 3.0])) == 7.0
+    assert total([1.0, 2.0], weights=np.array([1.0, 3.0])) == 7.0
+    assert total(np.array([1.0, 2.0])) == 3.0
+    assert total(np.array([1.0, 2.0])) == 3.0
+    # Same numbers, different dtype or shape: different keys
+    assert total(np.array([1, 2])) == 3.0
+    assert total(np.array([[1.0, 2.0]])) == 3.0
+    assert total([1.0, 2.0], weights=np.array([1.0, 4.0])) == 9.0
+    assert len(calls) == 5
+
+
+def test_csv_helpers():
+    assert normalize_csv(" 1, 2 ,3 ") == "1,2,3"
+    assert parse_csv_floats("1, 2,,3.5") == (1.0, 2.0, 3.5)
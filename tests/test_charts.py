@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import charts
+from charts import MAX_POINTS, WEBGL_THRESHOLD, downsample, gains_figure, outcome_figure
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    charts._FIGURES.clear()
+    yield
+    charts._FIGURES.clear()
+
+
+def test_short_series_are_kept_whole():
+    keep, values = downsample([3.0, 1.0, 2.0], max_points=10)
+    assert keep.tolist() == [0, 1, 2] and values.tolist() == [3.0, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("size", [2_001, 10_000, 123_457])
+def test_downsample_keeps_the_extremes_within_the_budget(size):
+    rng = np.random.default_rng(size)
+    series = rng.normal(size=size).cumsum()
+    series[size // 3], series[size // 2] = 1e6, -1e6
+    keep, values = downsample(series)
+
+    assert len(keep) <= MAX_POINTS
+    assert np.all(np.diff(keep) > 0) and values.tolist() == series[keep].tolist()
+    assert values.max() == 1e6 and values.min() == -1e6
+    # Every bucket of the series contributes its own low and high
+    width = -(-size // (MAX_POINTS // 2))
+    for start in range(0, size, width):
+        chunk = series[start:start + width]
+        assert {start + chunk.argmin(), start + chunk.argmax()} <= set(keep.tolist())
+
+
+def test_bars_below_the_threshold_and_webgl_above():
+    small = gains_figure(np.arange(WEBGL_THRESHOLD, dtype=float))
+    assert small.data[0].type == "bar" and len(small.data[0].y) == WEBGL_THRESHOLD
+
+    large = gains_figure(np.arange(50_000, dtype=float))
+    assert large.data[0].type == "scattergl" and len(large.data[0].y) <= MAX_POINTS
+
+    outcomes = outcome_figure(1_000.0, np.arange(50_000, dtype=float), 100.0)
+    assert outcomes.data[0].type == "scattergl"
+    # The stop loss stays the last point
+    assert outcomes.data[0].y[-1] == 900.0 and outcomes.data[0].marker.color[-1] == "red"
+    assert outcome_figure(1_000.0, [10.0, 20.0], 100.0).data[0].x[-1] == "Lose"
+
+
+def test_figures_are_cached_by_the_input_digest(monkeypatch):
+    builds = []
+    build = charts._build_gains
+    monkeypatch.setattr(charts, "_build_gains", lambda *args: builds.append(args) or build(*args))
+
+    gains = np.linspace(-5, 5, 500)
+    gains_figure(gains)
+    gains_figure(gains.tolist())
+    assert len(builds) == 1
+    # Different values or a different threshold are different figures
+    gains_figure(gains + 1)
+    gains_figure(gains, threshold=1_000)
+    assert len(builds) == 3
+
+
+def test_callers_get_their_own_copy():
+    gains = np.linspace(-5, 5, 50)
+    first = gains_figure(gains)
+    first.update_layout(title="Changed")
+    first.data[0].y = [0.0]
+
+    second = gains_figure(gains)
+    assert second is not first
+    assert second.layout.title.text == "Gains by Entry Scenario" and len(second.data[0].y) == 50
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from poscalc import interpolate_entries, parse_csv_floats
+from poscalc.headless import OUTPUT_COLUMNS, run, synthetic_records
+from poscalc.margin import TierTable, ladder_liquidation, synthetic_tiers
+from poscalc.sweep import run_sweep
+
+
+class ListOutput:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+
+def run_rows(records, calculator, **kwargs):
+    output = ListOutput()
+    run(records, output, calculator, **kwargs)
+    return output.rows
+
+
+@pytest.mark.parametrize("calculator", ["main", "crypto"])
+def test_full_fill_profit_is_the_sum_of_tp_profits(calculator):
+    rows = run_rows(synthetic_records(200, calculator), calculator, chunk_size=64)
+    assert [row['row'] for row in rows] == list(range(200))
+    assert all(tuple(row) == OUTPUT_COLUMNS and row['error'] is None for row in rows)
+    for row in rows:
+        assert row['full_fill_profit'] == pytest.approx(sum(json.loads(row['tp_profits'])))
+
+
+def test_main_full_fill_profit_matches_the_sweep():
+    entries = np.linspace(90.0, 100.0, 4)
+    row, = run_rows([{'portfolio_size': 300.0, 'risk_level': 3.0, 'entry_prices': ", ".join(map(str, entries)),
+                      'stop_loss': 80.0, 'take_profits': "120, 140", 'trims': "40"}], "main")
+    best, = run_sweep(300.0, 3.0, 90.0, 100.0, [80.0], [[120.0], [140.0]], [4], trims=[0.4, 1.0], top_n=1)
+    assert row['full_fill_profit'] == pytest.approx(best['full_fill_profit'])
+    assert row['full_loss'] == pytest.approx(best['full_loss'])
+
+
+def test_bad_rows_become_error_rows():
+    records = [{'portfolio_size': 300.0, 'risk_level': 1.0, 'entry_prices': "100", 'stop_loss': 90.0},
+               {'portfolio_size': 300.0, 'risk_level': 1.0, 'entry_prices': "100", 'stop_loss': 90.0,
+                'take_profits': "120", 'trims': "150"},
+               {'portfolio_size': 300.0, 'risk_level': 1.0, 'entry_prices': "100", 'stop_loss': 90.0,
+                'take_profits': "120"}]
+    missing, bad_trim, good = run_rows(records, "main")
+    assert missing['error'] == "missing take_profits" and missing['full_fill_profit'] is None
+    assert "between 0 and 100%" in bad_trim['error']
+    assert good['error'] is None and good['full_fill_profit'] == pytest.approx(3.0 * 20 / 10)
+
+
+@pytest.mark.parametrize("calculator", ["main", "crypto"])
+def test_symbols_with_tiers_get_tiered_liquidation(calculator):
+    records = list(synthetic_records(300, calculator))
+    tiers = TierTable({symbol: synthetic_tiers(50.0) for symbol in ("COIN1USDT", "COIN7USDT", "COIN35USDT")})
+    plain = run_rows(records, calculator, chunk_size=64)
+    rows = run_rows(records, calculator, chunk_size=64, workers=2, tiers=tiers)
+
+    assert any(row['liquidation_tiered'] for row in rows)
+    for record, row, buffered in zip(records, rows, plain):
+        assert row['liquidation_tiered'] == (record['symbol'] in tiers)
+        if not row['liquidation_tiered']:
+            assert row == buffered
+            continue
+        # The rungs actually used: crypto may interpolate extra ones
+        entries = interpolate_entries(parse_csv_floats(record['entry_prices']), record.get('entries_between', 0) + 1)
+        expected = ladder_liquidation(tiers, record['symbol'], entries, json.loads(row['positions']),
+                                      record['stop_loss'], 10.0, row['side'] == "Long").full_fill[0]
+        assert row['liquidation_price'] == pytest.approx(expected)
+
+
+def test_side_is_long_or_short_in_any_case():
+    base = {'portfolio_size': 300.0, 'risk_level': 1.0, 'entry_prices': "100", 'stop_loss': 110.0,
+            'take_profits': "80"}
+    rows = run_rows([{**base, 'side': side} for side in ("short", "SHORT", " Short ", "Sell", "lon")], "main")
+    assert [row['side'] for row in rows[:3]] == ["Short"] * 3 and all(row['error'] is None for row in rows[:3])
+    assert rows[3]['error'] == "side must be Long or Short, got 'Sell'" and rows[3]['full_fill_profit'] is None
+    assert "got 'lon'" in rows[4]['error']
+    assert run_rows([{**base, 'stop_loss': 90.0, 'take_profits': "120", 'side': "long"}], "main")[0]['side'] == "Long"
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from poscalc import build_ladder, interpolate_entries
+from poscalc.engine import crypto_positions
+
+
+def reference_calc_positions(portfolio_size, risk_level, entry_prices, stop_loss, entry_proportions, take_profits,
+                             liquidation_buffer):
+    # crypto-main.py's quadratic calc_positions before the running-total engine, kept verbatim as the oracle
+    risk_amount = portfolio_size * (risk_level / 100) / 3  # Adjusted for the 3x issue
+    risk_per_entry = [risk_amount * prop for prop in entry_proportions]
+
+    positions = []
+    for price, risk in zip(entry_prices, risk_per_entry):
+        pos = risk / abs((price - stop_loss) / price)
+        positions.append(pos)
+
+    avg_prices = [
+        sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(positions[:i + 1])
+        for i in range(len(entry_prices))]
+
+    profits = [sum(positions[:i + 1]) * (take_profits[-1] - sum(
+        price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(positions[:i + 1])) / (
+                           sum(price * pos for price, pos in zip(entry_prices[:i + 1], positions[:i + 1])) / sum(
+                       positions[:i + 1])) for i in range(len(entry_prices))]
+
+    cumulative_shares = [sum(positions[:i + 1]) / avg_prices[i] for i in range(len(entry_prices))]
+
+    full_profit, full_loss = profits[-1], risk_amount * 3  # Adjusted for the 3x issue
+    liquidation_price = stop_loss * (1 - liquidation_buffer / 100)
+
+    return positions, avg_prices, profits, full_profit, full_loss, liquidation_price, cumulative_shares
+
+
+@pytest.mark.parametrize("num_entries", [1, 2, 5, 60])
+def test_crypto_positions_matches_the_reference(num_entries):
+    entries = np.linspace(100, 80, num_entries).tolist()
+    weights = np.linspace(1, 3, num_entries)
+    proportions = (weights / weights.sum()).tolist()
+    expected = reference_calc_positions(4_400.0, 1.0, entries, 70.0, proportions, [110.0, 130.0], 1)
+    actual = crypto_positions(4_400.0, 1.0, entries, 70.0, proportions, [110.0, 130.0], 1)
+
+    for got, want in zip(actual, expected):
+        np.testing.assert_allclose(got, want, rtol=1e-10)
+
+
+def test_build_ladder_running_totals():
+    ladder = build_ladder(10.0, [100.0, 90.0], 80.0, [0.5, 0.5], 120.0)
+    np.testing.assert_allclose(ladder.positions, [25.0, 45.0])
+    np.testing.assert_allclose(ladder.cumulative_size, [25.0, 70.0])
+    avg = (100 * 25 + 90 * 45) / 70
+    np.testing.assert_allclose(ladder.avg_prices, [100.0, avg])
+    np.testing.assert_allclose(ladder.shares, [0.25, 70 / avg])
+    np.testing.assert_allclose(ladder.profits, [5.0, 70 * (120 - avg) / avg])
+
+
+def test_interpolate_entries_splits_every_gap():
+    np.testing.assert_allclose(interpolate_entries([100, 90, 70], 2), [100, 95, 90, 80, 70])
+    np.testing.assert_allclose(interpolate_entries([100, 90], 4), [100, 97.5, 95, 92.5, 90])
+    assert len(interpolate_entries(np.linspace(100, 50, 11), 1_000)) == 10 * 1_000 + 1
+
+
+def test_interpolate_entries_leaves_short_ladders_alone():
+    np.testing.assert_allclose(interpolate_entries([100], 5), [100])
+    np.testing.assert_allclose(interpolate_entries([100, 90], 1), [100, 90])
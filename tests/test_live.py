@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from exchange.live import LiveFeed, PlanBook, ReplayWebSocket
+
+
+def replay(book, symbol, prices):
+    messages = [{"topic": f"tickers.{symbol}", "type": "snapshot", "ts": 1_700_000_000_000 + i,
+                 "data": {"symbol": symbol, "lastPrice": str(price)}} for i, price in enumerate(prices)]
+
+    async def run():
+        feed = LiveFeed(book, lambda: ReplayWebSocket(messages, on_finished=lambda: feed.stop()))
+        await feed.run()
+        return feed
+
+    return asyncio.run(run())
+
+
+def test_stop_out_is_sticky_and_pnl_freezes_at_the_exit():
+    book = PlanBook()
+    plan_id = book.add("BTCUSDT", True, [100.0, 95.0], [1_000.0, 1_000.0], 90.0, 85.0)
+    feed = replay(book, "BTCUSDT", [99.0, 96.0, 94.0, 89.0, 120.0, 80.0])
+    assert feed.stats.ticks == 6
+
+    state = book.states[plan_id]
+    assert state['status'] == "stopped"
+    assert state['exit_price'] == 89.0
+    assert state['filled_rungs'] == 2
+    assert state['last_price'] == 80.0
+    assert state['unrealized_pnl'] == 0.0
+    assert state['realized_pnl'] == pytest.approx((10 + 1_000 / 95) * 89 - 2_000)
+
+
+def test_liquidation_inside_the_stop_exits_at_liquidation():
+    book = PlanBook()
+    long_id = book.add("ETHUSDT", True, [100.0], [1_000.0], 80.0, 90.0)
+    short_id = book.add("ETHUSDT", False, [100.0], [1_000.0], 120.0, 110.0)
+    replay(book, "ETHUSDT", [100.0, 84.0, 100.0, 116.0, 100.0])
+
+    long_state, short_state = book.states[long_id], book.states[short_id]
+    assert long_state['status'] == "liquidated" and long_state['exit_price'] == 90.0
+    assert long_state['realized_pnl'] == pytest.approx(-100.0)
+    assert short_state['status'] == "liquidated" and short_state['exit_price'] == 110.0
+    assert short_state['realized_pnl'] == pytest.approx(-100.0)
+
+
+def test_rungs_past_the_stop_do_not_fill_on_a_gap():
+    book = PlanBook()
+    plan_id = book.add("SOLUSDT", True, [100.0, 95.0, 85.0], [100.0, 100.0, 100.0], 90.0, 80.0)
+    replay(book, "SOLUSDT", [101.0, 84.0])
+    state = book.states[plan_id]
+    assert state['filled_rungs'] == 2
+    assert state['status'] == "stopped" and state['exit_price'] == 84.0
+
+
+def test_open_plan_tracks_unrealized_pnl():
+    book = PlanBook()
+    plan_id = book.add("BTCUSDT", False, [100.0, 105.0], [500.0, 500.0], 110.0, 111.0)
+    replay(book, "BTCUSDT", [101.0, 106.0, 95.0])
+    state = book.states[plan_id]
+    assert state['status'] == "open" and state['filled_rungs'] == 2
+    assert state['realized_pnl'] == 0.0
+    assert state['unrealized_pnl'] == pytest.approx(1_000 - (5 + 500 / 105) * 95)
+    assert state['distance_to_stop_pct'] == pytest.approx((110 - 95) / 95 * 100)
+
+
+def test_feed_retries_after_the_socket_fails_to_open():
+    book = PlanBook()
+    plan_id = book.add("BTCUSDT", True, [100.0], [1_000.0], 90.0, 85.0)
+    messages = [{"topic": "tickers.BTCUSDT", "type": "snapshot", "ts": 1_700_000_000_000,
+                 "data": {"symbol": "BTCUSDT", "lastPrice": "99.0"}}]
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("network blip")
+        return ReplayWebSocket(messages, on_finished=lambda: feed.stop())
+
+    feed = LiveFeed(book, factory, retry_delay=0.0)
+    feed.start_in_thread().join(timeout=5)
+    assert isinstance(feed.error, ConnectionError) and feed.failures == 1
+    assert feed.thread is None and feed.loop is None
+
+    feed.start_in_thread().join(timeout=5)
+    assert len(attempts) == 2
+    assert feed.error is None and feed.failures == 0
+    assert feed.stats.ticks == 1 and book.states[plan_id]['filled_rungs'] == 1
+
+
+def test_failed_feed_backs_off_before_retrying():
+    def factory():
+        raise ConnectionError("bad endpoint")
+
+    feed = LiveFeed(PlanBook(), factory, retry_delay=60.0, max_retry_delay=300.0)
+    feed.start_in_thread().join(timeout=5)
+    assert feed.start_in_thread() is None
+    feed._retry_at = 0.0
+    feed.start_in_thread().join(timeout=5)
+    assert feed.failures == 2 and feed._retry_at - time.monotonic() > 100
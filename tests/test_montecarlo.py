@@ -0,0 +1,18 @@
+import pytest
+
+from poscalc import MAX_TRADES, simulate_paths
+
+
+def test_trades_per_path_are_capped():
+    with pytest.raises(ValueError):
+        simulate_paths(1_000.0, 2.0, 0.4, MAX_TRADES + 1, 1_000)
+
+
+def test_long_paths_run_in_bounded_chunks():
+    result = simulate_paths(1_000.0, 2.0, 0.4, MAX_TRADES, 5_000, seed=0)
+    assert result['bands'].shape == (5, MAX_TRADES + 1)
+    assert (result['bands'][:, 0] == 1_000.0).all()
+    assert len(result['max_drawdowns']) == 5_000
+    # The seeded run is reproducible whether or not chunks go through a process pool
+    pooled = simulate_paths(1_000.0, 2.0, 0.4, MAX_TRADES, 5_000, seed=0, workers=2)
+    assert pooled['final_percentiles'] == result['final_percentiles']
@@ -0,0 +1,99 @@
+import logging
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from exchange.mock_bybit import MockBybit
+from exchange.orders import Instrument, InstrumentCache, LadderSubmitter, ladder_orders, make_session, place_ladder
+
+
+@pytest.fixture
+def mock():
+    with MockBybit(requests_per_second=10) as mock:
+        yield mock
+
+
+def test_200_order_ladder_end_to_end(mock):
+    session = make_session("mock-key", "mock-secret", endpoint=mock.endpoint)
+    entry_prices = np.linspace(60_000, 50_000, 200)
+    results, skipped = place_ladder(session, InstrumentCache(session), "BTCUSDT", True, entry_prices,
+                                    np.full(200, 1_000.0), batch_size=10, concurrency=4)
+
+    assert not skipped
+    assert len(results) == 200 and all(result['code'] == 0 for result in results)
+    assert [result['orderLinkId'].rsplit("-", 1)[1] for result in results] == [str(i) for i in range(1, 201)]
+    assert len(mock.orders) == 200
+    # 20 batches against 10 requests per second: the overflow is rate limited and retried
+    assert mock.batch_requests == 20
+    assert mock.rate_limited > 0
+
+
+def test_orders_round_to_tick_and_lot():
+    instrument = Instrument("BTCUSDT", Decimal("0.10"), Decimal("0.001"), Decimal("0.001"), Decimal("100"))
+    orders, skipped = ladder_orders(instrument, True, [60_000.07, 50_000.0], [1_000.0, 10.0], "plan")
+    assert orders == [{"symbol": "BTCUSDT", "side": "Buy", "orderType": "Limit", "qty": "0.016",
+                       "price": "60000", "timeInForce": "GTC", "orderLinkId": "plan-1"}]
+    assert skipped[0]['entry'] == 2
+
+    orders, _ = ladder_orders(instrument, False, [60_000.01], [1_000.0], "plan")
+    assert orders[0]['side'] == "Sell" and orders[0]['price'] == "60000.1"
+
+
+def test_instruments_are_fetched_once(mock):
+    session = make_session(endpoint=mock.endpoint)
+    instruments = InstrumentCache(session)
+    assert instruments.get("ETHUSDT") is instruments.get("ETHUSDT")
+    with pytest.raises(ValueError):
+        instruments.get("NOPEUSDT")
+
+
+def test_missing_keys_fail_every_order_instead_of_raising(mock):
+    session = make_session(endpoint=mock.endpoint)
+    results, _ = place_ladder(session, InstrumentCache(session), "BTCUSDT", True, [60_000.0, 59_000.0],
+                              [1_000.0, 1_000.0])
+    assert len(results) == 2
+    assert all(result['code'] != 0 and result['orderId'] is None for result in results)
+    assert "keys" in results[0]['message']
+    assert not mock.orders
+
+
+class FlakySession:
+    # Fails the second batch with a network error; the others go through to the mock
+    def __init__(self, session):
+        self.session = session
+        self.calls = 0
+
+    def place_batch_order(self, **kwargs):
+        self.calls += 1
+        if self.calls == 2:
+            raise ConnectionError("connection reset")
+        return self.session.place_batch_order(**kwargs)
+
+
+def test_failed_batch_keeps_results_of_placed_batches(mock):
+    session = make_session("mock-key", "mock-secret", endpoint=mock.endpoint)
+    orders, _ = ladder_orders(InstrumentCache(session).get("BTCUSDT"), True, np.linspace(60_000, 59_000, 30),
+                              np.full(30, 1_000.0))
+    results = LadderSubmitter(FlakySession(session), batch_size=10, concurrency=1).submit(orders)
+
+    assert len(results) == 30
+    assert [result['code'] == 0 for result in results] == [True] * 10 + [False] * 10 + [True] * 10
+    assert results[10]['message'] == "ConnectionError: connection reset"
+    assert len(mock.orders) == 20
+
+
+def test_every_order_is_logged_with_its_batch_latency(mock, caplog):
+    session = make_session("mock-key", "mock-secret", endpoint=mock.endpoint)
+    orders, _ = ladder_orders(InstrumentCache(session).get("BTCUSDT"), True, np.linspace(60_000, 59_000, 30),
+                              np.full(30, 1_000.0))
+    with caplog.at_level(logging.INFO, logger="exchange.orders"):
+        results = LadderSubmitter(FlakySession(session), batch_size=10, concurrency=1).submit(orders)
+
+    logged = {record.args[0]: record.args[-1] for record in caplog.records if record.msg.startswith("%s %s %s @")}
+    assert sorted(logged) == sorted(order["orderLinkId"] for order in orders)
+    for result in results:
+        assert result['latency_ms'] is not None and logged[result['orderLinkId']] == result['latency_ms']
+    # One request per batch: every order in a batch shares its latency, the failed batch included
+    for start in range(0, 30, 10):
+        assert len({result['latency_ms'] for result in results[start:start + 10]}) == 1
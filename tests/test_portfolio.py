@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from poscalc import Portfolio, RiskBudget
+from poscalc.margin import TierTable, ladder_liquidation, synthetic_tiers
+
+
+def test_size_plan_matches_main_calc_positions(pages):
+    entries = [100.0, 95.0, 90.0]
+    positions, _, _, full_loss, liquidation = pages['main'].calc_positions(300.0, 3.0, entries, 80.0, [1 / 3] * 3,
+                                                                           [120.0], 1, 5.0, True)
+    risk, sized, sized_liquidation = Portfolio().size_plan(RiskBudget(300.0, 100.0), "BTCUSDT", True, entries, 80.0,
+                                                           3.0, additional_risk=5.0)
+    assert risk == pytest.approx(full_loss)
+    np.testing.assert_allclose(sized, positions, rtol=1e-12)
+    assert sized_liquidation == pytest.approx([liquidation] * 3)
+
+
+def test_size_plan_caps_risk_at_the_remaining_budget():
+    portfolio = Portfolio()
+    budget = RiskBudget(1_000.0, 5.0)
+    full_risk, full, _ = portfolio.size_plan(RiskBudget(1_000.0, 100.0), "ETHUSDT", False, [100.0, 105.0], 110.0, 8.0)
+    risk, capped, _ = portfolio.size_plan(budget, "ETHUSDT", False, [100.0, 105.0], 110.0, 8.0)
+    assert risk == pytest.approx(50.0)
+    np.testing.assert_allclose(capped, np.multiply(full, risk / full_risk))
+
+
+def test_budgets_stay_with_the_caller():
+    portfolio = Portfolio()
+    portfolio.open_plan(RiskBudget(1_000.0, 10.0), "BTCUSDT", True, [100.0], 90.0, 4.0)
+    assert portfolio.aggregate()['risk'] == pytest.approx(40.0)
+    # Another session with a smaller account sees the same plans against its own caps
+    assert portfolio.remaining_risk(RiskBudget(1_000.0, 10.0)) == pytest.approx(60.0)
+    assert portfolio.remaining_risk(RiskBudget(500.0, 10.0)) == pytest.approx(10.0)
+    assert portfolio.remaining_risk(RiskBudget(1_000.0, 10.0, 5.0), "BTCUSDT") == pytest.approx(10.0)
+    with pytest.raises(ValueError, match="No risk budget"):
+        portfolio.open_plan(RiskBudget(300.0, 10.0), "ETHUSDT", True, [100.0], 90.0, 1.0)
+
+
+def test_fills_and_closes_update_every_aggregate():
+    portfolio = Portfolio()
+    plan_id = portfolio.add("BTCUSDT", True, [95.0, 100.0], [1_000.0, 1_000.0], 90.0, 85.0)
+    portfolio.add("ETHUSDT", False, [100.0], [500.0], 110.0, 115.0)
+
+    assert portfolio.aggregate()['plans'] == 2
+    assert portfolio.aggregate("BTCUSDT")['open_risk'] == 0.0
+    portfolio.fill(plan_id, 1)
+    # Longs fill from the highest rung down
+    assert portfolio.aggregate("BTCUSDT", "Long")['open_risk'] == pytest.approx(100.0)
+    assert portfolio.aggregate("BTCUSDT")['open_margin'] == pytest.approx(150.0)
+    portfolio.close(plan_id)
+    assert portfolio.aggregate("BTCUSDT")['plans'] == 0
+    assert [row['symbol'] for row in portfolio.breakdown()] == ["ETHUSDT"]
+
+
+def test_tiered_liquidation_prices_every_fill():
+    tiers = TierTable({"BTCUSDT": synthetic_tiers(500.0)})
+    portfolio = Portfolio()
+    entries = [100.0, 95.0, 90.0]
+    budget = RiskBudget(10_000.0, 100.0)
+    plan_id = portfolio.open_plan(budget, "BTCUSDT", True, entries, 80.0, 3.0, tiers=tiers, leverage=5.0)
+    plan = portfolio.plans[plan_id]
+    expected = ladder_liquidation(tiers, "BTCUSDT", entries, plan.positions, 80.0, 5.0).prices[0]
+    assert plan.liquidation_price == pytest.approx(expected[-1])
+
+    # One rung filled: the loss at the liquidation price for a one-rung position, not the full ladder's
+    portfolio.fill(plan_id, 1)
+    assert portfolio.aggregate()['open_margin'] == pytest.approx(plan.positions[0] * (1 - expected[0] / 100))
+
+    # No tiers for the symbol: the fixed buffer
+    other = portfolio.open_plan(budget, "ETHUSDT", True, entries, 80.0, 3.0, tiers=tiers, leverage=5.0)
+    assert portfolio.plans[other].liquidation_price == pytest.approx(80.0 * 0.99)
@@ -0,0 +1,98 @@
+import re
+import urllib.request
+
+import pytest
+
+from poscalc import profiling
+from poscalc.profiling import Profiler, StageStats
+
+
+def parse(text, page):
+    # {(metric, stage, le): value} for one page's samples
+    samples = {}
+    for line in text.splitlines():
+        match = re.fullmatch(r'(\w+)\{page="([^"]*)",stage="([^"]*)"(?:,le="([^"]*)")?\} (\S+)', line)
+        if match and match[2] == page:
+            samples[match[1], match[3], match[4]] = float(match[5])
+    return samples
+
+
+def test_prometheus_buckets_are_cumulative_and_match_sum_and_count():
+    prof = profiling.profiler("tests-prometheus", buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.005, 0.01, 0.05, 0.5, 0.7, 3.0):
+        prof.record("calculate", seconds)
+    prof.record("render", 0.02)
+
+    text = profiling.prometheus_text()
+    assert text.startswith("# HELP poscalc_stage_seconds") and "# TYPE poscalc_stage_seconds histogram" in text
+    samples = parse(text, "tests-prometheus")
+    buckets = [samples['poscalc_stage_seconds_bucket', "calculate", le] for le in ("0.01", "0.1", "1.0", "+Inf")]
+    # le is inclusive: 0.01 lands in the first bucket
+    assert buckets == [2, 3, 5, 6]
+    assert buckets == sorted(buckets)
+    assert samples['poscalc_stage_seconds_count', "calculate", None] == buckets[-1]
+    assert samples['poscalc_stage_seconds_sum', "calculate", None] == pytest.approx(4.265)
+    assert samples['poscalc_stage_seconds_bucket', "render", "+Inf"] == 1
+
+
+def test_label_values_are_escaped():
+    prof = Profiler('a "quoted"\\page')
+    prof.record("x\ny", 0.1)
+    line = prof.prometheus_lines()[0]
+    assert 'page="a \\"quoted\\"\\\\page",stage="x\\ny"' in line
+
+
+def test_rolling_window_percentiles():
+    stats = StageStats(buckets=(0.01, 0.1), window=100)
+    for ms in range(1, 201):
+        stats.observe(ms / 1000)
+    summary = stats.summary()
+    # Only the last 100 timings (101..200 ms) are in the window; the run count is cumulative
+    assert summary['runs'] == 200
+    assert summary['p50_ms'] == pytest.approx(150.0)
+    assert summary['p95_ms'] == pytest.approx(195.0)
+    assert summary['max_ms'] == pytest.approx(200.0) and summary['last_ms'] == pytest.approx(200.0)
+    assert stats.rolling_histogram() == [0, 0, 100]
+    assert sum(stats.counts) == 200
+
+
+def test_empty_stage_summary():
+    assert StageStats().summary() == {'runs': 0, 'last_ms': None, 'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+
+
+def test_stage_is_a_no_op_without_an_active_run():
+    assert profiling.stage("anything") is profiling.stage("other")
+    with profiling.stage("anything"):
+        pass
+
+    prof = Profiler("tests-run")
+    with prof.run():
+        with profiling.stage("calculate"):
+            pass
+    assert set(prof.summary()) == {"total", "calculate"}
+    # Outside run() the page's profiler is no longer the target
+    with profiling.stage("after"):
+        pass
+    assert "after" not in prof.summary()
+
+
+def test_enabled_reads_the_query_then_the_environment(monkeypatch):
+    monkeypatch.setenv(profiling.ENV_VAR, "yes")
+    assert profiling.enabled()
+    assert not profiling.enabled("0")
+    monkeypatch.delenv(profiling.ENV_VAR)
+    assert not profiling.enabled()
+    assert profiling.enabled("True")
+
+
+def test_metrics_endpoint_serves_the_text():
+    profiling.profiler("tests-http").record("calculate", 0.001)
+    server = profiling.serve_metrics(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+        assert 'page="tests-http",stage="calculate"' in body
+    finally:
+        server.shutdown()
+        profiling._SERVERS.pop(0, None)
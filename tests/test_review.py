@@ -0,0 +1,147 @@
+import asyncio
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.harness import ROOT
+from review.llm import CACHE_ENV_VAR, MODEL_ENV_VAR, ResponseCache, Reviewer
+from review.stub_model import StubChatModel
+
+
+def plan(i=0):
+    return {'side': "Long", 'entry_prices': [100.0 - i, 95.0 - i], 'positions': [1_000.0, 1_500.0],
+            'stop_loss': 90.0 - i, 'take_profits': [120.0], 'full_profit': 300.0, 'full_loss': 100.0,
+            'liquidation_price': 85.0 - i}
+
+
+class FailingModel(StubChatModel):
+    async def _call(self, messages):
+        self.calls += 1
+        raise RuntimeError("provider unavailable")
+
+
+@pytest.fixture
+def model():
+    return StubChatModel(call_latency=0.01, token_delay=0.0)
+
+
+def test_concurrent_reviews_of_one_plan_send_one_request(model):
+    reviewer = Reviewer(model, "stub", ResponseCache())
+
+    async def run():
+        return await asyncio.gather(*(reviewer.areview(plan()) for _ in range(20)))
+
+    replies = asyncio.run(run())
+    assert model.calls == 1
+    assert len(set(replies)) == 1 and "Reward to risk at full fill is 3.00" in replies[0]
+    assert reviewer.stats()['requests'] == 1 and reviewer.joined == 19
+
+
+def test_repeat_reviews_hit_memory_then_disk(model, tmp_path):
+    reviewer = Reviewer(model, "stub", ResponseCache(str(tmp_path)))
+    first = asyncio.run(reviewer.areview(plan()))
+    assert asyncio.run(reviewer.areview(plan())) == first
+    assert model.calls == 1
+    stats = reviewer.stats()
+    assert stats['memory_hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == pytest.approx(0.5)
+
+    # A restart: empty memory, same directory
+    restarted = StubChatModel(call_latency=0.01)
+    reviewer = Reviewer(restarted, "stub", ResponseCache(str(tmp_path)))
+    assert asyncio.run(reviewer.areview(plan())) == first
+    assert restarted.calls == 0 and reviewer.stats()['disk_hits'] == 1
+
+
+def test_review_many_batches_new_plans_once(model):
+    reviewer = Reviewer(model, "stub", ResponseCache(), max_concurrency=2)
+    asyncio.run(reviewer.areview(plan(0)))
+    plans = [plan(i) for i in range(5)] + [plan(1), plan(2)]
+    replies = asyncio.run(reviewer.areview_many(plans))
+
+    assert len(replies) == len(plans) and replies[5] == replies[1]
+    # plan(0) came from the cache, the duplicates collapsed: four new plans in one batch request
+    assert model.batch_requests == 1 and model.calls == 1 + 4
+    assert reviewer.stats()['batches'] == 1
+    assert asyncio.run(reviewer.areview_many(plans)) == replies
+    assert model.calls == 5
+
+
+def test_hung_model_times_out_and_frees_the_plan():
+    reviewer = Reviewer(StubChatModel(hang=True), "stub", ResponseCache(), timeout=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(reviewer.areview(plan()))
+    with pytest.raises(TimeoutError):
+        asyncio.run(reviewer.areview_many([plan(1), plan(2)]))
+    assert not reviewer._inflight
+
+    reviewer.model, reviewer.timeout = StubChatModel(call_latency=0.01), 5.0
+    assert "Stub review" in asyncio.run(reviewer.areview(plan()))
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    model = FailingModel()
+    reviewer = Reviewer(model, "stub", ResponseCache())
+
+    async def run():
+        return await asyncio.gather(*(reviewer.areview(plan()) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert model.calls == 1 and not reviewer._inflight
+    with pytest.raises(RuntimeError):
+        asyncio.run(reviewer.areview(plan()))
+    assert model.calls == 2
+
+
+def test_sync_stream_and_review_many_share_the_cache(model):
+    reviewer = Reviewer(model, "stub", ResponseCache())
+    streamed = "".join(reviewer.stream(plan()))
+    assert reviewer.review_many([plan(), plan()]) == [streamed, streamed]
+    assert model.calls == 1 and model.batch_requests == 0
+
+    reviewer.model = FailingModel()
+    with pytest.raises(RuntimeError):
+        list(reviewer.stream(plan(1)))
+
+
+def test_page_warns_instead_of_raising_when_the_model_cannot_start(pages, monkeypatch):
+    def no_key():
+        raise ValueError("GROQ_API_KEY is not set")
+
+    monkeypatch.setattr(pages['main'], "plan_reviewer", no_key)
+    assert pages['main'].open_reviewer() is None
+
+
+def review_page(monkeypatch, tmp_path, model, entries="100, 95, 90"):
+    monkeypatch.setenv(MODEL_ENV_VAR, model)
+    monkeypatch.setenv(CACHE_ENV_VAR, str(tmp_path / "reviews"))
+    monkeypatch.setenv("POSCALC_DB", str(tmp_path / "plans.db"))
+    # plan_reviewer is a cache_resource; each test builds its own
+    st.cache_resource.clear()
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=60).run()
+    inputs = {widget.label: widget for widget in [*at.text_input, *at.number_input]}
+    inputs["Entry Prices (comma-separated)"].input(entries)
+    inputs["Stop Loss"].set_value(85.0)
+    inputs["Take Profits (comma-separated)"].input("110, 120")
+    at.run()
+    next(button for button in at.button if button.label == "Review Plan").click().run()
+    assert not at.exception
+    st.cache_resource.clear()
+    return at, inputs["Portfolio Size"].value
+
+
+def test_page_reviews_the_full_fill_profit(pages, monkeypatch, tmp_path):
+    at, portfolio_size = review_page(monkeypatch, tmp_path, "stub")
+    main = pages['main']
+    plan = main.plan_results(portfolio_size, 3.0, "100, 95, 90", 85.0, "110, 120", 1, 0.0, True, "25")
+    full_fill = main.full_fill_profit(plan[2])
+    # The last tranche alone would give a different ratio
+    assert f"{plan[3] / plan[4]:.2f}" != f"{full_fill / plan[4]:.2f}"
+    assert any(f"Reward to risk at full fill is {full_fill / plan[4]:.2f}." in block.value for block in at.markdown)
+
+
+def test_page_validates_the_plan_before_building_the_model(monkeypatch, tmp_path):
+    at, _ = review_page(monkeypatch, tmp_path, "no-such-model", entries="")
+    assert [warning.value for warning in at.warning] == ["Please fill in all the required fields."]
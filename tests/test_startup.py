@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from benchmarks.harness import ROOT
+from benchmarks.startup import CORE_FORBIDDEN, PAGE_FORBIDDEN, import_report
+
+CORE_MODULES = sorted(f"poscalc.{name[:-3]}" for name in os.listdir(os.path.join(ROOT, "poscalc"))
+                      if name.endswith(".py") and name != "__init__.py")
+
+
+def leaked(statement, forbidden):
+    # Top-level package names seen by -X importtime in a fresh interpreter
+    modules = {name.split(".")[0] for name in import_report(statement)['modules']}
+    return sorted(modules & set(forbidden))
+
+
+def test_core_stays_stdlib_and_numpy():
+    assert leaked("import poscalc", CORE_FORBIDDEN) == []
+
+
+@pytest.mark.parametrize("module", CORE_MODULES)
+def test_core_module_stays_stdlib_and_numpy(module):
+    assert leaked(f"import {module}", CORE_FORBIDDEN) == []
+
+
+@pytest.mark.parametrize("module", ["exchange.orders", "exchange.live", "exchange.risk_limits", "review.llm"])
+def test_feature_modules_import_their_clients_lazily(module):
+    assert leaked(f"import {module}", PAGE_FORBIDDEN) == []
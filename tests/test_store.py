@@ -0,0 +1,96 @@
+import os
+import threading
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.harness import ROOT
+from poscalc.store import PlanStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PlanStore(str(tmp_path / "plans.db"), batch_size=10, flush_interval=None)
+
+
+def save_many(store, count, user="Igor", symbol="BTCUSDT"):
+    for i in range(count):
+        store.save("main", user, symbol, "Long", inputs={'i': i},
+                   outputs={'positions': [1.0, 2.0], 'full_profit': i, 'full_loss': 1.0}, created=1_000.0 + i)
+
+
+def test_threads_share_one_connection(store):
+    connection = store._conn
+    threads = [threading.Thread(target=save_many, args=(store, 25, f"user{i}")) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(store.count()))
+    reader.start()
+    reader.join()
+    assert counts == [200]
+    assert store._conn is connection
+    assert store.distinct("user") == [f"user{i}" for i in range(8)]
+
+
+def test_keyset_paging_and_filters(store):
+    save_many(store, 30)
+    save_many(store, 5, symbol="ETHUSDT")
+    first = store.query(limit=20, symbol="BTCUSDT")
+    second = store.query(limit=20, symbol="BTCUSDT", after=(first[-1]['created'], first[-1]['id']))
+    assert [row['full_profit'] for row in first + second] == list(range(29, -1, -1))
+    assert store.count(symbol="ETHUSDT", since=1_002.0) == 3
+
+
+def test_get_round_trips_inputs_and_outputs(store):
+    save_many(store, 1)
+    plan_id = store.query(limit=1)[0]['id']
+    plan = store.get(plan_id)
+    assert plan['inputs'] == {'i': 0} and plan['outputs']['positions'] == [1.0, 2.0]
+    assert plan['num_entries'] == 2
+    assert store.get(plan_id + 1) is None
+
+
+def test_buffered_saves_flush_on_a_timer(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"), batch_size=1_000, flush_interval=0.05)
+    save_many(store, 3)
+    store._timer.join()
+    assert not store._pending
+    assert store.count() == 3
+
+
+def calculate(page, entries, stop_loss, take_profits):
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60).run()
+    inputs = {widget.label: widget for widget in [*at.text_input, *at.number_input]}
+    inputs["Entry Prices (comma-separated)"].input(entries)
+    inputs["Stop Loss"].set_value(stop_loss)
+    inputs["Take Profits (comma-separated)"].input(take_profits)
+    inputs["TP Trims (% of remaining per TP, last TP closes the rest)"].input("25")
+    at.run()
+    next(button for button in at.button if button.label == "Calculate").click().run()
+    assert not at.exception
+    return at
+
+
+def test_both_pages_save_the_full_fill_profit(tmp_path, monkeypatch):
+    from plan_store import DB_ENV_VAR, plan_store
+
+    monkeypatch.setenv(DB_ENV_VAR, str(tmp_path / "plans.db"))
+    plan_store.clear()
+    try:
+        for page in ("main.py", "crypto-main.py"):
+            calculate(page, "100, 95, 90", 85.0, "110, 120")
+        store = plan_store()
+        saved = {row['page']: store.get(row['id']) for row in store.query()}
+    finally:
+        plan_store.clear()
+
+    # Every rung filled and every take profit hit: the sum of the full-fill row of TP profits on both pages
+    main, crypto = saved['main'], saved['crypto-main']
+    assert len(main['outputs']['tp_profits']) == 3 and len(main['outputs']['tp_profits'][-1]) == 2
+    assert main['full_profit'] == pytest.approx(sum(main['outputs']['tp_profits'][-1]))
+    assert main['outputs']['full_profit'] == main['full_profit']
+    assert crypto['full_profit'] == pytest.approx(sum(crypto['outputs']['tp_profits']))
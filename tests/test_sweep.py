@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from poscalc import calc_positions_batch, entry_weights, run_sweep
+from poscalc.margin import TierTable, ladder_liquidation, synthetic_tiers
+
+SWEEP = (3_000.0, 3.0, 90.0, 100.0, np.linspace(70.0, 85.0, 4), [np.linspace(110.0, 130.0, 3)], [1, 3, 5])
+
+
+def test_tiered_liquidation_for_the_ranked_setups():
+    tiers = TierTable({"BTCUSDT": synthetic_tiers(100.0)})
+    top = run_sweep(*SWEEP, weight_schemes=("even", "linear"), symbol="BTCUSDT", tiers=tiers, leverage=10.0,
+                    top_n=5, chunk_size=7)
+    assert len(top) == 5
+    for row in top:
+        entries = np.linspace(90.0, 100.0, row['num_entries'])
+        result = calc_positions_batch(3_000.0, 3.0, [entries], row['stop_loss'],
+                                      [entry_weights(row['weight_scheme'], len(entries))], [row['take_profits']], 1,
+                                      0.0, True)
+        expected = ladder_liquidation(tiers, "BTCUSDT", entries, result.positions[0], row['stop_loss'], 10.0)
+        assert row['liquidation_price'] == pytest.approx(expected.full_fill[0])
+        assert row['liquidation_price'] != pytest.approx(row['stop_loss'] * 0.99)
+
+
+def test_tiers_without_the_symbol_keep_the_fixed_buffer():
+    tiers = TierTable({"ETHUSDT": synthetic_tiers(100.0)})
+    plain = run_sweep(*SWEEP, top_n=5)
+    assert run_sweep(*SWEEP, symbol="BTCUSDT", tiers=tiers, top_n=5) == plain
+    assert all(row['liquidation_price'] == pytest.approx(row['stop_loss'] * 0.99) for row in plain)
+
+
+def test_worker_processes_get_the_tiers():
+    tiers = TierTable({"BTCUSDT": synthetic_tiers(100.0)})
+    kwargs = dict(symbol="BTCUSDT", tiers=tiers, leverage=10.0, top_n=3, chunk_size=10)
+    assert run_sweep(*SWEEP, workers=2, **kwargs) == run_sweep(*SWEEP, **kwargs)
@@ -0,0 +1,87 @@
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from poscalc.engine import crypto_positions
+from tables import HTML_BUDGET, PAGE_SIZE, SUMMARY_LIMIT, join_within_budget, summary_indices
+
+
+def test_budget_is_inclusive():
+    blocks = ["x" * 1024] * 32
+    assert sum(map(len, blocks)) == HTML_BUDGET
+    assert join_within_budget(blocks) == "x" * HTML_BUDGET
+    assert join_within_budget(blocks + ["y"]) is None
+    assert join_within_budget([]) == ""
+
+
+def test_budget_stops_consuming_blocks_once_spent():
+    built = []
+
+    def blocks():
+        for i in range(1_000):
+            built.append(i)
+            yield "x" * 100
+
+    assert join_within_budget(blocks(), budget=1_000) is None
+    # The eleventh block crosses the budget; nothing after it is formatted
+    assert len(built) == 11
+
+
+def test_summary_rows_collapse_past_the_limit():
+    assert summary_indices(0) == []
+    assert summary_indices(SUMMARY_LIMIT) == list(range(SUMMARY_LIMIT))
+    assert summary_indices(SUMMARY_LIMIT + 1) == [0, SUMMARY_LIMIT]
+    assert summary_indices(5_000) == [0, 4_999]
+    assert summary_indices(3, limit=2) == [0, 2]
+
+
+def crypto_ladder(count):
+    entries = np.linspace(100, 50, count).tolist()
+    return crypto_positions(4_400.0, 1.0, entries, 40.0, [1 / count] * count, [120.0], 1)
+
+
+def test_crypto_cards_fall_back_to_the_grid(pages):
+    results_html = pages['crypto-main'].results_html
+    positions, avg_prices, _, _, full_loss, _, shares = crypto_ladder(10)
+    small = results_html(np.linspace(100, 50, 10).tolist(), positions, avg_prices, shares, full_loss,
+                         budget=HTML_BUDGET)
+    assert small is not None and sum(map(len, small)) <= HTML_BUDGET + 1_000
+
+    entries = np.linspace(100, 50, 2_000).tolist()
+    positions, avg_prices, _, _, full_loss, _, shares = crypto_ladder(2_000)
+    assert results_html(entries, positions, avg_prices, shares, full_loss, budget=HTML_BUDGET) is None
+    # The fallback keeps cards for the first and last rung only
+    cards = "".join(results_html(entries, positions, avg_prices, shares, full_loss, rungs=summary_indices(2_000)))
+    assert "Entry 1 Bids" in cards and "Entry 2000 Bids" in cards and "Entry 2 Bids" not in cards
+
+
+def paged_script():
+    import pandas as pd
+    import streamlit as st
+
+    from tables import paged_dataframe
+
+    paged_dataframe(pd.DataFrame({'x': range(st.session_state.get("rows", 0))}), "page")
+
+
+def run_paged(rows):
+    at = AppTest.from_function(paged_script)
+    at.session_state["rows"] = rows
+    return at.run()
+
+
+def test_small_frames_render_without_a_pager():
+    at = run_paged(PAGE_SIZE)
+    assert not at.exception and not at.number_input
+    assert len(at.dataframe[0].value) == PAGE_SIZE
+
+
+def test_large_frames_page_through_the_grid():
+    at = run_paged(2 * PAGE_SIZE + 200)
+    assert not at.exception
+    pager = at.number_input(key="page")
+    assert pager.label == f"Page (of 3, {PAGE_SIZE:,} rows each)"
+    assert at.dataframe[0].value['x'].iloc[0] == 0 and len(at.dataframe[0].value) == PAGE_SIZE
+
+    at = pager.set_value(3).run()
+    frame = at.dataframe[0].value
+    assert len(frame) == 200 and frame['x'].iloc[0] == 2 * PAGE_SIZE
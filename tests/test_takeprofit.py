@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from poscalc import expand_trims, parse_trims, tp_schedule
+
+
+def test_parse_trims_expands_to_every_level():
+    np.testing.assert_allclose(parse_trims("25", 4), [0.25, 0.25, 0.25, 1.0])
+    np.testing.assert_allclose(parse_trims("25, 50", 4), [0.25, 0.5, 0.5, 1.0])
+    np.testing.assert_allclose(parse_trims("", 2), [0.25, 1.0])
+    np.testing.assert_allclose(parse_trims("25, 100", 1), [1.0])
+
+
+@pytest.mark.parametrize("text", ["150", "25, -10", "nan", "25, 101"])
+def test_trims_outside_0_to_100_percent_raise(text):
+    with pytest.raises(ValueError, match="between 0 and 100%"):
+        parse_trims(text, 3)
+
+
+def test_bounds_are_inclusive():
+    np.testing.assert_allclose(expand_trims([0.0, 1.0], 3), [0.0, 1.0, 1.0])
+
+
+def test_schedule_never_sells_more_than_held():
+    profits, sold, remaining = tp_schedule([10.0], [100.0], [110.0, 120.0, 130.0], parse_trims("60, 90", 3))
+    np.testing.assert_allclose(sold[0], [6.0, 3.6, 0.4])
+    np.testing.assert_allclose(remaining[0], [4.0, 0.4, 0.0], atol=1e-12)
+    np.testing.assert_allclose(profits[0], [60.0, 72.0, 12.0])
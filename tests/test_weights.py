@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from poscalc import CLASSIC_PROPORTIONS, WEIGHT_SCHEMES, entry_weights
+
+
+@pytest.mark.parametrize("n", sorted(CLASSIC_PROPORTIONS))
+def test_classic_reproduces_the_old_table(n):
+    np.testing.assert_allclose(entry_weights("classic", n), CLASSIC_PROPORTIONS[n], rtol=1e-12)
+
+
+@pytest.mark.parametrize("scheme", [scheme for scheme in WEIGHT_SCHEMES if scheme != "custom"])
+@pytest.mark.parametrize("n", [1, 2, 12, 13, 500, 10_000])
+def test_every_scheme_sums_to_one_for_any_length(scheme, n):
+    weights = entry_weights(scheme, n)
+    assert weights.shape == (n,)
+    assert weights.sum() == pytest.approx(1.0)
+    assert (weights >= 0).all()
+
+
+def test_back_weighted_schemes_grow_towards_the_last_rung():
+    for scheme in ("linear", "geometric", "exponential"):
+        assert (np.diff(entry_weights(scheme, 20)) > 0).all()
+    assert (np.diff(entry_weights("classic", 40)) >= 0).all()
+
+
+def test_even_and_custom():
+    np.testing.assert_allclose(entry_weights("even", 4), [0.25] * 4)
+    np.testing.assert_allclose(entry_weights("custom", 3, (1.0, 3.0)), [1 / 6, 2 / 6, 3 / 6])
+
+
+def test_schedules_are_cached_and_read_only():
+    assert entry_weights("linear", 64) is entry_weights("linear", 64)
+    with pytest.raises(ValueError):
+        entry_weights("linear", 64)[0] = 1.0
+
+
+@pytest.mark.parametrize("scheme, n, param", [("linear", 0, None), ("custom", 3, None), ("custom", 3, (-1.0, 1.0)),
+                                              ("unknown", 3, None)])
+def test_invalid_schedules_raise(scheme, n, param):
+    with pytest.raises(ValueError):
+        entry_weights(scheme, n, param)